@@ -0,0 +1,133 @@
+"""
+Vectorized vitals analytics for the Health Analytics tab.
+
+Works on the metrics frame produced by `generate_sample_health_metrics`
+(a `Date` column plus one column per vital), optionally with a patient
+column for multi-patient data. Rolling mean/median/variance, EWMA,
+deltas against the previous window and threshold classification are
+computed for every vital at once with pandas/NumPy column operations, so
+the cost grows linearly with the number of readings.
+"""
+import numpy as np
+import pandas as pd
+
+DATE_COLUMN = "Date"
+
+# Short key -> column name in the metrics frame
+VITALS = {
+    "heart_rate": "Heart Rate (bpm)",
+    "systolic": "Systolic BP (mmHg)",
+    "diastolic": "Diastolic BP (mmHg)",
+    "glucose": "Blood Glucose (mg/dL)",
+}
+
+# Normal range per vital as (low, high, high_inclusive); the same thresholds
+# the summary section has always used: HR 60-100, BP below 130/80, glucose 70-100.
+NORMAL_RANGES = {
+    "heart_rate": (60, 100, True),
+    "systolic": (-np.inf, 130, False),
+    "diastolic": (-np.inf, 80, False),
+    "glucose": (70, 100, True),
+}
+
+
+def abnormal_mask(values, keys):
+    """
+    Boolean array (same shape as `values`, one column per key in `keys`)
+    that is True where a reading falls outside its normal range. NaN is
+    never flagged.
+    """
+    low = np.array([NORMAL_RANGES[k][0] for k in keys], dtype=float)
+    high = np.array([NORMAL_RANGES[k][1] for k in keys], dtype=float)
+    inclusive = np.array([NORMAL_RANGES[k][2] for k in keys])
+    values = np.asarray(values, dtype=float)
+    with np.errstate(invalid="ignore"):
+        above = np.where(inclusive, values > high, values >= high)
+        return (values < low) | above
+
+
+def compute_vitals_analytics(df, window=7, ewm_span=7, patient_col=None):
+    """
+    Returns a frame with the date (and patient) column, the raw vitals and,
+    for each vital key, `<key>_mean`, `_median`, `_var` (rolling over
+    `window`), `_ewma`, `_delta` (reading minus the mean of the previous
+    `window` readings) and `_abnormal`, plus a combined `bp_abnormal`.
+
+    `window` is a number of readings, or a time offset such as "7D" for
+    irregular or minute-level data. With `patient_col`, every statistic is
+    computed within each patient's own series.
+    """
+    keys = [k for k, col in VITALS.items() if col in df.columns]
+    cols = [VITALS[k] for k in keys]
+    sort_by = [patient_col, DATE_COLUMN] if patient_col else [DATE_COLUMN]
+    frame = df.sort_values(sort_by, kind="stable").reset_index(drop=True)
+
+    values = frame.set_index(DATE_COLUMN)[cols].astype("float64")
+    if patient_col:
+        groups = frame[patient_col].to_numpy()
+        grouped = values.groupby(groups, sort=False)
+        rolling = grouped.rolling(window, min_periods=1)
+        previous = grouped.shift(1).groupby(groups, sort=False).rolling(window, min_periods=1).mean()
+        ewma = grouped.ewm(span=ewm_span, adjust=False).mean()
+    else:
+        rolling = values.rolling(window, min_periods=1)
+        previous = values.shift(1).rolling(window, min_periods=1).mean()
+        ewma = values.ewm(span=ewm_span, adjust=False).mean()
+
+    # Grouped results come back in group order, which matches `frame` since it is sorted by patient
+    stats = {
+        "mean": rolling.mean().to_numpy(),
+        "median": rolling.median().to_numpy(),
+        "var": rolling.var().to_numpy(),
+        "ewma": ewma.to_numpy(),
+        "delta": values.to_numpy() - previous.to_numpy(),
+    }
+    abnormal = abnormal_mask(values.to_numpy(), keys)
+
+    out = {DATE_COLUMN: frame[DATE_COLUMN]}
+    if patient_col:
+        out[patient_col] = frame[patient_col]
+    for i, (key, col) in enumerate(zip(keys, cols)):
+        out[col] = frame[col]
+        for name, matrix in stats.items():
+            out[f"{key}_{name}"] = matrix[:, i]
+        out[f"{key}_abnormal"] = abnormal[:, i]
+    result = pd.DataFrame(out)
+    if "systolic_abnormal" in result and "diastolic_abnormal" in result:
+        result["bp_abnormal"] = result["systolic_abnormal"] | result["diastolic_abnormal"]
+    return result
+
+
+def latest_values(analytics):
+    """
+    The latest reading of every vital with its statistics, as a dict of
+    analytics columns. Each vital's values come from that vital's own last
+    reading, since a row may hold only some vitals (a long-format export
+    gives one sparse row per timestamp); `<key>_at` is when it was taken. A
+    vital without readings has NaN values and a None `_abnormal` flag, and
+    so does `bp_abnormal` without any blood pressure reading.
+    """
+    latest = {DATE_COLUMN: analytics[DATE_COLUMN].iloc[-1] if len(analytics) else None}
+    for key, col in VITALS.items():
+        if col not in analytics:
+            continue
+        columns = [col] + [c for c in analytics.columns if c.startswith(f"{key}_")]
+        present = np.flatnonzero(analytics[col].notna().to_numpy())
+        if len(present):
+            row = analytics.iloc[present[-1]]
+            latest.update({c: row[c] for c in columns})
+            latest[f"{key}_at"] = row[DATE_COLUMN]
+        else:
+            latest.update(dict.fromkeys(columns, np.nan))
+            latest[f"{key}_abnormal"] = latest[f"{key}_at"] = None
+    if "systolic_abnormal" in latest and "diastolic_abnormal" in latest:
+        flags = [latest[f"{key}_abnormal"] for key in ("systolic", "diastolic") if latest[f"{key}_abnormal"] is not None]
+        latest["bp_abnormal"] = bool(any(flags)) if flags else None
+    return latest
+
+
+def latest_readings(analytics, patient_col=None):
+    """Most recent analytics row (per patient, if `patient_col` is given)."""
+    if patient_col:
+        return analytics.groupby(patient_col, sort=False).tail(1)
+    return analytics.tail(1)
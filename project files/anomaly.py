@@ -0,0 +1,196 @@
+"""
+Streaming anomaly detection on vitals.
+
+Each vital (per patient) keeps a small online state: an exponentially
+weighted mean/variance for spike detection by z-score, and a two-sided
+CUSUM on the standardized readings for sustained trend shifts. `update`
+only processes readings newer than the last one seen, so new data is
+folded in without recomputing over the full history.
+"""
+import math
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+
+from analytics import DATE_COLUMN, VITALS, abnormal_mask
+
+LOW, MEDIUM, HIGH = "low", "medium", "high"
+_SEVERITY_ORDER = [LOW, MEDIUM, HIGH]
+
+VITAL_LABELS = {
+    "heart_rate": ("Heart rate", "bpm"),
+    "systolic": ("Systolic blood pressure", "mmHg"),
+    "diastolic": ("Diastolic blood pressure", "mmHg"),
+    "glucose": ("Blood glucose", "mg/dL"),
+}
+
+RECOMMENDATIONS = {
+    "heart_rate": "Continue to monitor heart rate, especially if you notice palpitations or shortness of breath.",
+    "systolic": "Track your blood pressure daily; reduce sodium and consult your doctor if readings stay elevated.",
+    "diastolic": "Track your blood pressure daily; reduce sodium and consult your doctor if readings stay elevated.",
+    "glucose": "Focus on consistent meal timings and balanced nutrition to stabilize blood glucose. If spikes persist, consult your doctor.",
+}
+
+
+@dataclass
+class Anomaly:
+    __slots__ = ("vital", "timestamp", "value", "kind", "severity", "score", "direction", "patient")
+    vital: str
+    timestamp: object
+    value: float
+    kind: str  # "spike" or "shift"
+    severity: str
+    score: float
+    direction: str  # "up" or "down"
+    patient: object
+
+    def describe(self, with_label=True):
+        label, unit = VITAL_LABELS[self.vital]
+        when = getattr(self.timestamp, "strftime", None)
+        when = when("%b %d") if when else str(self.timestamp)
+        if self.kind == "spike":
+            what = f"{'spike' if self.direction == 'up' else 'drop'} to {self.value:.0f} {unit}"
+        else:
+            what = f"sustained {'rise' if self.direction == 'up' else 'fall'} (now {self.value:.0f} {unit})"
+        text = f"{what} on {when} ({self.severity} severity)"
+        return f"{label} {text}" if with_label else text
+
+
+class _VitalState:
+    __slots__ = ("n", "mean", "var", "cusum_up", "cusum_down")
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.var = 0.0
+        self.cusum_up = 0.0
+        self.cusum_down = 0.0
+
+
+class VitalsAnomalyDetector:
+    """
+    Online spike and trend-shift detector over a vitals metrics frame.
+
+    alpha      weight of new readings in the running mean/variance
+    spike_z    |z| at which a reading counts as a spike
+    cusum_k    CUSUM slack, in standard deviations
+    cusum_h    CUSUM alarm threshold, in standard deviations
+    warmup     readings needed before anything is flagged
+    """
+    def __init__(self, alpha=0.05, spike_z=3.0, cusum_k=0.5, cusum_h=5.0, warmup=7,
+                 patient_col=None, max_anomalies=1000):
+        self.alpha = alpha
+        self.spike_z = spike_z
+        self.cusum_k = cusum_k
+        self.cusum_h = cusum_h
+        self.warmup = warmup
+        self.patient_col = patient_col
+        self.anomalies = deque(maxlen=max_anomalies)
+        self._states = {}  # (patient, vital key) -> _VitalState
+        self._last_seen = {}  # patient -> timestamp of the newest processed reading
+
+    def update(self, df):
+        """Processes readings newer than the last update; returns the new anomalies."""
+        if df.empty:
+            return []
+        keys = [k for k, col in VITALS.items() if col in df.columns]
+        cols = [VITALS[k] for k in keys]
+        sort_by = [self.patient_col, DATE_COLUMN] if self.patient_col else [DATE_COLUMN]
+        df = df.sort_values(sort_by, kind="stable")
+        patients = df[self.patient_col].to_numpy() if self.patient_col else np.full(len(df), None)
+        dates = df[DATE_COLUMN].to_numpy()
+
+        # Skip everything already processed (vectorized), then walk only the new readings
+        last_seen = np.array([self._last_seen.get(p, np.datetime64("NaT")) for p in patients],
+                             dtype=dates.dtype)
+        new = np.isnat(last_seen) | (dates > last_seen)
+        if not new.any():
+            return []
+        values = df[cols].to_numpy(dtype=float)[new]
+        out_of_range = abnormal_mask(values, keys)
+        timestamps = df[DATE_COLUMN].iloc[np.flatnonzero(new)]
+
+        found = []
+        for row, (patient, timestamp) in enumerate(zip(patients[new], timestamps)):
+            for i, key in enumerate(keys):
+                anomaly = self._observe(patient, key, timestamp, values[row, i], out_of_range[row, i])
+                if anomaly is not None:
+                    found.append(anomaly)
+            self._last_seen[patient] = np.datetime64(timestamp)
+        self.anomalies.extend(found)
+        return found
+
+    def _observe(self, patient, key, timestamp, x, out_of_range):
+        if math.isnan(x):
+            return None
+        state = self._states.get((patient, key))
+        if state is None:
+            state = self._states[(patient, key)] = _VitalState()
+
+        anomaly = None
+        # Small-sample bias correction, so early readings are not over-flagged
+        std = math.sqrt(state.var * state.n / (state.n - 1)) if state.n > 1 else 0.0
+        if state.n >= self.warmup and std > 0:
+            z = (x - state.mean) / std
+            if abs(z) >= self.spike_z:
+                anomaly = Anomaly(key, timestamp, x, "spike", self._severity(abs(z), out_of_range),
+                                  z, "up" if z > 0 else "down", patient)
+                # Clip the spike so one outlier does not drag the baseline with it
+                x = state.mean + math.copysign(self.spike_z * std, z)
+            else:
+                state.cusum_up = max(0.0, state.cusum_up + z - self.cusum_k)
+                state.cusum_down = max(0.0, state.cusum_down - z - self.cusum_k)
+                drift = max(state.cusum_up, state.cusum_down)
+                if drift >= self.cusum_h:
+                    direction = "up" if state.cusum_up >= state.cusum_down else "down"
+                    anomaly = Anomaly(key, timestamp, x, "shift", self._severity(drift / 2, out_of_range),
+                                      drift, direction, patient)
+                    state.cusum_up = state.cusum_down = 0.0
+
+        # Running mean/variance: cumulative at first, exponentially weighted after that
+        alpha = max(self.alpha, 1.0 / (state.n + 1))
+        diff = x - state.mean
+        state.mean += alpha * diff
+        state.var = (1 - alpha) * (state.var + alpha * diff * diff)
+        state.n += 1
+        return anomaly
+
+    @staticmethod
+    def _severity(score, out_of_range):
+        level = 0 if score < 3.5 else 1 if score < 5 else 2
+        if out_of_range:
+            level = min(level + 1, 2)
+        return _SEVERITY_ORDER[level]
+
+    def last_seen(self, patient=None):
+        """Timestamp of the newest reading processed (for `patient`), or None."""
+        return self._last_seen.get(patient)
+
+    def recent(self, since=None, patient=None):
+        """Anomalies at or after `since` (optionally for one patient), newest first."""
+        return [a for a in reversed(self.anomalies)
+                if (since is None or a.timestamp >= since) and (patient is None or a.patient == patient)]
+
+
+def insights_markdown(anomalies, per_vital=2):
+    """Insights-panel text summarizing detected anomalies per vital, with recommendations."""
+    lines = []
+    recommendations = []
+    for key in VITALS:
+        label, _ = VITAL_LABELS[key]
+        found = [a for a in anomalies if a.vital == key][:per_vital]
+        if found:
+            lines.append(f"* **{label}:** " + "; ".join(a.describe(with_label=False) for a in found) + ".")
+            if RECOMMENDATIONS[key] not in recommendations:
+                recommendations.append(RECOMMENDATIONS[key])
+        else:
+            lines.append(f"* **{label}:** stable, no unusual readings detected.")
+    if not recommendations:
+        recommendations.append("Your vitals look stable. Maintain your current lifestyle and keep monitoring regularly.")
+    return "\n".join(lines + ["", "**Recommendations:**"] + [f"* {r}" for r in recommendations])
+
+
+def prompt_findings(anomalies, limit=5):
+    """Short one-line findings for including in a model prompt."""
+    return [a.describe() for a in anomalies[:limit]]
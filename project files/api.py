@@ -0,0 +1,264 @@
+"""
+Async HTTP API for HealthAI's core functions (see service.py), for
+integrations such as an EHR or a mobile app. JSON in, JSON out:
+
+    POST /v1/chat              {"question", "history": [{"role": "user" | "ai", "message"}], "stream"}
+                               -> {"answer", "source"}
+    POST /v1/predictions       {"symptoms", "profile", "vitals_findings": [...] or "patient_id"}
+                               -> {"conditions": [{"rank", "condition", "likelihood", ...}], "text"}
+    POST /v1/treatment-plans   {"condition", "profile", "stream"} -> {"plan", "source"}
+    GET  /v1/patients/{patient_id}/vitals?start=&end=&anomaly_days=7
+                               -> {"patient_id", "readings", "latest", "anomalies"}
+    GET  /healthz
+    GET  /metrics              Prometheus text of this worker (see telemetry.py)
+
+Every /v1 request must carry the key set in API_KEY, as
+"Authorization: Bearer <key>" (or an X-API-Key header); otherwise it gets
+a 401. Without API_KEY the API is open, so it then refuses to listen on
+anything but a loopback address (the default, API_HOST=127.0.0.1).
+/healthz and /metrics need no key.
+
+`profile` takes the keys of service.DEFAULT_PROFILE, all optional. With
+"stream": true, chat and treatment answers stream back as plain text
+chunks (the answer's source is in the X-HealthAI-Source header). Errors
+are {"error": ...} with status 400 (bad request), 401 (missing or wrong
+API key), 404 (no readings for the patient) or 503 (every model slot busy for GRANITE_ACQUIRE_TIMEOUT
+seconds; retry later).
+
+Handlers are async; model calls, index lookups and store reads run in
+worker threads, so one process serves many requests at once, while the
+model client's concurrency limit still bounds calls to the backend. Run
+several worker processes (--workers / API_WORKERS) to use more cores.
+
+Usage (from the `project files` directory):
+    python api.py --workers 4 [--host 0.0.0.0] [--port 8000]
+    API_KEY=... uvicorn api:app --workers 4
+"""
+import argparse
+import contextlib
+import functools
+import hmac
+import ipaddress
+import sys
+from datetime import datetime
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from config import API_HOST, API_KEY, API_PORT, API_WORKERS
+from conversation import ROLE_LABELS
+from model_client import ModelBusyError
+from service import HealthService, create_telemetry, normalize_profile
+
+
+class ApiError(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def authenticate(request):
+    """Raises a 401 ApiError unless the request carries the app's API key (if it has one)."""
+    expected = request.app.state.api_key
+    if not expected:
+        return
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    key = token.strip() if scheme.lower() == "bearer" else request.headers.get("x-api-key", "")
+    if not hmac.compare_digest(key.encode(), expected.encode()):
+        raise ApiError("Missing or invalid API key", status=401)
+
+
+def endpoint(route):
+    """
+    Wraps a handler(request, service): checks the API key, times it as the
+    `route` stage, counts requests by route and status, and turns errors
+    into JSON responses.
+    """
+    def decorate(handler):
+        @functools.wraps(handler)
+        async def wrapper(request):
+            service = request.app.state.service
+            status = 500
+            try:
+                authenticate(request)
+                with service.telemetry.span(route):
+                    response = await handler(request, service)
+                status = response.status_code
+                return response
+            except ApiError as e:
+                status = e.status
+                headers = {"WWW-Authenticate": "Bearer"} if status == 401 else None
+                return JSONResponse({"error": str(e)}, status_code=status, headers=headers)
+            except ModelBusyError as e:
+                status = 503
+                return JSONResponse({"error": str(e)}, status_code=status, headers={"Retry-After": "1"})
+            finally:
+                service.telemetry.count("healthai_api_requests_total", route=route, status=str(status))
+        return wrapper
+    return decorate
+
+
+async def json_body(request, *required):
+    """The request's JSON object; each `required` field must be a non-empty string."""
+    try:
+        body = await request.json()
+    except ValueError:
+        raise ApiError("Request body must be JSON") from None
+    if not isinstance(body, dict):
+        raise ApiError("Request body must be a JSON object")
+    for field in required:
+        if not isinstance(body.get(field), str) or not body[field].strip():
+            raise ApiError(f"'{field}' is required")
+    return body
+
+
+def body_profile(body):
+    profile = body.get("profile") or {}
+    if not isinstance(profile, dict):
+        raise ApiError("'profile' must be an object")
+    try:
+        return normalize_profile(profile)
+    except (TypeError, ValueError) as e:
+        raise ApiError(f"Invalid 'profile': {e}") from None
+
+
+async def answer(generation, stream, field):
+    """The generation's whole text as {field, source}, or streamed as plain text."""
+    if not stream:
+        return JSONResponse({field: await run_in_threadpool(generation.text), "source": generation.source})
+    chunks = generation.stream()
+    first = await run_in_threadpool(next, chunks, "") # Takes the model slot, so a busy model is still a 503
+
+    async def body():
+        yield first
+        async for chunk in iterate_in_threadpool(chunks):
+            yield chunk
+
+    return StreamingResponse(body(), media_type="text/plain; charset=utf-8",
+                             headers={"X-HealthAI-Source": generation.source})
+
+
+# --- Endpoints ---
+@endpoint("api.chat")
+async def chat(request, service):
+    body = await json_body(request, "question")
+    history = body.get("history") or []
+    if not isinstance(history, list) or not all(
+            isinstance(turn, dict) and turn.get("role") in ROLE_LABELS and isinstance(turn.get("message"), str)
+            for turn in history):
+        raise ApiError(f"'history' must be a list of {{\"role\": {' or '.join(map(repr, ROLE_LABELS))}, "
+                       "\"message\"} turns")
+
+    def prepare():
+        memory = service.conversation((turn["role"], turn["message"]) for turn in history)
+        return service.answer_query(body["question"], memory)
+
+    return await answer(await run_in_threadpool(prepare), bool(body.get("stream")), "answer")
+
+
+@endpoint("api.prediction")
+async def prediction(request, service):
+    body = await json_body(request, "symptoms")
+    profile = body_profile(body)
+    findings = body.get("vitals_findings")
+    if findings is not None and not (isinstance(findings, list) and all(isinstance(f, str) for f in findings)):
+        raise ApiError("'vitals_findings' must be a list of strings")
+    patient_id = body.get("patient_id")
+
+    def predict():
+        vitals_findings = findings
+        if vitals_findings is None and patient_id:
+            from anomaly import prompt_findings
+
+            readings = service.read_vitals(str(patient_id))
+            vitals_findings = prompt_findings(service.vitals_anomalies(readings)) if readings is not None else None
+        text = service.predict(body["symptoms"], profile, vitals_findings).text()
+        return {"conditions": [c.to_dict() for c in service.ranked_conditions(text)], "text": text}
+
+    return JSONResponse(await run_in_threadpool(predict))
+
+
+@endpoint("api.treatment")
+async def treatment_plan(request, service):
+    body = await json_body(request, "condition")
+    profile = body_profile(body)
+    generation = await run_in_threadpool(service.treatment_plan, body["condition"], profile)
+    return await answer(generation, bool(body.get("stream")), "plan")
+
+
+def query_date(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ApiError(f"'{name}' must be an ISO date, e.g. 2026-01-31") from None
+
+
+@endpoint("api.vitals")
+async def vitals(request, service):
+    patient_id = request.path_params["patient_id"]
+    start, end = query_date(request, "start"), query_date(request, "end")
+    try:
+        anomaly_days = int(request.query_params.get("anomaly_days", "7"))
+    except ValueError:
+        raise ApiError("'anomaly_days' must be a whole number") from None
+    report = await run_in_threadpool(service.vitals_report, patient_id, start, end, anomaly_days)
+    if report is None:
+        raise ApiError(f"No readings for patient {patient_id!r}", status=404)
+    return JSONResponse(report)
+
+
+async def healthz(request):
+    return JSONResponse({"status": "ok"})
+
+
+async def metrics(request):
+    text = await run_in_threadpool(request.app.state.service.telemetry.prometheus)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    app.state.service = HealthService(create_telemetry()) # One per worker process
+    yield
+
+
+app = Starlette(routes=[
+    Route("/v1/chat", chat, methods=["POST"]),
+    Route("/v1/predictions", prediction, methods=["POST"]),
+    Route("/v1/treatment-plans", treatment_plan, methods=["POST"]),
+    Route("/v1/patients/{patient_id}/vitals", vitals, methods=["GET"]),
+    Route("/healthz", healthz, methods=["GET"]),
+    Route("/metrics", metrics, methods=["GET"]),
+], lifespan=lifespan)
+app.state.api_key = API_KEY
+
+
+def is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the HealthAI HTTP API.")
+    parser.add_argument("--host", default=API_HOST, help=f"Listen address (default: {API_HOST})")
+    parser.add_argument("--port", type=int, default=API_PORT, help=f"Listen port (default: {API_PORT})")
+    parser.add_argument("--workers", type=int, default=API_WORKERS, help=f"Worker processes (default: {API_WORKERS})")
+    args = parser.parse_args(argv)
+    if not API_KEY and not is_loopback(args.host):
+        parser.error(f"set API_KEY to serve on {args.host}; without it the API only listens on a loopback address")
+    uvicorn.run("api:app", host=args.host, port=args.port, workers=args.workers, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,25 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from dotenv import load_dotenv
+import io
+import hashlib
 import os
-import time # For simulating AI response delay
-
-# --- Configuration and Environment Setup ---
-load_dotenv() # Load environment variables from .env file
-
-# Mock IBM Watson API credentials - replace with your actual keys for live integration
-# Ensure these are set in your .env file or Streamlit Cloud secrets
-WATSONX_API_KEY = os.getenv("WATSONX_API_KEY", "your_mock_watsonx_api_key")
-WATSONX_PROJECT_ID = os.getenv("WATSONX_PROJECT_ID", "your_mock_watsonx_project_id")
+import re
+import tempfile
+import uuid
+from collections import deque
+
+from batch_predict import ResultsFile, detect_format, predict_rows, read_rows
+from chat_history import ChatHistoryStore
+from config import (BATCH_MAX_CONCURRENCY, CHART_DOWNSAMPLING, CHART_MAX_POINTS, CHAT_HISTORY_MAX_AGE_DAYS,
+                    CHAT_HISTORY_MAX_CONVERSATIONS, CHAT_HISTORY_MAX_MESSAGES, CHAT_HISTORY_PATH, CHAT_PAGE_SIZE,
+                    CHAT_WINDOW, COHORT_OVERVIEW, GRANITE_MAX_CONCURRENCY, JOB_POLL_SECONDS, METRICS_OVERLAY,
+                    METRICS_PORT, RETRIEVAL_PASSAGES, SAMPLE_METRICS_SEED)
+from jobs import CANCELLED, FAILED, JobRunner
+from predictions import as_columns
+from service import DEFAULT_PROFILE, HealthService, create_telemetry
+# The analytics stack (pandas, pyarrow and plotly, and the analytics, anomaly, cohort, downsample,
+# synthetic_vitals and vitals_store modules built on them) is most of a cold start's import time. It is
+# imported where it is used, and only the open tab runs, so sessions that never open the Health
+# Analytics or Cohort Overview tab never load it.
 
 # --- Streamlit Page Configuration (MUST BE THE FIRST STREAMLIT COMMAND) ---
 st.set_page_config(
@@ -99,621 +105,385 @@ st.markdown("""
 
 # --- Initialize Session State for Patient Data and Chat History ---
 if 'patient_profile' not in st.session_state:
-    st.session_state.patient_profile = {
-        "name": "",
-        "age": 0,
-        "gender": "Male",
-        "medical_history": "",
-        "current_medications": "",
-        "allergies": ""
-    }
+    st.session_state.patient_profile = dict(DEFAULT_PROFILE)
 if 'chat_history' not in st.session_state:
-    st.session_state.chat_history = []
+    st.session_state.chat_history = deque(maxlen=CHAT_WINDOW) # Recent (id, role, message) turns; the rest stay on disk
+if 'chat_earlier' not in st.session_state:
+    st.session_state.chat_earlier = [] # Older turns loaded with "Load earlier messages"
+if 'chat_memory' not in st.session_state:
+    st.session_state.chat_memory = None # ConversationMemory of the current conversation, for the chat prompt
+if 'chat_conversation' not in st.session_state:
+    st.session_state.chat_conversation = None # Conversation the in-memory turns belong to
+if 'chat_session_id' not in st.session_state:
+    st.session_state.chat_session_id = uuid.uuid4().hex # Random id of this browser session
+if 'chat_token' not in st.session_state:
+    st.session_state.chat_token = None # Conversation key the user can restore (see chat_conversation_id)
 if 'health_metrics' not in st.session_state:
-    st.session_state.health_metrics = pd.DataFrame()
+    st.session_state.health_metrics = None # Sample metrics, generated on first use
+if 'sample_metrics_version' not in st.session_state:
+    st.session_state.sample_metrics_version = "" # Content hash of the sample metrics, keys the analytics caches
 if 'generated_treatment_plan' not in st.session_state:
     st.session_state.generated_treatment_plan = ""
 if 'predicted_conditions' not in st.session_state:
-    st.session_state.predicted_conditions = []
-
-# --- Mock IBM Granite Model Integration ---
-class MockGraniteModel:
+    st.session_state.predicted_conditions = [] # Parsed PredictedCondition records
+if 'prediction_text' not in st.session_state:
+    st.session_state.prediction_text = "" # Raw model answer, shown when it has no parsable conditions
+if 'vitals_patient_id' not in st.session_state:
+    st.session_state.vitals_patient_id = f"session:{st.session_state.chat_session_id}" # See current_patient_id
+if 'vitals_detector' not in st.session_state:
+    st.session_state.vitals_detector = None # Incremental VitalsAnomalyDetector: only new readings are processed
+if 'vitals_detector_source' not in st.session_state:
+    st.session_state.vitals_detector_source = None # (patient, data version) the detector was last fed
+if 'model_jobs' not in st.session_state:
+    st.session_state.model_jobs = {} # Background model job per slot ("chat", "prediction", "batch", "treatment")
+if 'batch_predictions' not in st.session_state:
+    st.session_state.batch_predictions = None # ResultsFile of the last batch prediction
+
+# --- Shared Resources ---
+@st.cache_resource
+def get_telemetry():
+    """Process-wide spans, counters and histograms, with the exporters the configuration enables."""
+    telemetry = create_telemetry()
+    if METRICS_PORT:
+        telemetry.serve(int(METRICS_PORT))
+    return telemetry
+
+@st.cache_resource
+def get_service():
     """
-    A mock class to simulate IBM Granite-13b-instruct-v2 model's generate_text method.
-    In a real application, this would be replaced with actual IBM Watson ML SDK calls.
+    Chat, prediction, treatment plans and vitals analytics (see service.py),
+    shared by every session. The model, caches and stores it holds are built
+    on first use.
     """
-    def generate_text(self, prompt):
-        # Simulate a delay for AI processing
-        time.sleep(2)
-
-        # Basic keyword-based responses for demonstration
-        prompt_lower = prompt.lower()
-
-        if "patient question:" in prompt_lower:
-            query = prompt_lower.split("patient question:")[1].strip()
-            if "fever" in query and "cough" in query:
-                return """The symptoms you're describing (fever, cough, runny nose, headache, joint pain) are common with the flu or common cold.
-                For most people, these conditions resolve with rest and fluids.
-                However, if your symptoms are severe, worsen, or persist for more than 7-10 days,
-                it's important to consult a healthcare professional.
-                They can provide an accurate diagnosis and recommend appropriate treatment.
-                This information is for general guidance and not a substitute for professional medical advice."""
-            elif "headache" in query and "fatigue" in query and "fever" in query:
-                return """Persistent headache, fatigue, and mild fever can be symptoms of various conditions, from viral infections to more serious issues.
-                It's crucial to consult a doctor for a proper diagnosis.
-                They might recommend further tests to determine the underlying cause and the best course of action.
-                Remember, this AI provides general information and cannot diagnose."""
-            elif "stomach pain" in query and "severe stomach pain":
-                return """Stomach pain can have many causes, from indigestion to more serious conditions like appendicitis or gallstones.
-                If the pain is severe, persistent, accompanied by fever, vomiting, or blood in stool, seek immediate medical attention.
-                For mild, occasional pain, over-the-counter antacids or dietary changes might help.
-                Always consult a doctor for persistent or severe symptoms."""
-            elif "persistent cough" in query and "low-grade fever" in query:
-                return """A persistent cough and low-grade fever can be symptoms of various conditions, including a common cold, bronchitis, or even early stages of a viral infection like the flu or COVID-19.
-                It's important to monitor your symptoms. If they worsen, you develop shortness of breath, severe chest pain, or the fever increases, please consult a healthcare professional for a proper diagnosis and advice.
-                Rest and staying hydrated are generally recommended."""
-            elif "fever" in query and "runny nose" in query and "headache" in query and "joint pain" in query:
-                return """"The symptoms you're describing (fever, cough, runny nose, headache, joint pain) are common with the flu or common cold. 
-                For most people, these conditions resolve with rest and fluids. However, if your symptoms are severe, worsen, or persist for more than 7-10 days, it's important to consult a healthcare professional. They can provide an accurate diagnosis and recommend appropriate treatment. 
-                This information is for general guidance and not a substitute for professional medical advice."""
-            elif "headache" in query and "fatigue" in query and "mild fever" in query:
-                return """Persistent headache, fatigue, and mild fever can be symptoms of various conditions, from viral infections to more serious issues. 
-                It's crucial to consult a doctor for a proper diagnosis. They might recommend further tests to determine the underlying cause and the best course of action. 
-                Remember, this AI provides general information and cannot diagnose."""
-            elif "fever" in query:
-                return """Fever is a temporary rise in body temperature, often due to an illness. It’s a symptom — not a disease — and is usually a sign that your body is fighting an infection.
-
-                🌡️ Normal vs. Fever
-                Normal body temp: ~98.6°F (37°C)
-
-                Fever: Usually defined as:
-
-                Low-grade: 99.5°F to 100.9°F (37.5–38.3°C)
-
-                Moderate: 101°F to 103°F (38.3–39.4°C)
-
-                High: 104°F or more (≥ 40°C)
-
-                🩺 Common Causes of Fever
-                Viral infections (cold, flu, COVID-19)
-
-                Bacterial infections (UTI, strep throat)
-
-                Heat exhaustion
-
-                Inflammatory conditions (e.g. rheumatoid arthritis)
-
-                Vaccinations (as a side effect)
-
-                🏠 Home Care Tips
-                Rest: Let your body recover.
-
-                Hydrate: Drink plenty of fluids (water, electrolyte drinks, soups).
-
-                Dress lightly: Avoid heavy clothing or blankets.
-
-                Cool compress: Use a damp washcloth on forehead/neck.
-
-                Medications:
-
-                Paracetamol (acetaminophen) or Ibuprofen can reduce fever.
-
-                🚨 When to See a Doctor
-                Fever > 103°F (39.4°C)
-
-                Lasts more than 3 days
-
-                Severe headache, rash, stiff neck
-
-                Difficulty breathing or chest pain
-
-                Fever with confusion, seizures, or persistent vomiting
-
-                For infants under 3 months, a fever is always an emergency"""
-            elif "cough" in query:
-                return """🩺 Common Causes
-                Viral infections (cold, flu, COVID-19)
+    return HealthService(get_telemetry())
+
+@st.cache_resource
+def get_job_runner():
+    """Background workers for model calls, shared by every session."""
+    runner = JobRunner(max_workers=GRANITE_MAX_CONCURRENCY)
+    get_telemetry().register("healthai_jobs", runner.stats)
+    return runner
+
+@st.cache_resource
+def get_chat_history_store():
+    """Persistent chat log shared by every session, purged by the configured retention limits."""
+    return ChatHistoryStore(CHAT_HISTORY_PATH, max_messages=CHAT_HISTORY_MAX_MESSAGES,
+                            max_age=CHAT_HISTORY_MAX_AGE_DAYS * 86400 or None,
+                            max_conversations=CHAT_HISTORY_MAX_CONVERSATIONS or None)
+
+# Time this rerun stage by stage (closed at the end of the script)
+telemetry = get_telemetry()
+telemetry.start_rerun()
 
-                Bacterial infections (bronchitis, pneumonia)
-
-                Allergies or asthma
-
-                Acid reflux (GERD)
-
-                Postnasal drip
-
-                Environmental irritants (smoke, pollution)
-
-                🏠 Home Remedies
-                Warm fluids: Ginger tea, warm water with honey and lemon
-
-                Steam inhalation: Helps loosen mucus
-
-                Honey (for >1 yr old): Soothes throat and suppresses cough
-
-                Saltwater gargle: Relieves throat irritation
-
-                Avoid irritants: Smoke, perfumes, and dust
-
-                💊 Medications
-                Dry Cough:
-
-                Dextromethorphan (cough suppressants)
-
-                Antihistamines (if allergy-related)
-
-                Wet Cough:
-
-                Expectorants like guaifenesin to thin mucus
-
-                Antibiotics if it's bacterial (only with a prescription)
-
-                """
-            elif "cold" in query:
-                return """🤧 Common Symptoms
-                Runny or stuffy nose
-
-                Sneezing
-
-                Sore throat
-
-                Cough
-
-                Mild fever (sometimes)
-
-                Fatigue
-
-                Headache
-
-                Watery eyes
-                🏠 Home Remedies
-                Rest: Let your immune system work
-
-                Hydration: Warm water, soup, herbal teas
-
-                Steam inhalation: Helps with congestion
-
-                Saltwater gargle: Soothes sore throat
+# --- Core Functionalities ---
 
-                Honey + lemon: Eases throat and cough
+def submit_background_job(slot, key, stream_fn, progress=None):
+    """
+    Runs `stream_fn` in the background and keeps the job handle under `slot` in
+    session state. This session's previous job for the slot is cancelled;
+    in-flight jobs with the same key, from any session, are shared. A job with
+    `progress` is shown by it instead of its text (see jobs.JobRunner.submit).
+    """
+    runner = get_job_runner()
+    previous = st.session_state.model_jobs.pop(slot, None)
+    if previous is not None:
+        runner.release(previous)
+    job = runner.submit(key, stream_fn, progress)
+    st.session_state.model_jobs[slot] = job
+    return job
+
+def submit_generation(slot, generation):
+    """Streams a service answer (see service.Generation) into a background job (see submit_background_job)."""
+    return submit_background_job(slot, generation.key, generation.stream)
+
+def cancel_model_job(slot):
+    job = st.session_state.model_jobs.pop(slot, None)
+    if job is not None:
+        get_job_runner().release(job)
+
+def collect_model_job(slot):
+    """
+    Returns the text of the job in `slot` once it has finished, and forgets the job.
+    Returns None while the job is still running, or if it failed or was cancelled.
+    """
+    job = st.session_state.model_jobs.get(slot)
+    if job is None or not job.finished:
+        return None
+    cancel_model_job(slot)
+    if job.status == FAILED:
+        st.error(f"The AI request failed: {job.error}")
+        return None
+    if job.status == CANCELLED:
+        return None
+    return job.text
+
+def _model_job_progress(slot, waiting_text, render):
+    job = st.session_state.model_jobs.get(slot)
+    if job is None:
+        return
+    if job.finished:
+        st.rerun() # Hand the finished result to a full script run
+    output = job.text if job.progress is None else job.progress
+    if output:
+        render(output)
+    else:
+        st.caption(f"⏳ {waiting_text}")
+    st.button("Cancel", key=f"cancel_{slot}", on_click=cancel_model_job, args=(slot,))
 
-                Tulsi, ginger, turmeric milk: Natural anti-inflammatory options
+def show_model_job(slot, waiting_text, render=st.markdown):
+    """
+    Shows the running job in `slot` as its output streams in. Only this fragment
+    re-runs while polling, so the rest of the page stays responsive.
+    """
+    if slot in st.session_state.model_jobs:
+        st.fragment(_model_job_progress, run_every=JOB_POLL_SECONDS)(slot, waiting_text, render)
 
-                💊 Over-the-Counter Medicines
-                Symptom	Medicine Example
-                Runny nose	Antihistamines (cetirizine, loratadine)
-                Nasal congestion	Decongestants (phenylephrine, xylometazoline)
-                Cough	Dextromethorphan, guaifenesin
-                Fever/body ache	Paracetamol, ibuprofen
+def predict_disease(symptoms, patient_profile, vitals_findings=None):
+    """
+    Mocks disease prediction using the Granite model.
+    Runs in the background; returns the job handle (see collect_model_job).
+    """
+    return submit_generation("prediction", get_service().predict(symptoms, patient_profile, vitals_findings))
 
-                ⚠️ Avoid antibiotics — they do not work against viruses."""
-            elif "cold" in query and "fever" in query:
-                return """🏠 Home Remedies
-                ✅ Works for both cold & cough relief:
+def predict_disease_batch(uploaded_file):
+    """
+    Scores every patient case in an uploaded CSV/Parquet file with bounded
+    concurrency. Runs in the background; results are written to a JSON Lines
+    file as they arrive, and the job's progress is that ResultsFile.
+    """
+    data = uploaded_file.getvalue()
+    fmt = detect_format(uploaded_file.name)
+    service = get_service()
+    model, index = service.model, service.knowledge_index
+    digest = hashlib.sha256(data).hexdigest()
+    results = ResultsFile(os.path.join(tempfile.gettempdir(), f"healthai-batch-{digest[:32]}.jsonl"))
+
+    def stream_results():
+        rows = read_rows(io.BytesIO(data), fmt)
+        references = lambda symptoms: index.grounding(symptoms, "prediction", RETRIEVAL_PASSAGES)  # noqa: E731
+        records = predict_rows(rows, model, max_workers=BATCH_MAX_CONCURRENCY, references=references)
+        for _ in results.write(records):
+            yield "" # Lets the job be cancelled between records
+
+    return submit_background_job("batch", "batch:" + digest, stream_results, progress=results)
 
-                Ginger tea with honey
+def generate_treatment_plan(condition, patient_profile):
+    """
+    Treatment plan for `condition`, personalized to the profile and ending
+    with a safety check of the drugs it mentions (see HealthService.treatment_plan).
+    Runs in the background; returns the job handle (see collect_model_job).
+    """
+    return submit_generation("treatment", get_service().treatment_plan(condition, patient_profile))
 
-                Tulsi + turmeric + pepper concoction
+CHAT_TOKEN_PATTERN = re.compile(r"[0-9a-f]{32}")
 
-                Steam inhalation (add Vicks or eucalyptus oil)
+def valid_chat_token(token):
+    return isinstance(token, str) and CHAT_TOKEN_PATTERN.fullmatch(token) is not None
 
-                Honey + lemon in warm water (especially for dry cough)
+def chat_conversation_id():
+    """
+    Conversations are keyed by a random token, kept in the page URL
+    (?conversation=...), so a bookmarked link or the code shown under the
+    chat restores it in a later session. The token is unguessable; the
+    profile name is free text anyone can type, so it never selects a
+    stored conversation.
+    """
+    if st.session_state.chat_token is None:
+        token = st.query_params.get("conversation")
+        st.session_state.chat_token = token if valid_chat_token(token) else uuid.uuid4().hex
+    if st.query_params.get("conversation") != st.session_state.chat_token:
+        st.query_params["conversation"] = st.session_state.chat_token
+    return f"conversation:{st.session_state.chat_token}"
+
+def resume_chat_conversation():
+    """Switches to the conversation whose code was entered (see chat_conversation_id)."""
+    token = st.session_state.chat_resume_code.strip().lower()
+    if valid_chat_token(token):
+        cancel_model_job("chat") # Its answer belongs to the conversation being left
+        st.session_state.chat_token = token
+    else:
+        st.session_state.chat_resume_error = True
+
+def sync_chat_history():
+    """Loads the recent turns of the current conversation when it changes (e.g. on the first run)."""
+    conversation = chat_conversation_id()
+    if st.session_state.chat_conversation != conversation:
+        recent = get_chat_history_store().recent(conversation, CHAT_WINDOW)
+        st.session_state.chat_history = deque(recent, maxlen=CHAT_WINDOW)
+        st.session_state.chat_earlier = []
+        st.session_state.chat_memory = get_service().conversation((role, message) for _, role, message in recent)
+        st.session_state.chat_conversation = conversation
+
+def add_chat_message(role, message):
+    """Persists a chat turn and adds it to the in-memory window."""
+    message_id = get_chat_history_store().append(st.session_state.chat_conversation, role, message)
+    window = st.session_state.chat_history
+    if st.session_state.chat_earlier and len(window) == window.maxlen:
+        st.session_state.chat_earlier.append(window[0]) # Keep loaded earlier turns contiguous with the window
+    window.append((message_id, role, message))
+    st.session_state.chat_memory.add(role, message)
+
+def oldest_loaded_chat_id():
+    loaded = st.session_state.chat_earlier or st.session_state.chat_history
+    return loaded[0][0] if loaded else None
+
+def load_earlier_chat_messages():
+    """Reads the page of turns just before the oldest one shown."""
+    page = get_chat_history_store().before(st.session_state.chat_conversation, oldest_loaded_chat_id(),
+                                           CHAT_PAGE_SIZE)
+    st.session_state.chat_earlier = page + st.session_state.chat_earlier
 
-                Saltwater gargle (for throat relief)
+def answer_patient_query(query):
+    """
+    Mocks answering patient health questions using the Granite model, with the
+    conversation so far and reference passages in the prompt, or from the
+    semantic cache or knowledge index when they can (see HealthService.answer_query).
+    Call before adding `query` to the history.
+    Runs in the background; returns the job handle (see collect_model_job).
+    """
+    return submit_generation("chat", get_service().answer_query(query, st.session_state.chat_memory))
 
-                Stay hydrated: warm water, soups, ORS
+def generate_sample_health_metrics(num_days=30):
+    """Generates realistic-looking sample health metrics over a period (see synthetic_vitals)."""
+    if st.session_state.health_metrics is not None:
+        return st.session_state.health_metrics
+    import pandas as pd
+    from synthetic_vitals import sample_metrics
 
-                Rest: allow your body to heal
+    df = sample_metrics(num_days, seed=SAMPLE_METRICS_SEED)
+    st.session_state.health_metrics = df
+    st.session_state.sample_metrics_version = "sample:" + hashlib.sha1(
+        pd.util.hash_pandas_object(df).to_numpy().tobytes()).hexdigest()
+    return df
 
-                💊 Medicines (OTC)
-                Symptom	Medicine Type	Examples
-                Fever, body ache	Pain relievers	Paracetamol, Ibuprofen
-                Runny nose	Antihistamines	Cetirizine, Loratadine
-                Blocked nose	Decongestants	Xylometazoline nasal spray
-                Dry cough	Cough suppressants	Dextromethorphan
-                Wet cough	Expectorants	Guaifenesin
-
-                🔹 Use syrups like Benadryl, Ascoril, or Grilinctus (as per need).
-                🔹 Always consult a doctor if symptoms last >7 days or worsen.
-
-                🍲 Diet Suggestions
-                Warm liquids: soup, tea, turmeric milk
-
-                Soft foods: khichdi, dal, porridge
-
-                Avoid cold drinks, ice cream, fried and spicy foods"""
-            elif "feeling headache" in query or "headache" in query: # Added specific response for headache
-                return """
-                **Quick Relief Tips for Headaches:**
-                1.  **Hydration:** Drink a glass or two of water. Dehydration is a common cause of headaches.
-                2.  **Rest:** Lie down in a quiet, dark room and close your eyes. Try to sleep or just relax without screen time or loud noises.
-                3.  **Cold or Warm Compress:** Apply a cold compress on your forehead or temples (often helpful for migraines). Use a warm compress on the back of the neck (can help with tension headaches).
-                4.  **Caffeine:** A small amount of caffeine (like in tea or coffee) can help relieve some headaches, but avoid overuse as it can also cause withdrawal headaches.
-                5.  **Over-the-counter Medication:** Consider paracetamol (acetaminophen), ibuprofen, or aspirin—if you don’t have any medical conditions that prevent their use and if they are appropriate for your age.
-
-                **🩺 When to Seek Medical Attention:**
-                * Headache is severe and sudden (thunderclap headache).
-                * It’s your worst headache ever.
-                * You have headache accompanied by fever, stiff neck, rash, confusion, seizures, double vision, weakness, numbness, or difficulty speaking.
-                * Headache follows a head injury.
-                * You get headaches frequently or they are worsening over time.
-                * New headaches if you are over 50.
-
-                This information is for general guidance and not a substitute for professional medical advice. If you have concerns, please consult a qualified doctor or healthcare provider.
-                """
-            return """I can provide general health information, but I'm not a substitute for a medical professional.
-            For specific medical advice, diagnosis, or treatment, please consult a qualified doctor or healthcare provider."""
-
-        elif "predict potential health conditions" in prompt_lower:
-            if "dry cough" in prompt_lower and "shortness of breath" in prompt_lower:
-                return """1. COVID-19\nLikelihood: High\nBrief explanation: Symptoms are highly consistent with viral respiratory infection.\nRecommended next steps: Get tested, self-isolate, consult a doctor.\n\n2. Bronchitis\nLikelihood: Medium\nBrief explanation: Inflammation of bronchial tubes, often follows a cold.\nRecommended next steps: Rest, fluids, consider cough suppressants if severe.\n\n3. Pneumonia\nLikelihood: Medium\nBrief explanation: Lung infection that inflames air sacs.\nRecommended next steps: Seek medical attention for diagnosis and treatment."""
-            elif "headache" in prompt_lower and "fatigue" in prompt_lower and "fever" in prompt_lower:
-                return """1. Tension Headache\nLikelihood: High\nBrief explanation: Common type of headache often associated with stress.\nRecommended next steps: Rest, hydration, over-the-counter pain relievers.\n\n2. Migraine\nLikelihood: Medium\nBrief explanation: Severe headache often accompanied by nausea and sensitivity to light/sound.\nRecommended next steps: Avoid triggers, pain relief medication, consult doctor for prescription options.\n\n3. Viral Infection (e.g., common cold or flu)\nLikelihood: Medium\nBrief explanation: General body aches and fatigue are common with viral illnesses.\nRecommended next steps: Rest, fluids, monitor symptoms."""
-            elif "fever" in prompt_lower and "body aches" in prompt_lower and "cough" in prompt_lower:
-                return """1. Influenza (Flu)\nLikelihood: High\nBrief explanation: Acute respiratory illness caused by influenza viruses.\nRecommended next steps: Rest, fluids, antiviral medication if prescribed, avoid contact with others, consult doctor if severe.\n\n2. Common Cold\nLikelihood: Medium\nBrief explanation: Milder viral infection of the nose and throat.\nRecommended next steps: Rest, fluids, symptom relief.\n\n3. COVID-19\nLikelihood: Medium\nBrief explanation: Viral respiratory illness with similar symptoms to flu.\nRecommended next steps: Get tested, self-isolate, consult a doctor."""
-            elif "unexplained weight loss" in prompt_lower and "fatigue" in prompt_lower and "night sweats" in prompt_lower:
-                return """1. HIV (Human Immunodeficiency Virus)\nLikelihood: High\nBrief explanation: A virus that attacks the body's immune system. Early symptoms can be flu-like.\nRecommended next steps: Get tested immediately, seek medical consultation for antiretroviral therapy (ART).\n\n2. Tuberculosis (TB)\nLikelihood: Medium\nBrief explanation: A bacterial infection that usually attacks the lungs. Symptoms include persistent cough, fever, night sweats, weight loss.\nRecommended next steps: Seek medical evaluation and testing (e.g., TB skin test, chest X-ray).\n\n3. Cancer\nLikelihood: Medium\nBrief explanation: Unexplained weight loss, fatigue, and night sweats can be general symptoms of various cancers.\nRecommended next steps: Consult a doctor for comprehensive diagnostic workup."""
-            elif "persistent cough" in prompt_lower and "chest pain" in prompt_lower and "shortness of breath" in prompt_lower:
-                return """1. Pneumonia\nLikelihood: High\nBrief explanation: Infection that inflames air sacs in one or both lungs, which may fill with fluid or pus.\nRecommended next steps: Seek immediate medical attention for diagnosis and treatment (antibiotics/antivirals).\n\n2. Tuberculosis (TB)\nLikelihood: High\nBrief explanation: A bacterial infection primarily affecting the lungs, leading to chronic cough, chest pain, and other systemic symptoms.\nRecommended next steps: Consult a doctor for TB testing and treatment.\n\n3. Bronchitis\nLikelihood: Medium\nBrief explanation: Inflammation of the lining of your bronchial tubes, which carry air to and from your lungs.\nRecommended next steps: Rest, fluids, cough suppressants, consult doctor if symptoms persist."""
-            elif "fever" in prompt_lower and "chills" in prompt_lower and "sweating" in prompt_lower and "muscle pain" in prompt_lower and "travel history to malaria-prone area" in prompt_lower:
-                return """1. Malaria\nLikelihood: High\nBrief explanation: A serious mosquito-borne disease caused by a parasite. Characterized by fever, chills, sweating, and flu-like illness, especially after travel to endemic areas.\nRecommended next steps: Seek urgent medical attention, inform doctor about travel history, immediate blood test for malaria parasites.\n\n2. Dengue Fever\nLikelihood: Medium\nBrief explanation: A mosquito-borne viral infection causing flu-like illness, severe muscle and joint pain, rash, and fever. More common in tropical and subtropical regions.\nRecommended next steps: Consult a doctor, symptomatic treatment, monitoring for warning signs.\n\n3. Influenza (Flu)\nLikelihood: Low\nBrief explanation: While symptoms can overlap, the travel history makes malaria or dengue more likely.\nRecommended next steps: Standard flu treatment if diagnosed, but prioritize ruling out tropical diseases."""
-            elif "unexplained weight loss" in prompt_lower and "fatigue" in prompt_lower and "changes in bowel habits" in prompt_lower:
-                return """1. Colon Cancer\nLikelihood: High\nBrief explanation: Cancer of the large intestine. Symptoms can include changes in bowel habits, blood in stool, fatigue, and unexplained weight loss.\nRecommended next steps: Consult a gastroenterologist for screening and diagnostic tests (e.g., colonoscopy).\n\n2. Pancreatic Cancer\nLikelihood: Medium\nBrief explanation: Often presents with non-specific symptoms like weight loss, fatigue, and abdominal pain. Can also affect digestion leading to bowel changes.\nRecommended next steps: Seek medical evaluation, potentially imaging and specific blood tests.\n\n3. Irritable Bowel Syndrome (IBS)\nLikelihood: Low\nBrief explanation: While IBS causes changes in bowel habits, unexplained weight loss and significant fatigue are less typical primary symptoms, but can occur due to chronic discomfort.\nRecommended next steps: Consult a doctor for differential diagnosis and management."""
-            elif "frequent urination" in prompt_lower and "increased thirst" in prompt_lower and "blurred vision" in prompt_lower:
-                return """1. Diabetes (Type 2)\nLikelihood: High\nBrief explanation: A chronic condition that affects the way your body processes blood sugar (glucose). Classic symptoms include increased thirst, frequent urination, and blurred vision.\nRecommended next steps: Get blood sugar tested (fasting glucose, HbA1c), consult an endocrinologist or primary care doctor for management.\n\n2. Diabetes Insipidus\nLikelihood: Low\nBrief explanation: A rare condition where your body can't balance fluids, leading to extreme thirst and frequent urination. Not related to blood sugar.\nRecommended next steps: Medical evaluation to differentiate from diabetes mellitus.\n\n3. Urinary Tract Infection (UTI)\nLikelihood: Low\nBrief explanation: Can cause frequent urination and discomfort, but typically not increased thirst or blurred vision.\nRecommended next steps: Urinalysis if UTI is suspected."""
-            elif "high fever" in prompt_lower and "severe headache" in prompt_lower and "joint and muscle pain" in prompt_lower and "skin rash" in prompt_lower:
-                return """1. Dengue Fever\nLikelihood: High\nBrief explanation: A mosquito-borne viral infection prevalent in tropical and subtropical regions. Characterized by high fever, severe headache, joint/muscle pain ("breakbone fever"), and a rash.\nRecommended next steps: Consult a doctor immediately, manage symptoms with pain relievers (avoid NSAIDs), monitor for warning signs (e.g., severe abdominal pain, bleeding).\n\n2. Chikungunya\nLikelihood: Medium\nBrief explanation: Another mosquito-borne viral infection with similar symptoms, but joint pain is often more prominent and debilitating.\nRecommended next steps: Medical evaluation for diagnosis and symptomatic treatment.\n\n3. Measles\nLikelihood: Low\nBrief explanation: While it causes fever and rash, measles typically presents with a specific sequence of symptoms including cough, coryza, conjunctivitis before the rash, and less severe joint pain.\nRecommended next steps: Consult doctor if measles is suspected."""
-            return """Based on the provided symptoms and patient data, I can't give a definitive prediction.
-            Please consult a healthcare professional for diagnosis."""
-
-        elif "generate a personalized treatment plan" in prompt_lower:
-            if "mouth ulcer" in prompt_lower:
-                return """
-                **Personalized Treatment Plan for Mouth Ulcer:**
-
-                1.  **Recommended Medications:**
-                    * **Topical Gels/Pastes:** Over-the-counter products containing benzocaine (e.g., Orajel), triamcinolone acetonide (prescription), or amlexanox may reduce pain and inflammation. Apply as directed, typically 3-4 times daily after meals.
-                    * **Antiseptic Mouthwashes:** Chlorhexidine gluconate or diluted salt water rinses (1/2 teaspoon salt in 1 cup warm water) can help keep the area clean and prevent secondary infection. Use 2-3 times daily.
-                    * **Pain Relievers:** Over-the-counter pain relievers like ibuprofen or acetaminophen can help manage pain if discomfort is significant.
-                2.  **Lifestyle Modifications:**
-                    * **Avoid Irritants:** Steer clear of spicy, acidic, salty, or very hot foods/drinks that can irritate the ulcer.
-                    * **Soft Diet:** Opt for soft, bland foods that are easy to chew and swallow.
-                    * **Good Oral Hygiene:** Gently brush your teeth with a soft-bristled toothbrush. Avoid abrasive toothpaste.
-                    * **Stress Reduction:** Stress can sometimes trigger or worsen mouth ulcers. Practice relaxation techniques like meditation or deep breathing.
-                3.  **Follow-up Testing and Monitoring:**
-                    * Monitor the ulcer for signs of healing. Most simple mouth ulcers heal within 1-2 weeks.
-                    * If the ulcer does not heal within 3 weeks, becomes larger, more painful, or you develop new symptoms (like fever or swollen lymph nodes), consult your dentist or doctor for further evaluation to rule out other conditions.
-                    * Recurrent ulcers may require further investigation to identify underlying causes (e.g., nutritional deficiencies, autoimmune conditions).
-                4.  **Dietary Recommendations:**
-                    * Ensure adequate intake of B vitamins (especially B12, folate) and iron, as deficiencies can contribute to ulcers. Consider supplements if dietary intake is insufficient, but consult a doctor first.
-                    * Stay well-hydrated.
-                5.  **Physical Activity Guidelines:**
-                    * Maintain regular, moderate physical activity to support overall health and stress reduction. No specific restrictions due to mouth ulcers unless discomfort is severe.
-                6.  **Mental Health Considerations:**
-                    * Recognize that stress can impact physical health, including oral health. Manage stress through adequate sleep, hobbies, and if necessary, professional support.
-                *Disclaimer: This plan is for informational purposes only and is not a substitute for professional medical advice. Always consult a qualified healthcare provider for diagnosis and treatment.*
-                """
-            elif "hypertension" in prompt_lower:
-                return """
-                **Personalized Treatment Plan for Hypertension (High Blood Pressure):**
-
-                1.  **Recommended Medications:**
-                    * Your doctor may prescribe medications such as ACE inhibitors (e.g., lisinopril), ARBs (e.g., valsartan), calcium channel blockers (e.g., amlodipine), or diuretics (e.g., hydrochlorothiazide).
-                    * Dosage and specific medication will be determined by your doctor based on your individual health profile and response. It's crucial to take medications exactly as prescribed and not to stop without consulting your doctor.
-                2.  **Lifestyle Modifications:**
-                    * **DASH Diet:** Adopt the Dietary Approaches to Stop Hypertension (DASH) eating plan, which emphasizes fruits, vegetables, whole grains, lean protein, and low-fat dairy, while limiting saturated and trans fats, cholesterol, and sodium.
-                    * **Sodium Reduction:** Aim for less than 2,300 mg of sodium per day, ideally less than 1,500 mg for most adults. Read food labels carefully.
-                    * **Weight Management:** If overweight or obese, losing even a small amount of weight can significantly lower blood pressure.
-                    * **Regular Physical Activity:** Aim for at least 150 minutes of moderate-intensity aerobic activity or 75 minutes of vigorous-intensity activity per week.
-                    * **Limit Alcohol:** If you drink alcohol, do so in moderation (up to one drink per day for women, up to two for men).
-                    * **Quit Smoking:** Smoking significantly increases the risk of heart disease and stroke.
-                    * **Stress Management:** Practice stress-reducing techniques such as meditation, yoga, or deep breathing.
-                3.  **Follow-up Testing and Monitoring:**
-                    * Regularly monitor your blood pressure at home and keep a record to share with your doctor.
-                    * Schedule regular follow-up appointments with your healthcare provider to monitor your blood pressure, review your medication effectiveness, and adjust your treatment plan as needed.
-                    * Regular blood tests (e.g., kidney function, electrolytes) may be performed to monitor medication side effects.
-                4.  **Dietary Recommendations:**
-                    * Increase intake of potassium-rich foods (e.g., bananas, spinach, potatoes), but consult your doctor if you have kidney issues or are on certain medications.
-                    * Consume foods rich in magnesium and calcium.
-
-                5.  **Physical Activity Guidelines:**
-                    * Incorporate a mix of aerobic activities (walking, jogging, swimming) and strength training (at least twice a week).
-                    * Consult your doctor before starting any new exercise regimen.
-                6.  **Mental Health Considerations:**
-                    * Manage stress effectively as chronic stress can contribute to high blood pressure. Seek support if you experience anxiety or depression.
-
-                *Disclaimer: This plan is for informational purposes only and is not a substitute for professional medical advice. Always consult a qualified healthcare provider for diagnosis and treatment of hypertension.*
-                """
-            elif "asthma" in prompt_lower:
-                return """
-                **Personalized Treatment Plan for Asthma:**
-
-                1.  **Recommended Medications:**
-                    * **Reliever Inhalers (Short-Acting Beta-Agonists - SABAs):** Such as albuterol, used for quick relief of symptoms.
-                    * **Controller Inhalers (Inhaled Corticosteroids - ICS):** Such as fluticasone or budesonide, used daily to reduce inflammation and prevent attacks.
-                    * **Combination Inhalers (ICS + Long-Acting Beta-Agonists - LABAs):** For more severe asthma.
-                    * **Oral Corticosteroids:** For severe exacerbations.
-                    * **Leukotriene Modifiers:** Such as montelukast, can help reduce inflammation and improve lung function.
-                    * **Biologics:** For severe allergic or eosinophilic asthma.
-                    * *Dosage and specific medication will be determined by your doctor based on your asthma severity and triggers. Adherence to the prescribed regimen is crucial.*
-                2.  **Lifestyle Modifications:**
-                    * **Identify and Avoid Triggers:** Common triggers include allergens (pollen, dust mites, pet dander), irritants (smoke, pollution, strong odors), exercise, cold air, and stress.
-                    * **Maintain a Clean Environment:** Regularly clean your home to reduce dust mites and mold.
-                    * **Avoid Smoking and Secondhand Smoke.**
-                    * **Get Vaccinated:** Annual flu shots and pneumonia vaccines are recommended.
-                3.  **Follow-up Testing and Monitoring:**
-                    * **Regular Doctor Visits:** For ongoing assessment of asthma control and adjustment of medication.
-                    * **Peak Flow Monitoring:** Use a peak flow meter daily to monitor lung function and detect early signs of worsening asthma.
-                    * **Asthma Action Plan:** Develop a written plan with your doctor that outlines daily management, how to handle worsening symptoms, and when to seek emergency care.
-                4.  **Dietary Recommendations:**
-                    * No specific diet cures asthma, but a healthy, balanced diet rich in fruits, vegetables, and whole grains can support overall health.
-                    * Some studies suggest vitamin D and omega-3 fatty acids might have a protective effect, but consult your doctor before taking supplements.
-                5.  **Physical Activity Guidelines:**
-                    * Regular physical activity is encouraged, as it strengthens the lungs and improves overall fitness.
-                    * Warm-up exercises before activity and using a reliever inhaler (if prescribed) can help prevent exercise-induced asthma.
-                    * Choose activities suitable for your condition; swimming is often well-tolerated.
-                6.  **Mental Health Considerations:**
-                    * Stress and anxiety can trigger asthma symptoms. Practice stress-reduction techniques like deep breathing, meditation, or yoga.
-                    * Seek support if you experience anxiety or depression related to your asthma.
-                *Disclaimer: This plan is for informational purposes only and is not a substitute for professional medical advice. Always consult a qualified healthcare provider for diagnosis and treatment of asthma.*
-                """
-            elif "diabetes" in prompt_lower:
-                return """
-                **Personalized Treatment Plan for Diabetes (Type 2):**
-
-                1.  **Recommended Medications:**
-                    * **Metformin:** Often the first-line medication, helps reduce glucose production by the liver and improve insulin sensitivity.
-                    * **Sulfonylureas (e.g., glipizide):** Stimulate the pancreas to produce more insulin.
-                    * **DPP-4 Inhibitors (e.g., sitagliptin):** Help the body make more insulin and reduce glucose.
-                    * **SGLT2 Inhibitors (e.g., empagliflozin):** Help the kidneys remove glucose from the body.
-                    * **GLP-1 Receptor Agonists (e.g., liraglutide):** Slow digestion and help the body produce more insulin.
-                    * **Insulin Therapy:** May be required if other medications are not sufficient to control blood sugar.
-                    * *Medication choice and dosage depend on individual factors, blood sugar levels, and other health conditions. Strict adherence and regular monitoring are essential.*
-                2.  **Lifestyle Modifications:**
-                    * **Healthy Eating:** Focus on a balanced diet rich in non-starchy vegetables, lean proteins, and whole grains. Limit refined carbohydrates, sugary drinks, and unhealthy fats.
-                    * **Portion Control:** Manage portion sizes to control calorie and carbohydrate intake.
-                    * **Regular Physical Activity:** Aim for at least 150 minutes of moderate-intensity aerobic activity per week, plus muscle-strengthening activities at least two days a week.
-                    * **Weight Management:** If overweight or obese, even modest weight loss can significantly improve blood sugar control.
-                    * **Quit Smoking:** Smoking worsens diabetes complications.
-                    * **Limit Alcohol:** Consume alcohol in moderation, if at all.
-                3.  **Follow-up Testing and Monitoring:**
-                    * **Regular Blood Glucose Monitoring:** Home blood glucose monitoring (HBGM) as advised by your doctor.
-                    * **HbA1c Testing:** Every 3-6 months to assess long-term blood sugar control.
-                    * **Regular Doctor Visits:** For medication adjustments, screening for complications (eyes, kidneys, nerves, feet), and overall health assessment.
-                    * **Blood Pressure and Cholesterol Monitoring:** Manage these to reduce cardiovascular risk.
-                4.  **Dietary Recommendations:**
-                    * **Carbohydrate Counting:** Learn to count carbohydrates to manage blood sugar levels, especially if on insulin.
-                    * **Glycemic Index (GI):** Understand how different foods affect blood sugar and choose lower GI options.
-                    * **Fiber Intake:** Increase fiber-rich foods (vegetables, fruits, whole grains) to help regulate blood sugar.
-                5.  **Physical Activity Guidelines:**
-                    * Incorporate both aerobic (walking, cycling, swimming) and resistance training.
-                    * Monitor blood sugar before, during, and after exercise, especially if on insulin or certain medications, to prevent hypoglycemia.
-                6.  **Mental Health Considerations:**
-                    * Managing a chronic condition like diabetes can be stressful. Seek support for anxiety or depression.
-                    * Diabetes education and support groups can provide valuable resources and coping strategies.
-                *Disclaimer: This plan is for informational purposes only and is not a substitute for professional medical advice. Always consult a qualified healthcare provider for diagnosis and treatment of diabetes.*
-                """
-            elif "cancer" in prompt_lower:
-                return """
-                **Personalized Treatment Plan for Cancer:**
-
-                1.  **Recommended Treatments (Varies Greatly by Cancer Type and Stage):**
-                    * **Surgery:** To remove the tumor and surrounding tissue.
-                    * **Chemotherapy:** Medications that kill cancer cells or slow their growth. Administered orally or intravenously.
-                    * **Radiation Therapy:** Uses high-energy rays to kill cancer cells. Can be external beam radiation or brachytherapy (internal).
-                    * **Targeted Therapy:** Drugs that specifically target cancer cells' unique vulnerabilities, often with fewer side effects than chemotherapy.
-                    * **Immunotherapy:** Boosts the body's own immune system to fight cancer.
-                    * **Hormone Therapy:** Used for hormone-sensitive cancers (e.g., breast, prostate) to block hormone production or action.
-                    * **Stem Cell Transplant:** Used for certain blood cancers to replace diseased bone marrow.
-                    * *The specific treatment regimen will be determined by a multidisciplinary team of oncologists, surgeons, radiation therapists, etc., based on the cancer type, stage, patient's overall health, and genetic markers.*
-                2.  **Lifestyle Modifications:**
-                    * **Nutritional Support:** Maintain a balanced diet, often with the help of a dietitian, to manage treatment side effects and maintain strength.
-                    * **Gentle Physical Activity:** As tolerated and approved by your medical team, light exercise can help with fatigue and mood.
-                    * **Avoid Smoking and Alcohol:** Crucial for improving treatment outcomes and preventing recurrence or new cancers.
-                    * **Rest:** Adequate rest is vital during treatment.
-                3.  **Follow-up Testing and Monitoring:**
-                    * **Regular Imaging (CT, MRI, PET scans):** To monitor treatment response and detect recurrence.
-                    * **Blood Tests (Tumor Markers, CBC):** To monitor cancer activity, treatment side effects, and overall health.
-                    * **Frequent Oncologist Visits:** For treatment adjustments, symptom management, and long-term surveillance.
-                    * **Genetic Testing:** May be recommended to guide targeted therapies.
-                4.  **Dietary Recommendations:**
-                    * Focus on nutrient-dense foods, small frequent meals to manage nausea and appetite changes.
-                    * Stay hydrated.
-                    * Avoid raw or undercooked foods if your immune system is compromised.
-                5.  **Physical Activity Guidelines:**
-                    * Tailored exercise plans are important. Start with short walks and gradually increase activity as tolerated.
-                    * Consult with your care team before starting any new exercise program.
-                6.  **Mental Health Considerations:**
-                    * Cancer diagnosis and treatment are emotionally challenging. Seek psychological support, counseling, or support groups.
-                    * Manage stress through relaxation techniques, mindfulness, or professional therapy.
-                    * Discuss concerns about pain, fatigue, and other side effects with your medical team.
-                *Disclaimer: This plan is for informational purposes only and is not a substitute for professional medical advice. Cancer treatment is highly individualized and requires comprehensive care from a specialized medical team.*
-                """
-            elif "migraine" in prompt_lower:
-                return """
-                **Personalized Treatment Plan for Migraine:**
-
-                1.  **Recommended Medications:**
-                    * **Acute Treatment (for attacks):**
-                        * **Over-the-counter pain relievers:** Ibuprofen, naproxen, acetaminophen (for mild migraines).
-                        * **Triptans (e.g., sumatriptan, zolmitriptan):** Specific migraine medications that relieve pain, nausea, and light/sound sensitivity.
-                        * **CGRP Receptor Antagonists (e.g., ubrogepant, rimegepant):** Newer drugs for acute treatment.
-                        * **Ergotamines:** Used for severe, prolonged attacks.
-                        * **Anti-nausea medications:** If nausea and vomiting are significant.
-                    * **Preventive Treatment (taken regularly to reduce frequency/severity):**
-                        * **Beta-blockers (e.g., propranolol):** Originally for heart conditions, effective for migraine prevention.
-                        * **Antidepressants (e.g., amitriptyline):** Tricyclic antidepressants can help.
-                        * **Anti-seizure drugs (e.g., topiramate, valproate):** Also effective for migraine prevention.
-                        * **CGRP Monoclonal Antibodies (e.g., erenumab, fremanezumab):** Newer injectable preventive treatments.
-                        * **Botox Injections:** For chronic migraine (15 or more headache days per month).
-                    * *Medication selection depends on frequency, severity, and other health conditions. Work with your doctor to find the most effective combination.*
-                2.  **Lifestyle Modifications:**
-                    * **Identify and Avoid Triggers:** Common triggers include certain foods (aged cheese, processed meats, caffeine withdrawal), stress, sleep deprivation, hormonal changes, bright lights, loud noises, and strong smells. Keep a migraine diary.
-                    * **Regular Sleep Schedule:** Go to bed and wake up at consistent times.
-                    * **Regular Meals:** Don't skip meals.
-                    * **Hydration:** Drink plenty of water throughout the day.
-                    * **Stress Management:** Practice relaxation techniques like yoga, meditation, deep breathing, or biofeedback.
-                3.  **Follow-up Testing and Monitoring:**
-                    * **Migraine Diary:** Crucial for tracking triggers, symptoms, and medication effectiveness.
-                    * **Regular Doctor Visits:** To review medication effectiveness, adjust treatment, and discuss new strategies.
-                    * **Neurological Evaluation:** May be performed to rule out other conditions.
-                4.  **Dietary Recommendations:**
-                    * While not a universal solution, identifying and avoiding food triggers can be helpful for some.
-                    * Maintain a balanced diet.
-                5.  **Physical Activity Guidelines:**
-                    * Regular, moderate exercise can help reduce migraine frequency and severity.
-                    * Avoid intense exercise during an impending or active migraine attack.
-                    * Warm up and cool down properly.
-                6.  **Mental Health Considerations:**
-                    * Migraines can significantly impact quality of life and lead to anxiety or depression.
-                    * Seek counseling or therapy to cope with chronic pain and stress.
-                    * Support groups can provide a sense of community and shared experience.
-                *Disclaimer: This plan is for informational purposes only and is not a substitute for professional medical advice. Always consult a qualified healthcare provider for diagnosis and treatment of migraine.*
-                """
-            return "A personalized treatment plan cannot be generated with the provided information. Please ensure the condition and patient details are complete."
-
-        return "I am unable to generate a response for this request at the moment. Please try rephrasing your query."
-
-def init_granite_model():
+def current_patient_id():
     """
-    Initializes the mock IBM Granite model.
-    In a real scenario, this would involve authenticating with IBM Watson ML and
-    loading the Granite-13b-instruct-v2 model.
+    The vitals store patient of this session. Like the chat history it is
+    keyed by session, never by the free-text profile name.
     """
-    # Placeholder for actual IBM Watson ML client initialization
-    # from ibm_watson_machine_learning.foundation_models.utils.enums import ModelTypes
-    # from ibm_watson_machine_learning.foundation_models import Model
-    # model = Model(
-    #     model_id=ModelTypes.GRANITE_13B_INSTRUCT_V2,
-    #     params={...}, # Add necessary model parameters
-    #     credentials={
-    #         "url": "https://us-south.ml.cloud.ibm.com", # Or your region's endpoint
-    #         "apikey": WATSONX_API_KEY
-    #     },
-    #     project_id=WATSONX_PROJECT_ID
-    # )
-    return MockGraniteModel() # Return the mock model instance
-
-# Initialize the model once
-if 'granite_model' not in st.session_state:
-    st.session_state.granite_model = init_granite_model()
-    st.write(f"Connecting to IBM Watson ML (Mock)... API Key: {'*' * (len(WATSONX_API_KEY) - 4)}{WATSONX_API_KEY[-4:]}, Project ID: {WATSONX_PROJECT_ID}")
+    return st.session_state.vitals_patient_id
 
+def ingest_vitals_file(uploaded_file):
+    """Appends an uploaded CSV/Parquet/JSON vitals export to the current patient's store, chunk by chunk."""
+    from vitals_store import detect_format as detect_vitals_format
 
-# --- Core Functionalities ---
+    counts = get_service().vitals_store.ingest(current_patient_id(), uploaded_file,
+                                       detect_vitals_format(uploaded_file.name), source_name=uploaded_file.name)
+    st.session_state.vitals_detector_source = None # Older readings may have been backfilled: re-learn baselines
+    return counts
+
+# Analytics results are cached by (patient, date range, data version). The version
+# changes with every import, so new readings invalidate everything built from the
+# old ones, while reruns caused by other tabs only pay for a few cache lookups.
 
-def predict_disease(symptoms, patient_profile):
+def health_metrics_version():
     """
-    Mocks disease prediction using the Granite model.
+    Changes whenever the current patient's readings do: the store's file
+    listing for imported readings, or the content hash of the sample metrics.
     """
-    model = st.session_state.granite_model
-    prompt = f"""
-    As a medical AI assistant, predict potential health conditions based on the following patient data:
-
-    Current Symptoms: {symptoms}
-    Age: {patient_profile['age']}
-    Gender: {patient_profile['gender']}
-    Medical History: {patient_profile['medical_history'] if patient_profile['medical_history'] else 'None'}
-    Recent Health Metrics:
-    - (Mock data: Average Heart Rate: 70 bpm)
-    - (Mock data: Average Blood Pressure: 120/80 mmHg)
-    - (Mock data: Average Blood Glucose: 90 mg/dL)
-    - Recently Reported Symptoms: {symptoms}
-
-    Format your response as:
-    1. Potential condition name
-    2. Likelihood (High/Medium/Low)
-    3. Brief explanation
-    4. Recommended next steps
-
-    Provide the top 3 most likely conditions based on the data provided.
+    version = get_service().vitals_store.version(current_patient_id())
+    if version is None:
+        generate_sample_health_metrics()
+        version = st.session_state.sample_metrics_version
+    return version
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def vitals_date_bounds(patient_id, data_version):
+    """First and last stored reading of a patient (see VitalsStore.date_bounds)."""
+    return get_service().vitals_store.date_bounds(patient_id)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def read_vitals_range(patient_id, start, end, data_version):
+    """One patient's stored readings with start <= Date < end."""
+    return get_service().vitals_store.read_range(patient_id, start, end)
+
+def load_health_metrics(start=None, end=None, default_days=30):
     """
-    with st.spinner("Analyzing symptoms and predicting potential conditions..."):
-        prediction = model.generate_text(prompt)
-    return prediction
-
-def generate_treatment_plan(condition, patient_profile):
+    The current patient's readings with start <= Date < end, read from the
+    vitals store (by default the last `default_days` days on record). Falls
+    back to the sample metrics until the patient has imported any readings.
     """
-    Mocks treatment plan generation using the Granite model.
+    import pandas as pd
+
+    patient_id = current_patient_id()
+    version = get_service().vitals_store.version(patient_id)
+    if version is None:
+        return generate_sample_health_metrics()
+    if start is None and end is None:
+        start = vitals_date_bounds(patient_id, version)[1] - pd.Timedelta(days=default_days)
+    with telemetry.span("analytics.load"):
+        return read_vitals_range(patient_id, start, end, version)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def summarize_health_metrics(patient_id, start, end, data_version):
     """
-    model = st.session_state.granite_model
-    prompt = f"""
-    As a medical AI assistant, generate a personalized treatment plan for the following scenario:
-
-    Patient Profile:
-    - Condition: {condition}
-    - Age: {patient_profile['age']}
-    - Gender: {patient_profile['gender']}
-    - Medical History: {patient_profile['medical_history'] if patient_profile['medical_history'] else 'None'}
-
-    Create a comprehensive, evidence-based treatment plan that includes:
-    1. Recommended medications (include dosage guidelines if appropriate)
-    2. Lifestyle modifications
-    3. Follow-up testing and monitoring
-    4. Dietary recommendations
-    5. Physical activity guidelines
-    6. Mental health considerations
-
-    Format this as a clear, structured treatment plan that follows current medical guidelines while being personalized to this patient's specific needs.
+    Latest reading with its week-over-week deltas and threshold flags, for
+    every vital in one pass, or None if the range has no readings. The
+    readings are only loaded on a cache miss.
     """
-    with st.spinner(f"Generating personalized treatment plan for {condition}..."):
-        treatment_plan = model.generate_text(prompt)
-    return treatment_plan
+    return get_service().summarize_vitals(load_health_metrics(start, end))
 
-def answer_patient_query(query):
+@st.cache_data(max_entries=32, show_spinner=False)
+def build_health_figures(patient_id, start, end, max_points, data_version):
     """
-    Mocks answering patient health questions using the Granite model.
+    Heart rate, blood pressure and glucose trend figures, with every series
+    downsampled to at most `max_points` points before it reaches Plotly.
+    The readings are only loaded on a cache miss.
     """
-    model = st.session_state.granite_model
-    prompt = f"""
-    As a healthcare AI assistant, provide a helpful, accurate, and evidence-based response to the following patient question:
-
-    PATIENT QUESTION: {query}
-
-    Provide a clear, empathetic response that:
-    - Directly addresses the question
-    - Includes relevant medical facts
-    - Acknowledges limitations (when appropriate)
-    - Suggests when to seek professional medical advice
-    - Avoids making definitive diagnoses
-    - Uses accessible, non-technical language
-
-    RESPONSE:
+    health_metrics_df = load_health_metrics(start, end)
+    with telemetry.span("analytics.plotly"):
+        return _health_figures(health_metrics_df, max_points)
+
+def _health_figures(health_metrics_df, max_points):
+    import plotly.express as px
+    import plotly.graph_objects as go
+    from downsample import downsample_frame
+
+    def series(column):
+        return downsample_frame(health_metrics_df, 'Date', column, max_points, CHART_DOWNSAMPLING)
+
+    # Heart Rate Trend Line Chart
+    fig_hr = px.line(series('Heart Rate (bpm)'), x='Date', y='Heart Rate (bpm)', title='Heart Rate Trend',
+                     labels={'Heart Rate (bpm)': 'Heart Rate', 'Date': 'Date'},
+                     line_shape='spline')
+    fig_hr.add_hline(y=70, line_dash="dash", line_color="green", annotation_text="Average Healthy HR")
+
+    # Blood Pressure Dual-Line Chart
+    systolic = series('Systolic BP (mmHg)')
+    diastolic = series('Diastolic BP (mmHg)')
+    fig_bp = go.Figure()
+    fig_bp.add_trace(go.Scatter(x=systolic['Date'], y=systolic['Systolic BP (mmHg)'],
+                                mode='lines+markers', name='Systolic BP'))
+    fig_bp.add_trace(go.Scatter(x=diastolic['Date'], y=diastolic['Diastolic BP (mmHg)'],
+                                mode='lines+markers', name='Diastolic BP'))
+    fig_bp.update_layout(title='Blood Pressure Trend',
+                          yaxis_title='BP (mmHg)', xaxis_title='Date')
+    fig_bp.add_hrect(y0=120, y1=129, line_width=0, fillcolor="yellow", opacity=0.2, annotation_text="Elevated Systolic")
+    fig_bp.add_hrect(y0=80, y1=80, line_width=0, fillcolor="red", opacity=0.2, annotation_text="Elevated Diastolic")
+
+    # Blood Glucose Trend Line Chart
+    fig_glucose = px.line(series('Blood Glucose (mg/dL)'), x='Date', y='Blood Glucose (mg/dL)', title='Blood Glucose Trend',
+                          labels={'Blood Glucose (mg/dL)': 'Blood Glucose', 'Date': 'Date'},
+                          line_shape='spline')
+    fig_glucose.add_hline(y=100, line_dash="dash", line_color="red", annotation_text="Pre-diabetic Threshold")
+    return fig_hr, fig_bp, fig_glucose
+
+def detect_vitals_anomalies(days=7):
     """
-    with st.spinner("Thinking..."):
-        answer = model.generate_text(prompt=query)
-    return answer
-
-def generate_sample_health_metrics(num_days=30):
-    """Generates realistic-looking sample health metrics over a period."""
-    if not st.session_state.health_metrics.empty:
-        return st.session_state.health_metrics
-
-    dates = pd.to_datetime(pd.date_range(end=pd.Timestamp.now(), periods=num_days, freq='D'))
-
-    # Simulate variations for heart rate, BP, and glucose
-    heart_rate = np.random.normal(70, 5, num_days).astype(int)
-    systolic_bp = np.random.normal(120, 8, num_days).astype(int)
-    diastolic_bp = np.random.normal(80, 5, num_days).astype(int)
-    blood_glucose = np.random.normal(95, 10, num_days).astype(int)
-
-    # Add some anomalies for demonstration
-    if num_days > 5:
-        heart_rate[-3] += 15 # Spike
-        systolic_bp[-2] += 20 # Spike
-        blood_glucose[-4] += 30 # Spike
-
-    df = pd.DataFrame({
-        'Date': dates,
-        'Heart Rate (bpm)': heart_rate,
-        'Systolic BP (mmHg)': systolic_bp,
-        'Diastolic BP (mmHg)': diastolic_bp,
-        'Blood Glucose (mg/dL)': blood_glucose
-    })
-    df['BP'] = df['Systolic BP (mmHg)'].astype(str) + '/' + df['Diastolic BP (mmHg)'].astype(str)
-
-    st.session_state.health_metrics = df
-    return df
+    Feeds any new health metric readings to this session's streaming anomaly
+    detector and returns the anomalies of the last `days` days, newest first.
+    """
+    from anomaly import VitalsAnomalyDetector
+
+    source = (current_patient_id(), health_metrics_version())
+    previous = st.session_state.vitals_detector_source
+    readings = None # Nothing new to feed on reruns with unchanged readings
+    if source != previous:
+        if previous is None or previous[0] != source[0]:
+            st.session_state.vitals_detector = VitalsAnomalyDetector()
+        readings = load_health_metrics()
+        st.session_state.vitals_detector_source = source
+    return get_service().vitals_anomalies(readings, days, detector=st.session_state.vitals_detector)
 
 # --- UI Components ---
 
@@ -721,7 +491,7 @@ st.title("🩺 HealthAI - Intelligent Healthcare Assistant")
 
 # Sidebar for Patient Profile
 st.sidebar.header("Patient Profile")
-with st.sidebar.form("patient_profile_form"):
+with st.sidebar.form("patient_profile_form"), telemetry.span("sidebar"):
     st.session_state.patient_profile["name"] = st.text_input(
         "Name", value=st.session_state.patient_profile["name"]
     )
@@ -745,152 +515,304 @@ with st.sidebar.form("patient_profile_form"):
 
 # Main content area with tabs
 tab_names = ["Patient Chat", "Disease Prediction", "Treatment Plans", "Health Analytics"]
-tabs = st.tabs(tab_names)
-
-with tabs[0]: # Patient Chat
-    st.header("24/7 Patient Support")
-    st.write("Ask any health-related question for immediate assistance.")
-
-    # Display chat history
-    st.markdown('<div class="chat-container">', unsafe_allow_html=True)
-    for role, message in st.session_state.chat_history:
-        if role == "user":
-            st.markdown(f'<div class="chat-message-user">🙋‍♂️ You: {message}</div>', unsafe_allow_html=True)
+if COHORT_OVERVIEW: # Shows every patient's vitals (see config.COHORT_OVERVIEW)
+    tab_names.append("Cohort Overview")
+tabs = st.tabs(tab_names, key="active_tab", on_change="rerun") # Only the open tab's code runs
+
+if tabs[0].open:
+    with tabs[0], telemetry.span("tab.chat"): # Patient Chat
+        st.header("24/7 Patient Support")
+        st.write("Ask any health-related question for immediate assistance.")
+
+        sync_chat_history()
+        ai_response = collect_model_job("chat")
+        if ai_response is not None:
+            add_chat_message("ai", ai_response)
+
+        def chat_message_html(role, message):
+            if role == "user":
+                return f'<div class="chat-message-user">🙋‍♂️ You: {message}</div>'
+            return f'<div class="chat-message-ai">🤖 HealthAI: {message}</div>'
+
+        def chat_messages_html(turns):
+            """All turns as one HTML block, so a rerun renders one element however long the chat is."""
+            return ('<div class="chat-container">'
+                    + "".join(chat_message_html(role, message) for _, role, message in turns) + '</div>')
+
+        def render_ai_message(message):
+            st.markdown(chat_message_html("ai", message), unsafe_allow_html=True)
+
+        # Display chat history: the in-memory window, plus earlier turns paged in from disk on request
+        oldest_id = oldest_loaded_chat_id()
+        if oldest_id is not None and get_chat_history_store().before(st.session_state.chat_conversation, oldest_id, 1):
+            st.button("Load earlier messages", on_click=load_earlier_chat_messages)
+        if st.session_state.chat_earlier:
+            with st.expander(f"Earlier messages ({len(st.session_state.chat_earlier)})", expanded=True):
+                st.markdown(chat_messages_html(st.session_state.chat_earlier), unsafe_allow_html=True)
+        if st.session_state.chat_history:
+            st.markdown(chat_messages_html(st.session_state.chat_history), unsafe_allow_html=True)
+        show_model_job("chat", "Thinking...", render=render_ai_message)
+
+        user_query = st.text_input("Ask your health question...", key="patient_chat_input")
+        if st.button("Send Query"):
+            if user_query:
+                answer_patient_query(user_query) # Answer arrives in the background
+                add_chat_message("user", user_query)
+                st.rerun() # Rerun to clear input and update chat history
+        with st.expander("Resume a conversation"):
+            st.caption(f"Your conversation code is `{st.session_state.chat_token}`. Keep it, or bookmark "
+                       "this page, to come back to this conversation later.")
+            st.text_input("Conversation code", key="chat_resume_code")
+            st.button("Resume", on_click=resume_chat_conversation)
+            if st.session_state.pop("chat_resume_error", False):
+                st.warning("That is not a valid conversation code.")
+        semantic_stats = get_service().semantic_cache.stats()
+        if semantic_stats["hits"]:
+            st.caption(f"Semantic cache: {semantic_stats['hits']} of {semantic_stats['hits'] + semantic_stats['misses']} "
+                       f"questions answered from earlier ones ({semantic_stats['hit_rate']:.0%}), "
+                       f"{semantic_stats['saved_seconds']:.1f}s of model time saved.")
+
+if tabs[1].open:
+    with tabs[1], telemetry.span("tab.prediction"): # Disease Prediction
+        st.header("Disease Prediction System")
+        st.write("Enter symptoms and patient data to receive potential condition predictions.")
+
+        symptoms_input = st.text_area(
+            "Current Symptoms",
+            value="Describe symptoms in detail (e.g., persistent headache for 3 days, fatigue, mild fever of 99.5°F)",
+            height=150,
+            key="symptoms_input"
+        )
+
+        predicted_output = collect_model_job("prediction")
+        if predicted_output is not None:
+            # Parse once here; reruns render the stored records
+            st.session_state.prediction_text = predicted_output
+            st.session_state.predicted_conditions = get_service().ranked_conditions(predicted_output)
+
+        include_vitals = st.checkbox("Include recent vitals anomalies from Health Analytics", value=True)
+        if st.button("Generate Prediction"):
+            if symptoms_input:
+                from anomaly import prompt_findings
+                findings = prompt_findings(detect_vitals_anomalies()) if include_vitals else None
+                predict_disease(symptoms_input, st.session_state.patient_profile, findings)
+            else:
+                st.warning("Please enter symptoms to generate a prediction.")
+
+        if "prediction" in st.session_state.model_jobs:
+            st.subheader("Potential Conditions")
+            show_model_job("prediction", "Analyzing symptoms and predicting potential conditions...")
+        elif st.session_state.predicted_conditions:
+            st.subheader("Potential Conditions")
+            st.dataframe(as_columns(st.session_state.predicted_conditions), hide_index=True, width="stretch")
+        elif st.session_state.prediction_text:
+            st.subheader("Potential Conditions")
+            st.info(st.session_state.prediction_text)
+
+        st.subheader("Batch Prediction")
+        st.write("Upload a CSV or Parquet file of patient cases with a `symptoms` column "
+                 "(optionally `case_id`, `age`, `gender`, `medical_history`).")
+        batch_job = st.session_state.model_jobs.get("batch")
+        if collect_model_job("batch") is not None:
+            st.session_state.batch_predictions = batch_job.progress
+
+        batch_file = st.file_uploader("Patient Cases", type=["csv", "parquet"], key="batch_cases_file")
+        if st.button("Run Batch Prediction"):
+            if batch_file is not None:
+                predict_disease_batch(batch_file)
+            else:
+                st.warning("Please upload a file of patient cases.")
+
+        if "batch" in st.session_state.model_jobs:
+            show_model_job("batch", "Scoring patient cases...",
+                           render=lambda results: st.caption(f"{len(results)} cases scored..."))
+        elif st.session_state.batch_predictions is not None:
+            st.caption(f"{len(st.session_state.batch_predictions)} cases scored.")
+            st.download_button("Download Results (JSON Lines)", st.session_state.batch_predictions.read_bytes,
+                               file_name="predictions.jsonl", mime="application/jsonl")
+
+
+if tabs[2].open:
+    with tabs[2], telemetry.span("tab.treatment"): # Treatment Plans
+        st.header("Personalized Treatment Plan Generator")
+        st.write("Generate customized treatment recommendations based on specific conditions.")
+
+        medical_condition = st.text_input(
+            "Medical Condition",
+            value="Mouth Ulcer", # Example pre-fill
+            key="medical_condition_input"
+        )
+
+        treatment_plan = collect_model_job("treatment")
+        if treatment_plan is not None:
+            st.session_state.generated_treatment_plan = treatment_plan
+
+        if st.button("Generate Treatment Plan"):
+            if medical_condition:
+                generate_treatment_plan(medical_condition, st.session_state.patient_profile)
+            else:
+                st.warning("Please enter a medical condition to generate a treatment plan.")
+
+        if "treatment" in st.session_state.model_jobs:
+            st.subheader("Personalized Treatment Plan")
+            show_model_job("treatment", f"Generating personalized treatment plan for {medical_condition}...")
+        elif st.session_state.generated_treatment_plan:
+            st.subheader("Personalized Treatment Plan")
+            st.markdown(st.session_state.generated_treatment_plan)
+
+if tabs[3].open:
+    with tabs[3], telemetry.span("tab.analytics"): # Health Analytics
+        import pandas as pd
+        from anomaly import insights_markdown
+
+        st.header("Health Analytics Dashboard")
+        st.write("Visualize your vital signs over time and receive AI-generated insights.")
+
+        with st.expander("Import Vitals"):
+            st.write("Upload CSV, Parquet or JSON exports from a wearable or home monitor. Readings are "
+                     "added to this session's history.")
+            vitals_files = st.file_uploader("Vitals Exports", type=["csv", "parquet", "json", "jsonl", "ndjson"],
+                                            accept_multiple_files=True, key="vitals_files")
+            if st.button("Import Vitals"):
+                if vitals_files:
+                    for vitals_file in vitals_files:
+                        try:
+                            counts = ingest_vitals_file(vitals_file)
+                            st.success(f"{vitals_file.name}: {counts['rows']} readings imported, "
+                                       f"{counts['rejected']} rejected.")
+                        except ValueError as e:
+                            st.error(f"{vitals_file.name}: {e}")
+                else:
+                    st.warning("Please upload at least one vitals file.")
+
+        # Select a date range of the imported readings, or show sample metrics if there are none
+        store_version = get_service().vitals_store.version(current_patient_id())
+        start = end = None
+        if store_version is None:
+            st.caption("Showing sample data. Import your own readings above.")
         else:
-            st.markdown(f'<div class="chat-message-ai">🤖 HealthAI: {message}</div>', unsafe_allow_html=True)
-    st.markdown('</div>', unsafe_allow_html=True)
-
-    user_query = st.text_input("Ask your health question...", key="patient_chat_input")
-    if st.button("Send Query"):
-        if user_query:
-            st.session_state.chat_history.append(("user", user_query))
-            ai_response = answer_patient_query(user_query)
-            st.session_state.chat_history.append(("ai", ai_response))
-            st.rerun() # Rerun to clear input and update chat history
-
-with tabs[1]: # Disease Prediction
-    st.header("Disease Prediction System")
-    st.write("Enter symptoms and patient data to receive potential condition predictions.")
-
-    symptoms_input = st.text_area(
-        "Current Symptoms",
-        value="Describe symptoms in detail (e.g., persistent headache for 3 days, fatigue, mild fever of 99.5°F)",
-        height=150,
-        key="symptoms_input"
-    )
-
-    if st.button("Generate Prediction"):
-        if symptoms_input:
-            predicted_output = predict_disease(symptoms_input, st.session_state.patient_profile)
-            st.session_state.predicted_conditions = predicted_output.split('\n\n') # Split into individual conditions
+            bounds = vitals_date_bounds(current_patient_id(), store_version)
+            first_day, last_day = bounds[0].date(), bounds[1].date()
+            default_start = max(first_day, (bounds[1] - pd.Timedelta(days=30)).date())
+            date_range = st.date_input("Date Range", value=(default_start, last_day),
+                                       min_value=first_day, max_value=last_day, key="vitals_date_range")
+            start = pd.Timestamp(date_range[0])
+            if len(date_range) == 2:
+                end = pd.Timestamp(date_range[1]) + pd.Timedelta(days=1)
+            # else only the start date is picked so far
+
+        data_version = health_metrics_version()
+        latest = summarize_health_metrics(current_patient_id(), start, end, data_version)
+        if latest is not None:
+            st.subheader("Health Metrics Trends")
+
+            fig_hr, fig_bp, fig_glucose = build_health_figures(current_patient_id(), start, end, CHART_MAX_POINTS,
+                                                               data_version)
+            st.plotly_chart(fig_hr, width="stretch")
+            st.plotly_chart(fig_bp, width="stretch")
+            st.plotly_chart(fig_glucose, width="stretch")
+
+            st.subheader("Health Metrics Summary")
+            col1, col2, col3 = st.columns(3)
+
+            # Each vital's latest reading, week-over-week delta and threshold status (cached with the figures)
+            def reading_text(*values, unit):
+                if any(pd.isna(value) for value in values):
+                    return "No reading"
+                return "/".join(f"{value:.0f}" for value in values) + f" {unit}"
+
+            def delta_text(delta):
+                return None if pd.isna(delta) else f"{delta:.1f} from last week"
+
+            def status_text(abnormal, label="Abnormal"):
+                return "No reading" if abnormal is None else label if abnormal else "Normal"
+
+            with col1:
+                st.metric(label="Current Heart Rate", value=reading_text(latest['Heart Rate (bpm)'], unit="bpm"),
+                          delta=delta_text(latest['heart_rate_delta']))
+                st.write(f"Status: **{status_text(latest['heart_rate_abnormal'])}**")
+            with col2:
+                st.metric(label="Current Blood Pressure",
+                          value=reading_text(latest['Systolic BP (mmHg)'], latest['Diastolic BP (mmHg)'], unit="mmHg"))
+                st.write(f"Status: **{status_text(latest['bp_abnormal'], 'Elevated/High')}**")
+            with col3:
+                st.metric(label="Current Blood Glucose", value=reading_text(latest['Blood Glucose (mg/dL)'], unit="mg/dL"),
+                          delta=delta_text(latest['glucose_delta']))
+                st.write(f"Status: **{status_text(latest['glucose_abnormal'])}**")
+
+            st.subheader("AI-Generated Insights")
+            st.write("Spikes and trend shifts detected in your readings over the last 7 days:")
+            st.info(insights_markdown(detect_vitals_anomalies()))
         else:
-            st.warning("Please enter symptoms to generate a prediction.")
-
-    if st.session_state.predicted_conditions:
-        st.subheader("Potential Conditions")
-        for condition_info in st.session_state.predicted_conditions:
-            st.markdown(f"**{condition_info}**")
-
-
-with tabs[2]: # Treatment Plans
-    st.header("Personalized Treatment Plan Generator")
-    st.write("Generate customized treatment recommendations based on specific conditions.")
-
-    medical_condition = st.text_input(
-        "Medical Condition",
-        value="Mouth Ulcer", # Example pre-fill
-        key="medical_condition_input"
-    )
-
-    if st.button("Generate Treatment Plan"):
-        if medical_condition:
-            st.session_state.generated_treatment_plan = generate_treatment_plan(medical_condition, st.session_state.patient_profile)
+            st.write("No readings in the selected date range.")
+
+if COHORT_OVERVIEW and tabs[4].open:
+    with tabs[4], telemetry.span("tab.cohort"): # Cohort Overview
+        import pandas as pd
+        import plotly.express as px
+        from cohort import WEEK
+
+        st.header("Cohort Overview")
+        st.write("Every patient with imported vitals, ranked by how many vitals are currently outside the normal "
+                 "range (HR 60-100, BP below 130/80, glucose 70-100), then by their share of abnormal readings "
+                 "over the last 7 days.")
+
+        cohort = get_service().vitals_store.cohort
+        if get_service().cohort_refreshing():
+            st.caption("Updating patients whose readings changed outside the app; rankings may be behind.")
+        cohort_filters = {"Abnormal heart rate": "heart_rate", "Elevated blood pressure": "bp",
+                          "Abnormal blood glucose": "glucose"}
+        selected_filters = st.multiselect("Only patients with", list(cohort_filters), key="cohort_filters")
+        flags = [cohort_filters[label] for label in selected_filters]
+
+        with telemetry.span("cohort.query"):
+            matching = cohort.count(flags)
+        if matching == 0:
+            st.write("No patients match." if flags else
+                     "No imported vitals yet. Import readings for a patient in the Health Analytics tab.")
         else:
-            st.warning("Please enter a medical condition to generate a treatment plan.")
-
-    if st.session_state.generated_treatment_plan:
-        st.subheader("Personalized Treatment Plan")
-        st.markdown(st.session_state.generated_treatment_plan)
-
-with tabs[3]: # Health Analytics
-    st.header("Health Analytics Dashboard")
-    st.write("Visualize your vital signs over time and receive AI-generated insights.")
-
-    # Generate or load health metrics
-    health_metrics_df = generate_sample_health_metrics()
-
-    if not health_metrics_df.empty:
-        st.subheader("Health Metrics Trends")
-
-        # Heart Rate Trend Line Chart
-        fig_hr = px.line(health_metrics_df, x='Date', y='Heart Rate (bpm)', title='Heart Rate Trend',
-                         labels={'Heart Rate (bpm)': 'Heart Rate', 'Date': 'Date'},
-                         line_shape='spline')
-        fig_hr.add_hline(y=70, line_dash="dash", line_color="green", annotation_text="Average Healthy HR")
-        st.plotly_chart(fig_hr, use_container_width=True)
-
-        # Blood Pressure Dual-Line Chart
-        fig_bp = go.Figure()
-        fig_bp.add_trace(go.Scatter(x=health_metrics_df['Date'], y=health_metrics_df['Systolic BP (mmHg)'],
-                                    mode='lines+markers', name='Systolic BP'))
-        fig_bp.add_trace(go.Scatter(x=health_metrics_df['Date'], y=health_metrics_df['Diastolic BP (mmHg)'],
-                                    mode='lines+markers', name='Diastolic BP'))
-        fig_bp.update_layout(title='Blood Pressure Trend',
-                              yaxis_title='BP (mmHg)', xaxis_title='Date')
-        fig_bp.add_hrect(y0=120, y1=129, line_width=0, fillcolor="yellow", opacity=0.2, annotation_text="Elevated Systolic")
-        fig_bp.add_hrect(y0=80, y1=80, line_width=0, fillcolor="red", opacity=0.2, annotation_text="Elevated Diastolic")
-        st.plotly_chart(fig_bp, use_container_width=True)
-
-        # Blood Glucose Trend Line Chart
-        fig_glucose = px.line(health_metrics_df, x='Date', y='Blood Glucose (mg/dL)', title='Blood Glucose Trend',
-                              labels={'Blood Glucose (mg/dL)': 'Blood Glucose', 'Date': 'Date'},
-                              line_shape='spline')
-        fig_glucose.add_hline(y=100, line_dash="dash", line_color="red", annotation_text="Pre-diabetic Threshold")
-        st.plotly_chart(fig_glucose, use_container_width=True)
-
-        st.subheader("Health Metrics Summary")
-        col1, col2, col3 = st.columns(3)
-
-        # Calculate current values and basic trends
-        current_hr = health_metrics_df['Heart Rate (bpm)'].iloc[-1]
-        avg_hr_prev_week = health_metrics_df['Heart Rate (bpm)'].iloc[-8:-1].mean()
-        hr_delta = current_hr - avg_hr_prev_week
-        hr_status = "Normal" if 60 <= current_hr <= 100 else "Abnormal"
-
-        current_systolic = health_metrics_df['Systolic BP (mmHg)'].iloc[-1]
-        current_diastolic = health_metrics_df['Diastolic BP (mmHg)'].iloc[-1]
-
-        current_glucose = health_metrics_df['Blood Glucose (mg/dL)'].iloc[-1]
-        avg_glucose_prev_week = health_metrics_df['Blood Glucose (mg/dL)'].iloc[-8:-1].mean()
-        glucose_delta = current_glucose - avg_glucose_prev_week
-        glucose_status = "Normal" if 70 <= current_glucose <= 100 else "Abnormal"
-
-
-        with col1:
-            st.metric(label="Current Heart Rate", value=f"{current_hr} bpm", delta=f"{hr_delta:.1f} from last week")
-            st.write(f"Status: **{hr_status}**")
-        with col2:
-            st.metric(label="Current Blood Pressure", value=f"{current_systolic}/{current_diastolic} mmHg")
-            bp_status = "Normal"
-            if current_systolic >= 130 or current_diastolic >= 80:
-                bp_status = "Elevated/High"
-            st.write(f"Status: **{bp_status}**")
-        with col3:
-            st.metric(label="Current Blood Glucose", value=f"{current_glucose} mg/dL", delta=f"{glucose_delta:.1f} from last week")
-            st.write(f"Status: **{glucose_status}**")
-
-        st.subheader("AI-Generated Insights (Mock)")
-        st.info("""
-        Based on your recent health metrics, your heart rate is generally stable, but we observed a slight increase in the last few days.
-        Your blood pressure is currently within a healthy range. Blood glucose levels show a recent minor spike; ensuring consistent diet is recommended.
-        **Recommendations:**
-        * Continue to monitor heart rate, especially if you notice palpitations or shortness of breath.
-        * Maintain your current lifestyle to keep blood pressure healthy.
-        * Focus on consistent meal timings and balanced nutrition to stabilize blood glucose. If spikes persist, consult your doctor.
-        """)
-    else:
-        st.write("No health metrics data available. Generate sample data or upload yours.")
+            page_size = 50
+            pages = (matching + page_size - 1) // page_size
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key="cohort_page")
+            with telemetry.span("cohort.query"):
+                ranked = cohort.ranked(flags, limit=page_size, offset=(page - 1) * page_size)
+            st.caption(f"{matching} patients")
+            st.dataframe(pd.DataFrame({
+                "Patient": ranked["patient"],
+                "Heart Rate (bpm)": ranked["heart_rate"],
+                "Blood Pressure (mmHg)": [f"{s:.0f}/{d:.0f}" if pd.notna(s) and pd.notna(d) else ""
+                                          for s, d in zip(ranked["systolic"], ranked["diastolic"])],
+                "Blood Glucose (mg/dL)": ranked["glucose"].round(0),
+                "Abnormal Vitals": ranked["abnormal_count"],
+                "Abnormal Readings (7 days)": (ranked["week_abnormal_share"] * 100).round(1).astype(str) + "%",
+                "Last Reading": ranked["last_reading"],
+            }), hide_index=True, width="stretch")
+
+            trend_patient = st.selectbox("Weekly trends for", ranked["patient"], key="cohort_trend_patient")
+            weekly = cohort.rollups(trend_patient, WEEK)
+            if not weekly.empty:
+                fig_weekly = px.line(weekly, x='start', y='mean', color='vital', markers=True,
+                                     title=f'Weekly Averages for {trend_patient}',
+                                     labels={'start': 'Week', 'mean': 'Weekly Mean', 'vital': 'Vital'})
+                st.plotly_chart(fig_weekly, width="stretch")
 
 # --- Footer ---
 st.markdown("---")
 st.markdown("HealthAI is powered by intelligent AI and aims to provide helpful health information. Always consult a healthcare professional for diagnosis and treatment.")
+
+# --- Developer Overlay ---
+rerun_timing = telemetry.finish_rerun(session=st.session_state.chat_session_id)
+if METRICS_OVERLAY and rerun_timing is not None:
+    with st.sidebar.expander("Developer: Timings"):
+        rerun_seconds, stages = rerun_timing
+        st.caption(f"This rerun: {rerun_seconds * 1000:.1f} ms")
+        st.text("\n".join(f"{'  ' * depth}{stage:<{28 - 2 * depth}}{seconds * 1000:9.1f} ms"
+                           for stage, depth, seconds in stages))
+        summary = [("rerun", telemetry.histogram("healthai_rerun_seconds"))]
+        summary += [(dict(labels)["stage"], h)
+                    for labels, h in sorted(telemetry.histograms("healthai_stage_seconds").items())]
+        summary += [("model " + dict(labels)["method"], h)
+                    for labels, h in sorted(telemetry.histograms("healthai_model_call_seconds").items())]
+        st.caption("Process-wide p50 / p95 (ms)")
+        st.text("\n".join(f"{name:<28}{h.quantile(0.5) * 1000:9.1f}{h.quantile(0.95) * 1000:9.1f}  n={h.count}"
+                           for name, h in summary if h is not None))
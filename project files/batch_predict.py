@@ -0,0 +1,233 @@
+"""
+Batch disease prediction over a CSV or Parquet file of patient cases.
+
+Rows are streamed from the input (never loaded whole), turned into prompts
+with the same template as the Disease Prediction tab, and scored with
+bounded concurrency. Each result (raw answer plus parsed conditions) is
+appended to a JSON Lines file as soon as it is ready, so a crashed or
+interrupted run can be resumed: rows that already have a successful
+result in the output file are skipped. The file is first rewritten with
+just those results, one per row, so the rows scored again (failed or never
+finished) end up with exactly one record each. Neither pass holds more
+than the set of finished row indices in memory.
+
+Input columns: `symptoms` (required), and optionally `case_id`, `age`,
+`gender` and `medical_history`.
+
+Usage (from the `project files` directory):
+    python batch_predict.py intake.csv predictions.jsonl --workers 16
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from granite import MockGraniteModel, parse_latency_profile
+from model_client import ModelClient
+from predictions import parse_predictions
+from prompts import build_prediction_prompt
+from response_cache import CachedModel, ResponseCache
+
+PARQUET_BATCH_ROWS = 4096
+
+
+# --- Reading Input ---
+def detect_format(name):
+    ext = os.path.splitext(name)[1].lower()
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    if ext == ".csv":
+        return "csv"
+    raise ValueError(f"Unsupported input file {name!r}; expected .csv or .parquet")
+
+
+def read_rows(source, fmt):
+    """
+    Yields input rows as dicts. `source` is a path or a binary file object
+    (e.g. a Streamlit upload).
+    """
+    if fmt == "csv":
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, newline="", encoding="utf-8") as f:
+                yield from csv.DictReader(f)
+        else:
+            yield from csv.DictReader(io.TextIOWrapper(source, encoding="utf-8", newline=""))
+    elif fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Reading Parquet input requires pyarrow (pip install pyarrow)") from e
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=PARQUET_BATCH_ROWS):
+            yield from batch.to_pylist()
+    else:
+        raise ValueError(f"Unknown input format {fmt!r}")
+
+
+def row_profile(row):
+    """Patient profile dict (as used by the prompt template) for one input row."""
+    return {
+        "age": row.get("age") or 0,
+        "gender": row.get("gender") or "Unknown",
+        "medical_history": row.get("medical_history") or "",
+    }
+
+
+# --- Scoring ---
+def predict_row(model, index, row, references=None):
+    """
+    Scores one row; failures are captured in the record instead of raised.
+    `references` optionally maps the symptoms to a reference section for the prompt.
+    """
+    record = {"row": index, "case_id": row.get("case_id"), "status": "ok"}
+    start = time.perf_counter()
+    try:
+        symptoms = (row.get("symptoms") or "").strip()
+        if not symptoms:
+            raise ValueError("missing symptoms")
+        prompt = build_prediction_prompt(symptoms, row_profile(row),
+                                         references=references(symptoms) if references else "")
+        prediction = model.generate_text(prompt)
+        record["prediction"] = prediction
+        record["conditions"] = [p.to_dict() for p in parse_predictions(prediction)]
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return record
+
+
+def predict_rows(rows, model, max_workers=8, skip=frozenset(), references=None):
+    """
+    Yields one result record per row, in completion order. At most
+    `max_workers` rows are scored at once and at most twice that many are
+    held in memory. Row indices in `skip` are not scored.
+    """
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="batch-predict")
+    pending = set()
+    try:
+        for index, row in enumerate(rows):
+            if index in skip:
+                continue
+            if len(pending) >= max_workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            pending.add(pool.submit(predict_row, model, index, row, references))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+# --- Output and Resume ---
+class ResultsFile:
+    """
+    JSON Lines output that records are appended to as they arrive, with
+    running counts by status, so progress never needs a rescan of the file.
+    """
+    __slots__ = ("path", "counts")
+
+    def __init__(self, path):
+        self.path = path
+        self.counts = {"ok": 0, "error": 0}
+
+    def __len__(self):
+        return self.counts["ok"] + self.counts["error"]
+
+    def write(self, records, mode="w"):
+        """Appends each record to the file (truncated first unless mode="a"), yielding it once written."""
+        with open(self.path, mode, encoding="utf-8") as out:
+            for record in records:
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                self.counts[record["status"]] += 1
+                yield record
+
+    def read_bytes(self):
+        with open(self.path, "rb") as f:
+            return f.read()
+
+
+def _records(output_path):
+    """Yields (line, record) for each complete line of `output_path`."""
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Partially written last line of an interrupted run
+            yield line if line.endswith("\n") else line + "\n", record
+
+
+def prepare_resume(output_path):
+    """
+    Rewrites `output_path` with only its successful records, the first one
+    of each row, and returns their row indices. Every other row is scored
+    again and appended once. The file is streamed; only row indices are
+    kept in memory.
+    """
+    if not os.path.exists(output_path):
+        return set()
+    done = set()
+    tmp = output_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as out:
+        for line, record in _records(output_path):
+            if record.get("status") == "ok" and record["row"] not in done:
+                done.add(record["row"])
+                out.write(line)
+    os.replace(tmp, output_path)
+    return done
+
+
+def run_batch(input_path, output_path, model, max_workers=8, fmt=None, resume=True, references=None):
+    """Scores every not-yet-done row of `input_path`, appending results to `output_path`."""
+    skip = prepare_resume(output_path) if resume else set()
+    results = ResultsFile(output_path)
+    rows = read_rows(input_path, fmt or detect_format(input_path))
+    records = predict_rows(rows, model, max_workers=max_workers, skip=skip, references=references)
+    for _ in results.write(records, "a" if resume else "w"):
+        pass
+    return {**results.counts, "skipped": len(skip)}
+
+
+def build_model(latency, max_workers):
+    """Mock Granite backend behind the shared client and an in-process response cache."""
+    client = ModelClient(MockGraniteModel(latency=parse_latency_profile(latency)), max_concurrency=max_workers)
+    return CachedModel(client, ResponseCache(max_entries=10000, ttl_seconds=None))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch disease prediction over CSV/Parquet patient cases.")
+    parser.add_argument("input", help="CSV or Parquet file with a `symptoms` column")
+    parser.add_argument("output", help="JSON Lines file to append results to")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent model calls (default: 8)")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="Input format (default: from extension)")
+    parser.add_argument("--latency", default=os.getenv("GRANITE_LATENCY", "zero"),
+                        help="Mock backend latency profile (default: $GRANITE_LATENCY or zero)")
+    parser.add_argument("--no-resume", action="store_true", help="Overwrite the output instead of resuming")
+    parser.add_argument("--knowledge-index", help="Ground prompts in this retrieval index (see retrieval.py)")
+    args = parser.parse_args(argv)
+
+    model = build_model(args.latency, args.workers)
+    references = None
+    if args.knowledge_index:
+        from retrieval import KnowledgeIndex
+        index = KnowledgeIndex(args.knowledge_index)
+        references = lambda symptoms: index.grounding(symptoms, "prediction")  # noqa: E731
+    start = time.perf_counter()
+    counts = run_batch(args.input, args.output, model, max_workers=args.workers,
+                       fmt=args.format, resume=not args.no_resume, references=references)
+    elapsed = time.perf_counter() - start
+    print(f"{counts['ok']} ok, {counts['error']} errors, {counts['skipped']} already done "
+          f"in {elapsed:.1f}s", file=sys.stderr)
+    return 1 if counts["error"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
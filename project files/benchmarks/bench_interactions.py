@@ -0,0 +1,60 @@
+"""
+Latency benchmark for interactions.InteractionChecker.
+
+Times single drug-pair lookups over every pair of drugs in the lexicon, and
+full screens of each curated treatment plan against a profile with several
+medications, allergies and conditions. Pair checks should take a few
+microseconds, and a whole plan about a millisecond.
+
+Run from the `project files` directory:
+    python benchmarks/bench_interactions.py [--repeat 20]
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from granite import RESPONSES  # noqa: E402
+from interactions import DRUGS, InteractionChecker  # noqa: E402
+
+PROFILE = {
+    "current_medications": "Warfarin 5 mg daily, lithium, sertraline 50 mg, metformin",
+    "allergies": "Penicillin; aspirin; sulfa drugs",
+    "medical_history": "Asthma, chronic kidney disease, type 2 diabetes",
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    checker = InteractionChecker()
+    print(f"compiled tables in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    pairs = list(itertools.combinations(DRUGS, 2))
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        hits = sum(checker.check_pair(a, b) is not None for a, b in pairs)
+    per_pair = (time.perf_counter() - start) / (args.repeat * len(pairs)) * 1e6
+    print(f"{len(pairs)} pairs ({hits} interacting): {per_pair:.2f} us per pair")
+
+    plans = [text for response_id, text in RESPONSES.items() if response_id.startswith("treatment.")]
+    timings = []
+    for _ in range(args.repeat):
+        for plan in plans:
+            start = time.perf_counter()
+            checker.screen(PROFILE, plan)
+            timings.append((time.perf_counter() - start) * 1000)
+    p50, p99 = np.percentile(timings, [50, 99])
+    print(f"screen plan + profile: p50 {p50:.3f} ms, p99 {p99:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
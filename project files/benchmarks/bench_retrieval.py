@@ -0,0 +1,76 @@
+"""
+Latency benchmark for retrieval.KnowledgeIndex.
+
+Indexes a synthetic corpus (Zipf-distributed words, 80 per document), then
+reopens it memory-mapped, as the app does, and times searches of 2-5 word
+queries. The target is well under 10 ms per query at 100k documents.
+
+Run from the `project files` directory:
+    python benchmarks/bench_retrieval.py [--documents 100000] [--embedder hashed:256]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from retrieval import Document, KnowledgeIndex, build_index  # noqa: E402
+
+VOCABULARY = 30_000
+WORDS_PER_DOCUMENT = 80
+QUERIES = 1000
+
+
+def synthetic_documents(n, seed=0):
+    rng = np.random.default_rng(seed)
+    words = np.array([f"term{i}" for i in range(VOCABULARY)])
+    ranks = np.minimum(rng.zipf(1.2, size=(n, WORDS_PER_DOCUMENT)), VOCABULARY) - 1
+    kinds = ("chat", "prediction", "treatment", "reference")
+    return [Document(f"doc{i}", kinds[i % len(kinds)], " ".join(words[ranks[i, :4]]), " ".join(words[ranks[i]]))
+            for i in range(n)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=100_000)
+    parser.add_argument("--embedder", help="Also build and query an embedding index, e.g. hashed:256")
+    args = parser.parse_args(argv)
+
+    documents = synthetic_documents(args.documents)
+    rng = np.random.default_rng(1)
+    queries = [" ".join(documents[i].text.split()[j:j + n])
+               for i, j, n in zip(rng.integers(0, len(documents), QUERIES),
+                                  rng.integers(0, WORDS_PER_DOCUMENT - 5, QUERIES),
+                                  rng.integers(2, 6, QUERIES))]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index")
+        start = time.perf_counter()
+        build_index(path, documents, args.embedder)
+        print(f"built index of {len(documents)} documents in {time.perf_counter() - start:.1f}s")
+
+        start = time.perf_counter()
+        index = KnowledgeIndex(path)
+        print(f"opened (memory-mapped) in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        print(f"{'mode':>14} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+        modes = [("bm25", dict(hybrid=False)), ("bm25 + kind", dict(hybrid=False, kinds=["chat", "reference"]))]
+        if args.embedder:
+            modes.append(("hybrid", dict(hybrid=True)))
+        for name, options in modes:
+            timings = []
+            for query in queries:
+                start = time.perf_counter()
+                index.search(query, k=3, **options)
+                timings.append((time.perf_counter() - start) * 1000)
+            p50, p99 = np.percentile(timings, [50, 99])
+            print(f"{name:>14} {p50:8.2f} {p99:8.2f} {max(timings):8.2f}")
+        del index
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark for the compiled keyword-rule matcher in granite.py.
+
+Grows the rule table from the shipped ~30 rules to thousands of synthetic
+ones and times matching a fixed prompt with the Aho-Corasick matcher and
+with the old linear `"x" in prompt` ladder. The prompt matches no rule,
+which is the worst case for the ladder (every rule is checked). Matcher cost should stay flat
+while the linear scan grows with the rule count.
+
+Run from the `project files` directory:
+    python benchmarks/bench_rule_matcher.py
+"""
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from granite import INTENTS, RULES, KeywordMatcher  # noqa: E402
+
+PROMPT = """
+    As a medical AI assistant, predict potential health conditions based on the following patient data:
+
+    Current Symptoms: itchy rash on both forearms for a week, mild joint stiffness in the mornings
+    Age: 42
+    Gender: Female
+    Medical History: Asthma
+""".lower()
+
+
+def synthetic_rules(count, seed=7):
+    """Shipped rules padded with random multi-keyword rules that never match."""
+    rng = random.Random(seed)
+    rules = list(RULES)
+    while len(rules) < count:
+        keywords = tuple(
+            "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(6, 14)))
+            for _ in range(rng.randint(1, 4))
+        )
+        rules.append(("prediction", keywords, f"synthetic.{len(rules)}"))
+    return rules
+
+
+def linear_match(rules, prompt):
+    """The old if/elif ladder: first rule whose keywords all occur wins."""
+    for intent, keywords, response_id in rules:
+        if intent == "prediction" and all(k in prompt for k in keywords):
+            return response_id
+    return None
+
+
+def time_per_call(fn, repeat=200):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    print(f"{'rules':>7} {'build ms':>9} {'matcher us':>11} {'linear us':>10}")
+    for count in (30, 100, 300, 1000, 3000, 10000):
+        rules = synthetic_rules(count)
+        start = time.perf_counter()
+        matcher = KeywordMatcher(rules, markers=[marker for _, marker, _, _ in INTENTS])
+        build_ms = (time.perf_counter() - start) * 1e3
+        matcher_us = time_per_call(lambda: matcher.best_rule(matcher.scan(PROMPT), "prediction"))
+        linear_us = time_per_call(lambda: linear_match(rules, PROMPT))
+        print(f"{count:>7} {build_ms:>9.1f} {matcher_us:>11.1f} {linear_us:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
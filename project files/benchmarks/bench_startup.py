@@ -0,0 +1,116 @@
+"""
+Cold-start benchmark of the Streamlit app.
+
+Every sample is a fresh interpreter (as on a newly started pod) that
+imports Streamlit, runs `app.py` once with AppTest (first paint: the
+default Patient Chat tab is rendered), then opens the Health Analytics tab
+(first paint of the analytics stack). It reports the median of each, and
+which heavy modules (pandas, pyarrow, plotly.express) were loaded by the
+first paint; none should be until an analytics tab is opened.
+
+With --imports N, one more sample runs under `python -X importtime` and
+lists the N slowest imports made while running the app script.
+
+First paint here is the script run alone: a real server adds the
+websocket round trip and the browser's rendering on top.
+
+Run from the `project files` directory:
+    python benchmarks/bench_startup.py [--repeat 5] [--imports 10]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(PROJECT_DIR, "app.py")
+HEAVY_MODULES = ("pandas", "pyarrow", "plotly.express")
+APP_MARKER = "--- app script ---"
+
+
+def sample():
+    """One cold start, in this (fresh) process. Returns its timings in seconds."""
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+    result = {"import_streamlit": time.perf_counter() - start}
+
+    at = AppTest.from_file(APP_PATH, default_timeout=120)
+    print(APP_MARKER, file=sys.stderr, flush=True)
+    start = time.perf_counter()
+    at.run()
+    result["first_paint"] = time.perf_counter() - start
+    result["loaded_at_first_paint"] = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    at.session_state["active_tab"] = "Health Analytics"
+    start = time.perf_counter()
+    at.run()
+    result["analytics_first_paint"] = time.perf_counter() - start
+    result["errors"] = [e.value for e in at.exception]
+    return result
+
+
+def run_sample(env, importtime=False):
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + [os.path.abspath(__file__), "--sample"]
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=PROJECT_DIR, env=env, capture_output=True, text=True, check=True)
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["process"] = time.perf_counter() - start
+    return result, completed.stderr
+
+
+def slowest_imports(stderr, count):
+    """The `count` slowest top-level imports (cumulative microseconds) logged after the app marker."""
+    _, _, log = stderr.partition(APP_MARKER)
+    imports = []
+    for line in log.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if name.startswith(" ") and not name.startswith("  "):  # Imported by the script, not by a module
+            imports.append((int(cumulative), name.strip()))
+    return sorted(imports, reverse=True)[:count]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start import time and first-paint latency of the app.")
+    parser.add_argument("--repeat", type=int, default=5, help="Cold starts to sample (default: 5)")
+    parser.add_argument("--imports", type=int, default=0, metavar="N", help="List the N slowest app imports")
+    parser.add_argument("--sample", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.sample:
+        print(json.dumps(sample()))
+        return 0
+
+    workdir = tempfile.mkdtemp(prefix="healthai-startup-")
+    env = dict(os.environ, STREAMLIT_LOGGER_LEVEL="error")
+    env.setdefault("CHAT_HISTORY_PATH", os.path.join(workdir, "chat_history.sqlite"))
+    env.setdefault("VITALS_STORE_PATH", os.path.join(workdir, "vitals_store"))
+    env.setdefault("KNOWLEDGE_INDEX_PATH", os.path.join(workdir, "knowledge_index"))
+
+    samples = [run_sample(env)[0] for _ in range(args.repeat)]
+    for result in samples:
+        if result["errors"]:
+            print(f"app raised: {result['errors'][0]}", file=sys.stderr)
+            return 1
+    for key in ("process", "import_streamlit", "first_paint", "analytics_first_paint"):
+        values = [result[key] * 1000 for result in samples]
+        print(f"{key:<24}median {np.median(values):8.0f} ms   min {min(values):8.0f} ms")
+    loaded = sorted({name for result in samples for name in result["loaded_at_first_paint"]})
+    print(f"heavy modules loaded by first paint: {', '.join(loaded) or 'none'}")
+
+    if args.imports:
+        _, stderr = run_sample(env, importtime=True)
+        print("slowest imports during the app's first runs:")
+        for microseconds, name in slowest_imports(stderr, args.imports):
+            print(f"  {microseconds / 1000:8.1f} ms  {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,48 @@
+"""
+Scaling benchmark for analytics.compute_vitals_analytics.
+
+Builds seeded synthetic vitals (see synthetic_vitals) for a growing number
+of patients and times the full analytics pass. Throughput (rows/second)
+should stay roughly constant, i.e. the time grows linearly with the number
+of readings. The default is one day of minute-level readings per patient;
+`--freq D --days 30 --patients 1000 10000 20000` covers cohort-scale daily data.
+
+Run from the `project files` directory:
+    python benchmarks/bench_vitals_analytics.py [--patients 10 50 ...] [--days 1] [--freq min]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import compute_vitals_analytics  # noqa: E402
+from synthetic_vitals import FREQUENCIES, PATIENT_COLUMN, generate_vitals  # noqa: E402
+
+WINDOWS = {"min": 60, "h": 24, "D": 7}  # Rolling window in readings: an hour, a day, a week
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, nargs="+", default=[10, 50, 100, 200, 400])
+    parser.add_argument("--days", type=int, default=1)
+    parser.add_argument("--freq", choices=list(FREQUENCIES), default="min")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    window = WINDOWS[args.freq]
+    print(f"{'patients':>9} {'rows':>10} {'seconds':>8} {'rows/s':>12}")
+    for patients in args.patients:
+        df = pd.concat(generate_vitals(patients, args.days, args.freq, args.seed, start="2026-01-01"),
+                       ignore_index=True)
+        start = time.perf_counter()
+        compute_vitals_analytics(df, window=window, ewm_span=window, patient_col=PATIENT_COLUMN)
+        elapsed = time.perf_counter() - start
+        print(f"{patients:>9} {len(df):>10} {elapsed:>8.2f} {len(df) / elapsed:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""
+Headless load test of the Streamlit app.
+
+Drives `app.py` with Streamlit's AppTest: every simulated session is its
+own AppTest, and all of them run concurrently in one process, so they
+share the process-wide model client, caches and job runner the way the
+sessions of one server do. Each session repeats a shuffled mix of actions:
+
+    chat        ask a question and wait for the answer
+    prediction  submit symptoms and wait for the predicted conditions
+    treatment   request a plan and wait for it
+    analytics   change the Health Analytics date range
+
+Sessions view synthetic patients (see synthetic_vitals) written to a fresh
+vitals store first, so the analytics and cohort tabs have data. Only the
+open tab runs, and AppTest does not keep the selected tab between runs, so
+every run selects the action's tab. AppTest is not thread-safe, so script runs are serialized by a lock. A server runs
+every session's script in one interpreter too, and the model jobs still
+run concurrently in the shared job runner, so the latencies include the
+queueing a busy server would show.
+
+For every action the report has p50/p95/p99 of the end-to-end latency
+(click to result on screen) and of the individual script reruns; it also
+has RSS growth per session and model-call throughput, plus the model
+client and response cache counters, read from the app's Prometheus
+endpoint (METRICS_PORT, a free port by default). The report is JSON, written to stdout or
+--output. Each `--budget path=limit` (e.g. `chat.latency.p95=3`,
+`memory.per_session_mb=40`) fails the run with exit status 1 when the
+value at that path of the report exceeds the limit, so CI can catch
+regressions.
+
+The model latency comes from GRANITE_LATENCY as usual; the default here
+is fixed:0.5. Run from the `project files` directory:
+    python benchmarks/load_test.py --sessions 8 --iterations 5 --output load.json
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(PROJECT_DIR, "app.py")
+sys.path.insert(0, PROJECT_DIR)
+
+from synthetic_vitals import generate_vitals, patient_ids, write_store  # noqa: E402
+from vitals_store import open_store  # noqa: E402
+
+ACTIONS = ("chat", "prediction", "treatment", "analytics")
+# Tab each action runs in (the labels of the app's tabs)
+ACTION_TABS = {"chat": "Patient Chat", "prediction": "Disease Prediction", "treatment": "Treatment Plans",
+               "analytics": "Health Analytics"}
+PERCENTILES = (50, 95, 99)
+
+CHAT_QUERIES = [
+    "I have a fever and a sore throat, what should I do?",
+    "How can I lower my blood pressure naturally?",
+    "What are the symptoms of diabetes?",
+    "How much water should I drink every day?",
+    "Is it safe to take ibuprofen for a headache?",
+    "How do I treat a sunburn?",
+    "What helps with trouble sleeping?",
+    "What is a normal resting heart rate?",
+]
+SYMPTOMS = [
+    "dry cough, fever and shortness of breath",
+    "headache, fatigue and a mild fever",
+    "increased thirst, frequent urination and blurred vision",
+    "chest pain when climbing stairs",
+    "itchy rash on both arms after hiking",
+]
+CONDITIONS = ["Hypertension", "Type 2 Diabetes", "Asthma", "Migraine", "Mouth ulcer", "Gout"]
+
+
+_RUN_LOCK = threading.Lock()
+
+
+def rss_mb():
+    """Current resident set size (Linux), else the peak."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def scrape_gauges(url):
+    """Unlabelled samples of a Prometheus text endpoint (e.g. the app's /metrics) as {name: value}."""
+    with urllib.request.urlopen(url, timeout=10) as response:
+        text = response.read().decode()
+    values = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#") and "{" not in line:
+            name, _, value = line.partition(" ")
+            values[name] = float(value)
+    return values
+
+
+def with_prefix(values, prefix):
+    return {name[len(prefix):]: value for name, value in values.items() if name.startswith(prefix)}
+
+
+def summarize(values):
+    if not values:
+        return {"count": 0}
+    summary = {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+    summary.update(count=len(values), mean=float(np.mean(values)), max=float(np.max(values)))
+    return summary
+
+
+class Session:
+    """One simulated user: an AppTest plus the timings of its actions."""
+    def __init__(self, index, seed, poll_seconds, timeout, patient=None):
+        from streamlit.testing.v1 import AppTest
+
+        self.index = index
+        self.patient = patient
+        self.rng = random.Random(seed * 1000 + index)
+        self.poll_seconds = poll_seconds
+        self.at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+        self.latencies = {action: [] for action in ACTIONS}
+        self.reruns = {action: [] for action in ACTIONS}
+        self.errors = {action: 0 for action in ACTIONS}
+        self.last_error = {}
+        self.analytics_toggle = False
+
+    def start(self, tabs=("Patient Chat",)):
+        """First run of the script, then switch the session to its synthetic patient's vitals."""
+        with _RUN_LOCK:
+            self.at.run()
+            if self.patient is not None:
+                self.at.session_state.vitals_patient_id = self.patient
+                self.at.run()
+            for tab in tabs[1:]:
+                self.at.session_state["active_tab"] = tab
+                self.at.run()
+
+    def _run(self, action):
+        with _RUN_LOCK:
+            start = time.perf_counter()
+            self.at.session_state["active_tab"] = ACTION_TABS[action]
+            self.at.run()
+            self.reruns[action].append(time.perf_counter() - start)
+        if self.at.exception:
+            raise RuntimeError(self.at.exception[0].value)
+
+    def _open(self, action):
+        """Runs the script with the action's tab open, so its widgets exist."""
+        with _RUN_LOCK:
+            self.at.session_state["active_tab"] = ACTION_TABS[action]
+            self.at.run()
+
+    def _click(self, label):
+        self.at.button[[b.label for b in self.at.button].index(label)].click()
+
+    def _wait_for_job(self, action, slot):
+        while slot in self.at.session_state.model_jobs:
+            time.sleep(self.poll_seconds)
+            self._run(action)
+
+    def chat(self):
+        self._open("chat")
+        self.at.text_input(key="patient_chat_input").set_value(self.rng.choice(CHAT_QUERIES))
+        self._click("Send Query")
+        self._run("chat")
+        self._wait_for_job("chat", "chat")
+
+    def prediction(self):
+        self._open("prediction")
+        self.at.text_area(key="symptoms_input").set_value(self.rng.choice(SYMPTOMS))
+        self._click("Generate Prediction")
+        self._run("prediction")
+        self._wait_for_job("prediction", "prediction")
+
+    def treatment(self):
+        self._open("treatment")
+        self.at.text_input(key="medical_condition_input").set_value(self.rng.choice(CONDITIONS))
+        self._click("Generate Treatment Plan")
+        self._run("treatment")
+        self._wait_for_job("treatment", "treatment")
+
+    def analytics(self):
+        self._open("analytics")
+        date_range = self.at.date_input(key="vitals_date_range")
+        first, last = date_range.min, date_range.max
+        self.analytics_toggle = not self.analytics_toggle
+        if self.analytics_toggle:
+            first = max(first, last - (last - first) / 4)  # Last quarter of the history
+        date_range.set_value((first, last))
+        self._run("analytics")
+
+    def perform(self, action):
+        start = time.perf_counter()
+        try:
+            getattr(self, action)()
+        except Exception as e:  # Reported per action; the session carries on
+            self.errors[action] += 1
+            self.last_error[action] = f"{type(e).__name__}: {e}"
+            return
+        self.latencies[action].append(time.perf_counter() - start)
+
+
+def seed_store(path, patients, days, freq="h", seed=0):
+    """Writes synthetic patients to a vitals store; returns their ids."""
+    write_store(open_store(path), generate_vitals(patients, days, freq, seed, anomaly_rate=0.005,
+                                                   episode_rate=0.02))
+    return patient_ids(patients)
+
+
+def run_load(sessions, iterations, actions, seed=0, poll_seconds=0.1, think_seconds=0.0, timeout=120,
+             patients=None, metrics_url=None):
+    """
+    Runs the sessions concurrently and returns the report (see the module
+    docstring). Session i views patients[i % len(patients)], if given. The
+    model counters come from the app's Prometheus endpoint at `metrics_url`.
+    """
+    # A warm-up session opens every action's tab, so the modules and process-wide resources they load
+    # are in the baseline
+    Session(-1, seed, poll_seconds, timeout, patients[0] if patients else None).start(
+        ("Patient Chat",) + tuple(ACTION_TABS[action] for action in actions))
+    baseline_mb = rss_mb()
+    users = [Session(i, seed, poll_seconds, timeout, patients[i % len(patients)] if patients else None)
+             for i in range(sessions)]
+    first_runs = []
+    barrier = threading.Barrier(sessions)
+    lock = threading.Lock()
+
+    def drive(user):
+        start = time.perf_counter()
+        try:
+            user.start()
+        finally:
+            with lock:
+                first_runs.append(time.perf_counter() - start)
+            barrier.wait()  # Measure memory with every session loaded, then start the load together
+        plan = [action for _ in range(iterations) for action in actions]
+        user.rng.shuffle(plan)
+        for action in plan:
+            user.perform(action)
+            if think_seconds:
+                time.sleep(user.rng.uniform(0, 2 * think_seconds))
+
+    threads = [threading.Thread(target=drive, args=(user,), daemon=True) for user in users]
+    for thread in threads:
+        thread.start()
+    while len(first_runs) < sessions and any(t.is_alive() for t in threads):
+        time.sleep(0.05)
+    loaded_mb = rss_mb()
+    gauges = scrape_gauges(metrics_url) if metrics_url else {}
+    calls_before = gauges.get("healthai_model_client_total_calls", 0)
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - start
+    gauges = scrape_gauges(metrics_url) if metrics_url else {}
+    calls = gauges.get("healthai_model_client_total_calls", 0) - calls_before
+
+    report = {
+        "config": {"sessions": sessions, "iterations": iterations, "actions": list(actions), "seed": seed,
+                   "granite_latency": os.getenv("GRANITE_LATENCY"), "think_seconds": think_seconds},
+        "wall_seconds": wall,
+        "first_run": summarize(first_runs),
+    }
+    for action in actions:
+        latencies = [v for user in users for v in user.latencies[action]]
+        report[action] = {
+            "latency": summarize(latencies),
+            "rerun": summarize([v for user in users for v in user.reruns[action]]),
+            "errors": sum(user.errors[action] for user in users),
+            "last_error": next((user.last_error[action] for user in users if action in user.last_error), None),
+            "per_second": len(latencies) / wall if wall else 0.0,
+        }
+    report["memory"] = {
+        "baseline_mb": baseline_mb,
+        "loaded_mb": loaded_mb,
+        "final_mb": rss_mb(),
+        "per_session_mb": (loaded_mb - baseline_mb) / sessions,
+    }
+    report["model"] = dict(with_prefix(gauges, "healthai_model_client_"), calls=calls,
+                           calls_per_second=calls / wall if wall else 0.0)
+    report["response_cache"] = with_prefix(gauges, "healthai_response_cache_")
+    return report
+
+
+def _lookup(report, path):
+    value = report
+    for part in path.split("."):
+        value = value[part]
+    return value
+
+
+def check_budgets(report, budgets):
+    """Messages for every `path=limit` budget the report exceeds."""
+    failures = []
+    for budget in budgets:
+        path, _, limit = budget.partition("=")
+        try:
+            value = _lookup(report, path)
+        except (KeyError, TypeError):
+            failures.append(f"{path}: not in the report")
+            continue
+        if value > float(limit):
+            failures.append(f"{path}: {value:.3f} > {float(limit):g}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent headless load test of the Streamlit app.")
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent sessions (default: 8)")
+    parser.add_argument("--iterations", type=int, default=5, help="Rounds of the action mix per session")
+    parser.add_argument("--actions", default=",".join(ACTIONS), help=f"Comma-separated subset of {', '.join(ACTIONS)}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--think", type=float, default=0.0, help="Mean pause between actions, in seconds")
+    parser.add_argument("--poll", type=float, default=0.1, help="Rerun interval while a job runs, in seconds")
+    parser.add_argument("--patients", type=int, default=50, help="Synthetic patients in the vitals store")
+    parser.add_argument("--days", type=int, default=60, help="Days of hourly readings per synthetic patient")
+    parser.add_argument("--budget", action="append", default=[], metavar="PATH=LIMIT",
+                        help="Fail if the report value at PATH exceeds LIMIT, e.g. chat.latency.p95=3")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    actions = [a.strip() for a in args.actions.split(",") if a.strip()]
+    unknown = set(actions) - set(ACTIONS)
+    if unknown:
+        parser.error(f"unknown actions: {', '.join(sorted(unknown))}")
+
+    # Fresh chat log and vitals store, so runs are comparable and nothing real is touched
+    workdir = tempfile.mkdtemp(prefix="healthai-load-")
+    os.environ.setdefault("GRANITE_LATENCY", "fixed:0.5")
+    os.environ.setdefault("CHAT_HISTORY_PATH", os.path.join(workdir, "chat_history.sqlite"))
+    os.environ.setdefault("VITALS_STORE_PATH", os.path.join(workdir, "vitals_store"))
+    os.environ.setdefault("KNOWLEDGE_INDEX_PATH", os.path.join(workdir, "knowledge_index"))
+    os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+    os.environ.setdefault("METRICS_PORT", str(free_port()))
+
+    start = time.perf_counter()
+    patients = seed_store(os.environ["VITALS_STORE_PATH"], args.patients, args.days, seed=args.seed)
+    print(f"wrote {args.patients} synthetic patients in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    report = run_load(args.sessions, args.iterations, actions, args.seed, args.poll, args.think,
+                      patients=patients, metrics_url=f"http://127.0.0.1:{os.environ['METRICS_PORT']}/metrics")
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    failures = check_budgets(report, args.budget)
+    for failure in failures:
+        print(f"budget exceeded: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
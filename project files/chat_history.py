@@ -0,0 +1,100 @@
+"""
+Persistent chat history.
+
+Messages are appended to an SQLite table keyed by conversation (the app
+keys them by a random token the user can restore), so a session only needs
+to hold its most recent turns in memory. Older turns are read
+back a page at a time through the (conversation, id) primary key, and each
+conversation keeps at most `max_messages` messages on disk.
+
+Retention: messages older than `max_age` seconds are deleted, and so are
+whole conversations beyond the `max_conversations` most recently active.
+The purge runs when the store is opened and then at most once every
+`purge_interval` seconds, on append.
+"""
+import sqlite3
+import threading
+import time
+
+
+class ChatHistoryStore:
+    """Thread-safe, append-only message log shared by every session of the process."""
+    def __init__(self, path, max_messages=5000, max_age=None, max_conversations=None, purge_interval=3600):
+        self.max_messages = max_messages
+        self.max_age = max_age
+        self.max_conversations = max_conversations
+        self.purge_interval = purge_interval
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS messages "
+            "(conversation TEXT NOT NULL, id INTEGER NOT NULL, role TEXT NOT NULL, "
+            "message TEXT NOT NULL, created_at REAL NOT NULL, PRIMARY KEY (conversation, id))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS messages_created_at ON messages (created_at)")
+        self._db.commit()
+        self._purged_at = None
+        self.purge()
+
+    def purge(self, now=None):
+        """Applies the retention limits; returns the number of messages deleted."""
+        now = time.time() if now is None else now
+        deleted = 0
+        with self._lock:
+            with self._db:
+                if self.max_age is not None:
+                    deleted += self._db.execute("DELETE FROM messages WHERE created_at < ?",
+                                                (now - self.max_age,)).rowcount
+                if self.max_conversations is not None:
+                    deleted += self._db.execute(
+                        "DELETE FROM messages WHERE conversation IN ("
+                        "SELECT conversation FROM messages GROUP BY conversation "
+                        "ORDER BY MAX(created_at) DESC LIMIT -1 OFFSET ?)",
+                        (self.max_conversations,),
+                    ).rowcount
+            self._purged_at = now
+        return deleted
+
+    def append(self, conversation, role, message):
+        """Stores one message and returns its id (increasing within the conversation)."""
+        if time.time() - self._purged_at >= self.purge_interval:
+            self.purge()
+        with self._lock:
+            with self._db:
+                (last_id,) = self._db.execute(
+                    "SELECT COALESCE(MAX(id), 0) FROM messages WHERE conversation = ?", (conversation,)
+                ).fetchone()
+                message_id = last_id + 1
+                self._db.execute(
+                    "INSERT INTO messages (conversation, id, role, message, created_at) VALUES (?, ?, ?, ?, ?)",
+                    (conversation, message_id, role, message, time.time()),
+                )
+                if self.max_messages is not None:
+                    self._db.execute("DELETE FROM messages WHERE conversation = ? AND id <= ?",
+                                     (conversation, message_id - self.max_messages))
+        return message_id
+
+    def recent(self, conversation, limit):
+        """The last `limit` messages as (id, role, message), oldest first."""
+        return self.before(conversation, None, limit)
+
+    def before(self, conversation, before_id, limit):
+        """Up to `limit` messages older than `before_id` (None: the newest), oldest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, role, message FROM messages WHERE conversation = ? AND id < ? "
+                "ORDER BY id DESC LIMIT ?",
+                (conversation, before_id if before_id is not None else 2 ** 62, limit),
+            ).fetchall()
+        rows.reverse()
+        return rows
+
+    def count(self, conversation):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM messages WHERE conversation = ?",
+                                    (conversation,)).fetchone()[0]
+
+    def clear(self, conversation):
+        with self._lock:
+            with self._db:
+                self._db.execute("DELETE FROM messages WHERE conversation = ?", (conversation,))
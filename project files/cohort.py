@@ -0,0 +1,289 @@
+"""
+Cohort analytics over every patient in the vitals store.
+
+Every batch of readings appended to the store is folded into daily and
+weekly rollups and into one summary row per patient. A rollup holds the
+count, sum, min, max and abnormal count per vital. A summary row holds the
+latest reading of each vital, the summary section's threshold flags for it
+(HR 60-100, BP below 130/80, glucose 70-100), and the share of abnormal
+readings over the patient's last 7 days. Both live in SQLite. Ranking and
+filtering the cohort is then a query on indexed summary rows, never a scan
+of anyone's raw series.
+
+Rollups count readings as they were appended. The index also records, per
+patient, the store version (see VitalsStore.version) its rows were built
+from. Readings written without going through the index, or by a process
+that lost a race, leave the patient stale: `stale_patients` finds them by
+comparing versions, and `refresh` recomputes just those patients from the
+(deduplicated) store.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from analytics import DATE_COLUMN, VITALS, abnormal_mask
+
+DAY, WEEK = "day", "week"
+RECENT_DAYS = 7
+
+# Filter name -> summary column; the same three statuses as the Health Metrics Summary
+FLAGS = {
+    "heart_rate": "heart_rate_abnormal",
+    "bp": "bp_abnormal",
+    "glucose": "glucose_abnormal",
+}
+_RANK_ORDER = "abnormal_count DESC, week_abnormal_share DESC, patient"
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS rollups (
+    patient TEXT NOT NULL, vital TEXT NOT NULL, period TEXT NOT NULL, start TEXT NOT NULL,
+    n INTEGER NOT NULL, total REAL NOT NULL, min REAL NOT NULL, max REAL NOT NULL,
+    abnormal INTEGER NOT NULL,
+    PRIMARY KEY (patient, period, start, vital)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS patient_summary (
+    patient TEXT PRIMARY KEY,
+    {", ".join(f"{k} REAL, {k}_at TEXT, {k}_abnormal INTEGER NOT NULL DEFAULT 0" for k in VITALS)},
+    bp_abnormal INTEGER NOT NULL DEFAULT 0,
+    abnormal_count INTEGER NOT NULL DEFAULT 0,
+    last_reading TEXT,
+    week_readings INTEGER NOT NULL DEFAULT 0,
+    week_abnormal_share REAL NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS synced (
+    patient TEXT PRIMARY KEY, version TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS summary_rank ON patient_summary ({_RANK_ORDER});
+{"".join(f"CREATE INDEX IF NOT EXISTS summary_{name} ON patient_summary ({col}, {_RANK_ORDER});"
+         for name, col in FLAGS.items())}
+"""
+
+_UPSERT_ROLLUP = """
+INSERT INTO rollups (patient, vital, period, start, n, total, min, max, abnormal)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (patient, period, start, vital) DO UPDATE SET
+    n = n + excluded.n, total = total + excluded.total,
+    min = MIN(min, excluded.min), max = MAX(max, excluded.max),
+    abnormal = abnormal + excluded.abnormal
+"""
+
+
+def _week_start(days):
+    """Monday of each day's week (1970-01-01 was a Thursday)."""
+    return days - ((days.astype(np.int64) + 3) % 7).astype("timedelta64[D]")
+
+
+def _iso(timestamp):
+    return pd.Timestamp(timestamp).isoformat()
+
+
+class CohortIndex:
+    """Incrementally maintained rollups and ranked per-patient summaries, in SQLite."""
+    def __init__(self, path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    def update(self, patient_id, frame, previous, version):
+        """
+        Folds readings just appended to the store (a normalized store frame)
+        into the rollups and summary row. `previous` and `version` are the
+        patient's store versions before and after the append. If the index
+        was not built from `previous`, the patient is stale and the batch is
+        left to `refresh`, so no reading is counted twice.
+        """
+        rows, latest = self._aggregate(patient_id, frame)
+        with self._lock:
+            with self._db:
+                self._db.execute("BEGIN IMMEDIATE")  # Other processes share the file
+                if self._synced_version(patient_id) != previous:
+                    return
+                self._apply(patient_id, rows, latest)
+                self._mark_synced(patient_id, version)
+
+    def _aggregate(self, patient_id, frame):
+        """Rollup rows and the latest reading per vital of a batch of readings."""
+        if frame.empty:
+            return [], {}
+        keys = [k for k, col in VITALS.items() if col in frame.columns]
+        values = frame[[VITALS[k] for k in keys]].to_numpy(dtype=float, na_value=np.nan)
+        dates = frame[DATE_COLUMN].to_numpy().astype("datetime64[ms]")
+        abnormal = abnormal_mask(values, keys)
+
+        # One entry per present (reading, vital), aggregated per (period start, vital) with bincount/reduceat
+        present = ~np.isnan(values)
+        vital_index = np.broadcast_to(np.arange(len(keys)), values.shape)[present]
+        days = np.broadcast_to(dates.astype("datetime64[D]")[:, None], values.shape)[present]
+        readings = values[present]
+        flagged = abnormal[present].astype(float)
+        rows = []
+        for period, starts in ((DAY, days), (WEEK, _week_start(days))):
+            if not len(readings):
+                break
+            groups, inverse = np.unique(starts.astype(np.int64) * len(keys) + vital_index, return_inverse=True)
+            counts = np.bincount(inverse)
+            order = np.argsort(inverse, kind="stable")
+            offsets = np.r_[0, np.cumsum(counts)[:-1]]
+            aggregates = zip(
+                (groups // len(keys)).astype("datetime64[D]").astype(str), groups % len(keys), counts,
+                np.bincount(inverse, weights=readings),
+                np.minimum.reduceat(readings[order], offsets),
+                np.maximum.reduceat(readings[order], offsets),
+                np.bincount(inverse, weights=flagged),
+            )
+            rows.extend((patient_id, keys[vital], period, start, int(n), float(total), float(low), float(high),
+                         int(n_abnormal)) for start, vital, n, total, low, high, n_abnormal in aggregates)
+
+        # Latest reading per vital in this batch
+        latest = {}
+        for i, key in enumerate(keys):
+            has_value = np.flatnonzero(~np.isnan(values[:, i]))
+            if len(has_value):
+                newest = has_value[dates[has_value].argmax()]
+                latest[key] = (_iso(dates[newest]), float(values[newest, i]))
+
+        return rows, latest
+
+    def _apply(self, patient_id, rows, latest):
+        """Writes an aggregated batch; runs inside a transaction."""
+        if rows:
+            self._db.executemany(_UPSERT_ROLLUP, rows)
+            self._refresh_summary(patient_id, latest)
+
+    def _synced_version(self, patient_id):
+        row = self._db.execute("SELECT version FROM synced WHERE patient = ?", (patient_id,)).fetchone()
+        return row[0] if row else None
+
+    def _mark_synced(self, patient_id, version):
+        if version is None:
+            self._db.execute("DELETE FROM synced WHERE patient = ?", (patient_id,))
+        else:
+            self._db.execute("INSERT OR REPLACE INTO synced (patient, version) VALUES (?, ?)", (patient_id, version))
+
+    def _refresh_summary(self, patient_id, latest):
+        columns = [c for k in VITALS for c in (k, f"{k}_at")]
+        row = self._db.execute(f"SELECT {', '.join(columns)} FROM patient_summary WHERE patient = ?",
+                               (patient_id,)).fetchone()
+        current = dict(zip(columns, row)) if row else dict.fromkeys(columns)
+        for key, (at, value) in latest.items():
+            if current[f"{key}_at"] is None or at > current[f"{key}_at"]:
+                current[key], current[f"{key}_at"] = value, at
+
+        keys = list(VITALS)
+        readings = np.array([[np.nan if current[k] is None else current[k] for k in keys]])
+        flags = dict(zip(keys, abnormal_mask(readings, keys)[0].tolist()))
+        bp = flags["systolic"] or flags["diastolic"]
+        times = [current[f"{k}_at"] for k in keys if current[f"{k}_at"] is not None]
+        last_reading = max(times) if times else None
+
+        week_readings, week_abnormal = 0, 0
+        if last_reading is not None:
+            since = (pd.Timestamp(last_reading).normalize() - pd.Timedelta(days=RECENT_DAYS - 1)).strftime("%Y-%m-%d")
+            week_readings, week_abnormal = self._db.execute(
+                "SELECT COALESCE(SUM(n), 0), COALESCE(SUM(abnormal), 0) FROM rollups "
+                "WHERE patient = ? AND period = ? AND start >= ?", (patient_id, DAY, since)).fetchone()
+
+        record = {
+            "patient": patient_id,
+            **current,
+            **{f"{k}_abnormal": int(flags[k]) for k in keys},
+            "bp_abnormal": int(bp),
+            "abnormal_count": int(flags["heart_rate"]) + int(bp) + int(flags["glucose"]),
+            "last_reading": last_reading,
+            "week_readings": week_readings,
+            "week_abnormal_share": week_abnormal / week_readings if week_readings else 0.0,
+            "updated_at": time.time(),
+        }
+        self._db.execute(
+            f"INSERT OR REPLACE INTO patient_summary ({', '.join(record)}) "
+            f"VALUES ({', '.join('?' * len(record))})", list(record.values()))
+
+    def _where(self, flags):
+        unknown = set(flags) - set(FLAGS)
+        if unknown:
+            raise ValueError(f"Unknown cohort filter(s) {sorted(unknown)}; expected {sorted(FLAGS)}")
+        return " AND ".join(f"{FLAGS[f]} = 1" for f in flags) or "1"
+
+    def ranked(self, flags=(), limit=50, offset=0):
+        """
+        Summary rows of patients with every abnormal flag in `flags`, most
+        abnormal vitals first, then highest abnormal share over the last 7 days.
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                f"SELECT * FROM patient_summary WHERE {self._where(flags)} "
+                f"ORDER BY {_RANK_ORDER} LIMIT ? OFFSET ?", (limit, offset))
+            columns = [d[0] for d in cursor.description]
+            return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+    def count(self, flags=()):
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM patient_summary WHERE {self._where(flags)}").fetchone()[0]
+
+    def rollups(self, patient_id, period=WEEK):
+        """Per-vital rollups of one patient (`start`, `vital`, `n`, `mean`, `min`, `max`, `abnormal`)."""
+        with self._lock:
+            cursor = self._db.execute(
+                "SELECT start, vital, n, total / n, min, max, abnormal FROM rollups "
+                "WHERE patient = ? AND period = ? ORDER BY start, vital", (patient_id, period))
+            frame = pd.DataFrame(cursor.fetchall(), columns=["start", "vital", "n", "mean", "min", "max", "abnormal"])
+        frame["start"] = pd.to_datetime(frame["start"])
+        return frame
+
+    def is_empty(self):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM patient_summary LIMIT 1").fetchone() is None
+
+    def stale_patients(self, store):
+        """
+        Patients whose rows were not built from their current store version
+        (including patients no longer in the store). Costs a directory
+        listing per patient, no reads.
+        """
+        with self._lock:
+            synced = dict(self._db.execute("SELECT patient, version FROM synced").fetchall())
+            indexed = {row[0] for row in self._db.execute("SELECT DISTINCT patient FROM patient_summary")}
+        stored = store.patients()
+        stale = [patient_id for patient_id in stored if store.version(patient_id) != synced.get(patient_id)]
+        return stale + sorted((set(synced) | indexed) - set(stored))
+
+    def refresh(self, store, patients=None):
+        """
+        Recomputes the rows of `patients` (default: the stale ones) from the
+        store, one patient at a time. Returns the patients recomputed.
+        """
+        patients = self.stale_patients(store) if patients is None else patients
+        for patient_id in patients:
+            self._resync(store, patient_id)
+        return patients
+
+    def _resync(self, store, patient_id):
+        with self._lock:
+            with self._db:
+                # Holds the write lock while reading, so no append can be folded in twice meanwhile
+                self._db.execute("BEGIN IMMEDIATE")
+                version = store.version(patient_id)
+                self._db.execute("DELETE FROM rollups WHERE patient = ?", (patient_id,))
+                self._db.execute("DELETE FROM patient_summary WHERE patient = ?", (patient_id,))
+                if version is not None:
+                    for frame in store.read_months(patient_id):
+                        self._apply(patient_id, *self._aggregate(patient_id, frame))
+                self._mark_synced(patient_id, version)
+
+    def rebuild(self, store):
+        """Recomputes every rollup and summary row from the store."""
+        with self._lock:
+            with self._db:
+                self._db.execute("DELETE FROM rollups")
+                self._db.execute("DELETE FROM patient_summary")
+                self._db.execute("DELETE FROM synced")
+        self.refresh(store, store.patients())
@@ -0,0 +1,89 @@
+"""
+Configuration of HealthAI, read once per process from the environment (and
+a .env file, if any). Shared by the Streamlit app, the service layer and the
+HTTP API, so they all run with the same settings.
+"""
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv() # Load environment variables from .env file
+
+# Mock IBM Watson API credentials - replace with your actual keys for live integration
+# Ensure these are set in your .env file or Streamlit Cloud secrets
+WATSONX_API_KEY = os.getenv("WATSONX_API_KEY", "your_mock_watsonx_api_key")
+WATSONX_PROJECT_ID = os.getenv("WATSONX_PROJECT_ID", "your_mock_watsonx_project_id")
+# Simulated latency of the mock Granite backend: zero, fixed:<s>, sampled:<file or s,s,...>
+# or tokens:<tokens/s>[:<first-token s>]. Use "zero" for throughput/load tests.
+GRANITE_LATENCY = os.getenv("GRANITE_LATENCY", "fixed:2")
+GRANITE_LATENCY_SEED = os.getenv("GRANITE_LATENCY_SEED")
+# Process-wide response cache. Set RESPONSE_CACHE_PATH to an SQLite file to keep it across restarts.
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH")
+# Maximum number of concurrent calls the shared model client sends to the backend
+GRANITE_MAX_CONCURRENCY = int(os.getenv("GRANITE_MAX_CONCURRENCY", "8"))
+GRANITE_ACQUIRE_TIMEOUT = float(os.getenv("GRANITE_ACQUIRE_TIMEOUT", "30"))
+# Concurrent model calls of one batch prediction in the app. Kept well below GRANITE_MAX_CONCURRENCY so
+# a large upload leaves most model slots to interactive requests.
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", str(max(1, GRANITE_MAX_CONCURRENCY // 4))))
+# How often (seconds) the UI polls a running background model job for new output
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "0.5"))
+# Seed of the sample vitals shown until a patient imports readings
+SAMPLE_METRICS_SEED = int(os.getenv("SAMPLE_METRICS_SEED", "0"))
+# Directory of the per-patient Parquet store that imported vitals are appended to
+VITALS_STORE_PATH = os.getenv("VITALS_STORE_PATH", "vitals_store")
+# The Cohort Overview tab lists every patient in the vitals store, including those imported in other sessions.
+# Off by default; enable it only for deployments used by authorized clinicians, or holding synthetic/demo data.
+COHORT_OVERVIEW = os.getenv("COHORT_OVERVIEW", "").lower() in ("1", "true", "yes")
+# Points per chart series after downsampling (lttb or minmax); about two per horizontal pixel
+CHART_MAX_POINTS = int(os.getenv("CHART_MAX_POINTS", "1500"))
+CHART_DOWNSAMPLING = os.getenv("CHART_DOWNSAMPLING", "lttb")
+# Chat history: SQLite log of every conversation; sessions keep only the last CHAT_WINDOW turns in memory
+CHAT_HISTORY_PATH = os.getenv("CHAT_HISTORY_PATH", "chat_history.sqlite")
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "5000")) # Kept on disk per conversation
+# Retention of stored chats: messages older than CHAT_HISTORY_MAX_AGE_DAYS are deleted, and so are conversations
+# beyond the CHAT_HISTORY_MAX_CONVERSATIONS most recently active. Set either to 0 to disable that limit.
+CHAT_HISTORY_MAX_AGE_DAYS = float(os.getenv("CHAT_HISTORY_MAX_AGE_DAYS", "30"))
+CHAT_HISTORY_MAX_CONVERSATIONS = int(os.getenv("CHAT_HISTORY_MAX_CONVERSATIONS", "10000"))
+CHAT_WINDOW = int(os.getenv("CHAT_WINDOW", "20"))
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", "20"))
+# Token budget of the chat prompt (template, digest of older turns, recent turns and the question)
+CHAT_CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", "2048"))
+CHAT_DIGEST_TOKENS = int(os.getenv("CHAT_DIGEST_TOKENS", "256"))
+# Knowledge retrieval: index directory (rebuilt when the corpus changes), extra documents (a JSON Lines
+# file or a directory of .txt/.md files) and an optional embedder for hybrid search (hashed, or
+# sentence-transformers:<model>). Prompts are grounded in the best RETRIEVAL_PASSAGES passages.
+KNOWLEDGE_INDEX_PATH = os.getenv("KNOWLEDGE_INDEX_PATH", "knowledge_index")
+KNOWLEDGE_CORPUS_PATH = os.getenv("KNOWLEDGE_CORPUS_PATH")
+KNOWLEDGE_EMBEDDER = os.getenv("KNOWLEDGE_EMBEDDER") or None
+RETRIEVAL_PASSAGES = int(os.getenv("RETRIEVAL_PASSAGES", "3"))
+# Chat questions whose best passage covers at least this share of the question (and is titled with
+# every term of it, and clearly beats the runner-up) are answered from the passage without calling
+# the model. Questions with red-flag symptoms never are (see retrieval.RED_FLAGS).
+RETRIEVAL_ANSWER_CONFIDENCE = float(os.getenv("RETRIEVAL_ANSWER_CONFIDENCE", "0.9"))
+# Semantic chat cache: a question at least this similar (cosine) to an answered one reuses its answer.
+# Entries expire after RESPONSE_CACHE_TTL seconds; the embedder is a load_embedder spec.
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "2048"))
+SEMANTIC_CACHE_EMBEDDER = os.getenv("SEMANTIC_CACHE_EMBEDDER", "hashed")
+# SQLite file that keeps model-generated base treatment plans across restarts (unset: memory only), and how
+# many of them are kept (least recently used are evicted first)
+TREATMENT_TEMPLATES_PATH = os.getenv("TREATMENT_TEMPLATES_PATH")
+TREATMENT_TEMPLATES_MAX = int(os.getenv("TREATMENT_TEMPLATES_MAX", "1000"))
+# CSV of extra drug interactions (a,b,severity,note) added to the built-in screening table
+INTERACTIONS_TABLE_PATH = os.getenv("INTERACTIONS_TABLE_PATH")
+# Telemetry (see telemetry.py): Prometheus metrics at http://127.0.0.1:METRICS_PORT/metrics, a JSON Lines
+# log of reruns and model calls, OTLP spans to a collector (needs opentelemetry-sdk), and a per-rerun
+# timing overlay in the sidebar. All off by default; the overlay shows with METRICS_OVERLAY=1.
+METRICS_PORT = os.getenv("METRICS_PORT")
+METRICS_JSON_LOG = os.getenv("METRICS_JSON_LOG")
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")
+METRICS_OVERLAY = os.getenv("METRICS_OVERLAY", "").lower() in ("1", "true", "yes")
+# HTTP API (api.py): listen address and worker processes. Each worker has its own caches; point
+# RESPONSE_CACHE_PATH and TREATMENT_TEMPLATES_PATH at files to share them between workers. Requests must
+# carry API_KEY as a bearer token; without one the API is open and only listens on a loopback address.
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_KEY = os.getenv("API_KEY") or None
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
@@ -0,0 +1,97 @@
+"""
+Conversation memory for the Patient Chat prompt.
+
+The chat prompt carries the recent turns verbatim and a rolling digest of
+older ones, within a token budget. Each turn's token count is computed
+once, when the turn is added, and running totals are kept, so building a
+prompt only counts the template and the new question. When the turns no
+longer fit, the oldest are folded into the digest as one short line each
+(the first sentence of the message), and the digest in turn drops its
+oldest lines once it outgrows its own budget.
+"""
+import re
+from collections import deque
+
+from granite import count_tokens
+from prompts import build_chat_prompt
+
+_MARKUP_RE = re.compile(r"[*#_`>]+")
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+ROLE_LABELS = {"user": "Patient", "ai": "HealthAI"}
+_DIGEST_HEADER = "    Summary of earlier messages:"
+_RECENT_HEADER = "    Recent messages:"
+
+
+def digest_line(role, message, max_words=24):
+    """One-line summary of a turn: its first sentence, without markup, clipped to `max_words`."""
+    text = " ".join(_MARKUP_RE.sub(" ", message).split())
+    first = _SENTENCE_END_RE.split(text, 1)[0]
+    words = first.split()
+    if len(words) > max_words:
+        first = " ".join(words[:max_words]) + "..."
+    verb = "asked" if role == "user" else "answered"
+    return f"    - {ROLE_LABELS.get(role, role)} {verb}: {first}"
+
+
+class ConversationMemory:
+    """
+    Recent turns plus a rolling digest, sized to `token_budget` tokens for
+    the whole prompt. `digest_budget` caps the digest's share.
+    """
+    def __init__(self, token_budget=2048, digest_budget=256, count=count_tokens):
+        self.token_budget = token_budget
+        self.digest_budget = digest_budget
+        self.count = count
+        self.turns = deque()  # (prompt text, tokens, role, message), oldest first
+        self.turn_tokens = 0
+        self.digest = deque()  # (line, tokens), oldest first
+        self.digest_tokens = 0
+        self._header_tokens = count(_DIGEST_HEADER) + count(_RECENT_HEADER)
+
+    @classmethod
+    def from_turns(cls, turns, **kwargs):
+        """Memory seeded with (role, message) turns, oldest first."""
+        memory = cls(**kwargs)
+        for role, message in turns:
+            memory.add(role, message)
+        return memory
+
+    def add(self, role, message):
+        text = f"    {ROLE_LABELS.get(role, role)}: {message.strip()}"
+        tokens = self.count(text)
+        self.turns.append((text, tokens, role, message))
+        self.turn_tokens += tokens
+
+    def _fold_oldest(self):
+        _, tokens, role, message = self.turns.popleft()
+        self.turn_tokens -= tokens
+        line = digest_line(role, message)
+        line_tokens = self.count(line)
+        self.digest.append((line, line_tokens))
+        self.digest_tokens += line_tokens
+        while self.digest_tokens > self.digest_budget and self.digest:
+            _, dropped = self.digest.popleft()
+            self.digest_tokens -= dropped
+
+    def history(self):
+        sections = []
+        if self.digest:
+            sections.append("\n".join([_DIGEST_HEADER] + [line for line, _ in self.digest]))
+        if self.turns:
+            sections.append("\n".join([_RECENT_HEADER] + [text for text, *_ in self.turns]))
+        return "\n".join(sections)
+
+    def build_prompt(self, query, references=""):
+        """
+        Chat prompt for `query` (after optional `references`) with as much of
+        the conversation as fits the budget.
+        """
+        base_tokens = self.count(build_chat_prompt(query, history=" ", references=references)) + self._header_tokens
+        while self.turns and base_tokens + self.digest_tokens + self.turn_tokens > self.token_budget:
+            self._fold_oldest()
+        return build_chat_prompt(query, history=self.history(), references=references)
+
+    def prompt_tokens(self, query, references=""):
+        """Estimated size of `build_prompt(query, references)`, from the cached counts."""
+        return (self.count(build_chat_prompt(query, history=" ", references=references)) + self._header_tokens
+                + self.digest_tokens + self.turn_tokens)
@@ -0,0 +1,93 @@
+"""
+Downsampling of time series for plotting.
+
+A chart only has a few hundred to a few thousand pixels across, so sending
+it every reading of a multi-year, minute-level history just ships megabytes
+of JSON to the browser. These functions pick a subset of at most
+`max_points` readings that draws the same picture:
+
+    lttb     Largest-Triangle-Three-Buckets: in each bucket keeps the point
+             forming the largest triangle with its neighbours, which
+             preserves the visual shape and isolated spikes.
+    minmax   keeps the lowest and highest reading of each bucket, so every
+             extreme value is guaranteed to stay on the chart.
+
+Both return indices into the input, so the caller can select matching rows
+of any other column.
+"""
+import numpy as np
+import pandas as pd
+
+METHODS = ("lttb", "minmax")
+
+
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ms]").astype(np.int64).astype(float)
+    return x.astype(float)
+
+
+def lttb_indices(x, y, max_points):
+    """Indices of the points kept by Largest-Triangle-Three-Buckets (x sorted, no NaN in y)."""
+    n = len(y)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+    x = _as_float(x)
+    y = np.asarray(y, dtype=float)
+    # First and last points are always kept; the rest is split into max_points - 2 buckets
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    kept = np.empty(max_points, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[next_lo:next_hi].mean()
+        avg_y = y[next_lo:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        kept[i + 1] = a
+    return kept
+
+
+def minmax_indices(x, y, max_points):
+    """Indices of the lowest and highest point of each of max_points // 2 buckets, in order."""
+    n = len(y)
+    if max_points >= n or max_points < 2:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    # Buckets are contiguous runs, so per-bucket extremes come from reduceat in one pass
+    starts = np.unique(np.linspace(0, n, max_points // 2, endpoint=False).astype(np.int64))
+    counts = np.diff(np.r_[starts, n])
+    buckets = np.repeat(np.arange(len(starts)), counts)
+    kept = []
+    for extreme in (np.minimum, np.maximum):
+        hits = np.flatnonzero(y == np.repeat(extreme.reduceat(y, starts), counts))
+        _, first = np.unique(buckets[hits], return_index=True)  # First hit of each bucket
+        kept.append(hits[first])
+    return np.unique(np.concatenate(kept))
+
+
+def downsample(x, y, max_points, method="lttb"):
+    """
+    (x, y) reduced to at most `max_points` points with `method`. Missing y
+    values are dropped first, so sparse series are drawn as connected lines.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    present = ~np.isnan(y)
+    x, y = x[present], y[present]
+    if method == "lttb":
+        kept = lttb_indices(x, y, max_points)
+    elif method == "minmax":
+        kept = minmax_indices(x, y, max_points)
+    else:
+        raise ValueError(f"Unknown downsampling method {method!r}; expected one of {METHODS}")
+    return x[kept], y[kept]
+
+
+def downsample_frame(df, x_col, y_col, max_points, method="lttb"):
+    """Two-column frame (x_col, y_col) of the downsampled series, ready for plotting."""
+    x, y = downsample(df[x_col].to_numpy(), df[y_col].to_numpy(dtype=float, na_value=np.nan), max_points, method)
+    return pd.DataFrame({x_col: x, y_col: y})
@@ -0,0 +1,83 @@
+"""
+Text embeddings for retrieval and caching.
+
+The default embedder hashes word unigrams and character n-grams (taken
+within words) into a fixed number of signed dimensions, then L2-normalizes.
+It needs no model download, embeds a short text in microseconds, and puts
+paraphrases that share most of their words and word pieces close together
+("cough with fever" vs "fever and cough"). Where sentence-transformers is
+installed, a real embedding model can be used instead.
+"""
+import re
+import zlib
+
+import numpy as np
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+class HashedNgramEmbedder:
+    """Signed feature hashing of words and character n-grams; vectors have unit length."""
+    def __init__(self, dim=512, ngram_sizes=(3, 4)):
+        self.dim = dim
+        self.ngram_sizes = ngram_sizes
+
+    def features(self, text):
+        words = _WORD_RE.findall(text.lower())
+        features = [f"w:{w}" for w in words]
+        for word in words:
+            padded = f"<{word}>"
+            for n in self.ngram_sizes:
+                features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+        return features
+
+    def embed_one(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        # crc32 rather than hash(): vectors must not change between processes
+        hashes = np.fromiter((zlib.crc32(f.encode()) for f in self.features(text)), dtype=np.uint32)
+        if len(hashes):
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(vector, hashes % self.dim, signs)
+            norm = np.linalg.norm(vector)
+            if norm > 0:
+                vector /= norm
+        return vector
+
+    def embed(self, texts):
+        """(len(texts), dim) float32 matrix of unit vectors."""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            matrix[i] = self.embed_one(text)
+        return matrix
+
+
+class SentenceTransformerEmbedder:
+    """A sentence-transformers model (CPU), normalized so dot product is cosine similarity."""
+    def __init__(self, model_name):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("This embedder requires sentence-transformers "
+                              "(pip install sentence-transformers)") from e
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def embed_one(self, text):
+        return self.embed([text])[0]
+
+    def embed(self, texts):
+        return self.model.encode(list(texts), normalize_embeddings=True).astype(np.float32)
+
+
+def load_embedder(spec):
+    """
+    Builds an embedder from a spec string:
+        hashed[:<dim>]                 hashed n-gram vectors (default 512 dimensions)
+        sentence-transformers:<model>  e.g. sentence-transformers:all-MiniLM-L6-v2
+    """
+    kind, _, arg = spec.partition(":")
+    if kind == "hashed":
+        return HashedNgramEmbedder(dim=int(arg) if arg else 512)
+    if kind == "sentence-transformers" and arg:
+        return SentenceTransformerEmbedder(arg)
+    raise ValueError(f"Unknown embedder {spec!r}; expected hashed[:dim] or sentence-transformers:<model>")
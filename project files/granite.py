@@ -0,0 +1,735 @@
+"""
+Mock IBM Granite-13b-instruct-v2 backend used by the HealthAI app.
+
+The canned answers live in a declarative rule table (intent -> required
+keywords -> response id). The table is compiled once into an Aho-Corasick
+automaton, so every prompt is matched in a single pass no matter how many
+rules there are, and the most specific matching rule wins.
+
+Response latency is simulated by a pluggable latency profile (see
+`parse_latency_profile`) instead of a fixed sleep. Answers can also be
+streamed in token-sized chunks with `generate_text_stream`.
+"""
+import random
+import re
+import time # For simulating AI response delay
+from collections import deque
+
+# --- Canned Responses ---
+RESPONSES = {
+    "chat.flu_or_cold": """The symptoms you're describing (fever, cough, runny nose, headache, joint pain) are common with the flu or common cold.
+                For most people, these conditions resolve with rest and fluids.
+                However, if your symptoms are severe, worsen, or persist for more than 7-10 days,
+                it's important to consult a healthcare professional.
+                They can provide an accurate diagnosis and recommend appropriate treatment.
+                This information is for general guidance and not a substitute for professional medical advice.""",
+    "chat.headache_fatigue_fever": """Persistent headache, fatigue, and mild fever can be symptoms of various conditions, from viral infections to more serious issues.
+                It's crucial to consult a doctor for a proper diagnosis.
+                They might recommend further tests to determine the underlying cause and the best course of action.
+                Remember, this AI provides general information and cannot diagnose.""",
+    "chat.stomach_pain": """Stomach pain can have many causes, from indigestion to more serious conditions like appendicitis or gallstones.
+                If the pain is severe, persistent, accompanied by fever, vomiting, or blood in stool, seek immediate medical attention.
+                For mild, occasional pain, over-the-counter antacids or dietary changes might help.
+                Always consult a doctor for persistent or severe symptoms.""",
+    "chat.persistent_cough_low_fever": """A persistent cough and low-grade fever can be symptoms of various conditions, including a common cold, bronchitis, or even early stages of a viral infection like the flu or COVID-19.
+                It's important to monitor your symptoms. If they worsen, you develop shortness of breath, severe chest pain, or the fever increases, please consult a healthcare professional for a proper diagnosis and advice.
+                Rest and staying hydrated are generally recommended.""",
+    "chat.flu_symptom_cluster": """The symptoms you're describing (fever, cough, runny nose, headache, joint pain) are common with the flu or common cold. 
+                For most people, these conditions resolve with rest and fluids. However, if your symptoms are severe, worsen, or persist for more than 7-10 days, it's important to consult a healthcare professional. They can provide an accurate diagnosis and recommend appropriate treatment. 
+                This information is for general guidance and not a substitute for professional medical advice.""",
+    "chat.headache_fatigue_mild_fever": """Persistent headache, fatigue, and mild fever can be symptoms of various conditions, from viral infections to more serious issues. 
+                It's crucial to consult a doctor for a proper diagnosis. They might recommend further tests to determine the underlying cause and the best course of action. 
+                Remember, this AI provides general information and cannot diagnose.""",
+    "chat.fever": """Fever is a temporary rise in body temperature, often due to an illness. It’s a symptom — not a disease — and is usually a sign that your body is fighting an infection.
+
+                🌡️ Normal vs. Fever
+                Normal body temp: ~98.6°F (37°C)
+
+                Fever: Usually defined as:
+
+                Low-grade: 99.5°F to 100.9°F (37.5–38.3°C)
+
+                Moderate: 101°F to 103°F (38.3–39.4°C)
+
+                High: 104°F or more (≥ 40°C)
+
+                🩺 Common Causes of Fever
+                Viral infections (cold, flu, COVID-19)
+
+                Bacterial infections (UTI, strep throat)
+
+                Heat exhaustion
+
+                Inflammatory conditions (e.g. rheumatoid arthritis)
+
+                Vaccinations (as a side effect)
+
+                🏠 Home Care Tips
+                Rest: Let your body recover.
+
+                Hydrate: Drink plenty of fluids (water, electrolyte drinks, soups).
+
+                Dress lightly: Avoid heavy clothing or blankets.
+
+                Cool compress: Use a damp washcloth on forehead/neck.
+
+                Medications:
+
+                Paracetamol (acetaminophen) or Ibuprofen can reduce fever.
+
+                🚨 When to See a Doctor
+                Fever > 103°F (39.4°C)
+
+                Lasts more than 3 days
+
+                Severe headache, rash, stiff neck
+
+                Difficulty breathing or chest pain
+
+                Fever with confusion, seizures, or persistent vomiting
+
+                For infants under 3 months, a fever is always an emergency""",
+    "chat.cough": """🩺 Common Causes
+                Viral infections (cold, flu, COVID-19)
+
+                Bacterial infections (bronchitis, pneumonia)
+
+                Allergies or asthma
+
+                Acid reflux (GERD)
+
+                Postnasal drip
+
+                Environmental irritants (smoke, pollution)
+
+                🏠 Home Remedies
+                Warm fluids: Ginger tea, warm water with honey and lemon
+
+                Steam inhalation: Helps loosen mucus
+
+                Honey (for >1 yr old): Soothes throat and suppresses cough
+
+                Saltwater gargle: Relieves throat irritation
+
+                Avoid irritants: Smoke, perfumes, and dust
+
+                💊 Medications
+                Dry Cough:
+
+                Dextromethorphan (cough suppressants)
+
+                Antihistamines (if allergy-related)
+
+                Wet Cough:
+
+                Expectorants like guaifenesin to thin mucus
+
+                Antibiotics if it's bacterial (only with a prescription)
+
+                """,
+    "chat.cold": """🤧 Common Symptoms
+                Runny or stuffy nose
+
+                Sneezing
+
+                Sore throat
+
+                Cough
+
+                Mild fever (sometimes)
+
+                Fatigue
+
+                Headache
+
+                Watery eyes
+                🏠 Home Remedies
+                Rest: Let your immune system work
+
+                Hydration: Warm water, soup, herbal teas
+
+                Steam inhalation: Helps with congestion
+
+                Saltwater gargle: Soothes sore throat
+
+                Honey + lemon: Eases throat and cough
+
+                Tulsi, ginger, turmeric milk: Natural anti-inflammatory options
+
+                💊 Over-the-Counter Medicines
+                Symptom	Medicine Example
+                Runny nose	Antihistamines (cetirizine, loratadine)
+                Nasal congestion	Decongestants (phenylephrine, xylometazoline)
+                Cough	Dextromethorphan, guaifenesin
+                Fever/body ache	Paracetamol, ibuprofen
+
+                ⚠️ Avoid antibiotics — they do not work against viruses.""",
+    "chat.cold_and_fever": """🏠 Home Remedies
+                ✅ Works for both cold & cough relief:
+
+                Ginger tea with honey
+
+                Tulsi + turmeric + pepper concoction
+
+                Steam inhalation (add Vicks or eucalyptus oil)
+
+                Honey + lemon in warm water (especially for dry cough)
+
+                Saltwater gargle (for throat relief)
+
+                Stay hydrated: warm water, soups, ORS
+
+                Rest: allow your body to heal
+
+                💊 Medicines (OTC)
+                Symptom	Medicine Type	Examples
+                Fever, body ache	Pain relievers	Paracetamol, Ibuprofen
+                Runny nose	Antihistamines	Cetirizine, Loratadine
+                Blocked nose	Decongestants	Xylometazoline nasal spray
+                Dry cough	Cough suppressants	Dextromethorphan
+                Wet cough	Expectorants	Guaifenesin
+
+                🔹 Use syrups like Benadryl, Ascoril, or Grilinctus (as per need).
+                🔹 Always consult a doctor if symptoms last >7 days or worsen.
+
+                🍲 Diet Suggestions
+                Warm liquids: soup, tea, turmeric milk
+
+                Soft foods: khichdi, dal, porridge
+
+                Avoid cold drinks, ice cream, fried and spicy foods""",
+    "chat.headache": """
+                **Quick Relief Tips for Headaches:**
+                1.  **Hydration:** Drink a glass or two of water. Dehydration is a common cause of headaches.
+                2.  **Rest:** Lie down in a quiet, dark room and close your eyes. Try to sleep or just relax without screen time or loud noises.
+                3.  **Cold or Warm Compress:** Apply a cold compress on your forehead or temples (often helpful for migraines). Use a warm compress on the back of the neck (can help with tension headaches).
+                4.  **Caffeine:** A small amount of caffeine (like in tea or coffee) can help relieve some headaches, but avoid overuse as it can also cause withdrawal headaches.
+                5.  **Over-the-counter Medication:** Consider paracetamol (acetaminophen), ibuprofen, or aspirin—if you don’t have any medical conditions that prevent their use and if they are appropriate for your age.
+
+                **🩺 When to Seek Medical Attention:**
+                * Headache is severe and sudden (thunderclap headache).
+                * It’s your worst headache ever.
+                * You have headache accompanied by fever, stiff neck, rash, confusion, seizures, double vision, weakness, numbness, or difficulty speaking.
+                * Headache follows a head injury.
+                * You get headaches frequently or they are worsening over time.
+                * New headaches if you are over 50.
+
+                This information is for general guidance and not a substitute for professional medical advice. If you have concerns, please consult a qualified doctor or healthcare provider.
+                """,
+    "chat.general": """I can provide general health information, but I'm not a substitute for a medical professional.
+            For specific medical advice, diagnosis, or treatment, please consult a qualified doctor or healthcare provider.""",
+    "prediction.respiratory_viral": """1. COVID-19\nLikelihood: High\nBrief explanation: Symptoms are highly consistent with viral respiratory infection.\nRecommended next steps: Get tested, self-isolate, consult a doctor.\n\n2. Bronchitis\nLikelihood: Medium\nBrief explanation: Inflammation of bronchial tubes, often follows a cold.\nRecommended next steps: Rest, fluids, consider cough suppressants if severe.\n\n3. Pneumonia\nLikelihood: Medium\nBrief explanation: Lung infection that inflames air sacs.\nRecommended next steps: Seek medical attention for diagnosis and treatment.""",
+    "prediction.headache_fatigue_fever": """1. Tension Headache\nLikelihood: High\nBrief explanation: Common type of headache often associated with stress.\nRecommended next steps: Rest, hydration, over-the-counter pain relievers.\n\n2. Migraine\nLikelihood: Medium\nBrief explanation: Severe headache often accompanied by nausea and sensitivity to light/sound.\nRecommended next steps: Avoid triggers, pain relief medication, consult doctor for prescription options.\n\n3. Viral Infection (e.g., common cold or flu)\nLikelihood: Medium\nBrief explanation: General body aches and fatigue are common with viral illnesses.\nRecommended next steps: Rest, fluids, monitor symptoms.""",
+    "prediction.influenza": """1. Influenza (Flu)\nLikelihood: High\nBrief explanation: Acute respiratory illness caused by influenza viruses.\nRecommended next steps: Rest, fluids, antiviral medication if prescribed, avoid contact with others, consult doctor if severe.\n\n2. Common Cold\nLikelihood: Medium\nBrief explanation: Milder viral infection of the nose and throat.\nRecommended next steps: Rest, fluids, symptom relief.\n\n3. COVID-19\nLikelihood: Medium\nBrief explanation: Viral respiratory illness with similar symptoms to flu.\nRecommended next steps: Get tested, self-isolate, consult a doctor.""",
+    "prediction.weight_loss_night_sweats": """1. HIV (Human Immunodeficiency Virus)\nLikelihood: High\nBrief explanation: A virus that attacks the body's immune system. Early symptoms can be flu-like.\nRecommended next steps: Get tested immediately, seek medical consultation for antiretroviral therapy (ART).\n\n2. Tuberculosis (TB)\nLikelihood: Medium\nBrief explanation: A bacterial infection that usually attacks the lungs. Symptoms include persistent cough, fever, night sweats, weight loss.\nRecommended next steps: Seek medical evaluation and testing (e.g., TB skin test, chest X-ray).\n\n3. Cancer\nLikelihood: Medium\nBrief explanation: Unexplained weight loss, fatigue, and night sweats can be general symptoms of various cancers.\nRecommended next steps: Consult a doctor for comprehensive diagnostic workup.""",
+    "prediction.lung_infection": """1. Pneumonia\nLikelihood: High\nBrief explanation: Infection that inflames air sacs in one or both lungs, which may fill with fluid or pus.\nRecommended next steps: Seek immediate medical attention for diagnosis and treatment (antibiotics/antivirals).\n\n2. Tuberculosis (TB)\nLikelihood: High\nBrief explanation: A bacterial infection primarily affecting the lungs, leading to chronic cough, chest pain, and other systemic symptoms.\nRecommended next steps: Consult a doctor for TB testing and treatment.\n\n3. Bronchitis\nLikelihood: Medium\nBrief explanation: Inflammation of the lining of your bronchial tubes, which carry air to and from your lungs.\nRecommended next steps: Rest, fluids, cough suppressants, consult doctor if symptoms persist.""",
+    "prediction.malaria": """1. Malaria\nLikelihood: High\nBrief explanation: A serious mosquito-borne disease caused by a parasite. Characterized by fever, chills, sweating, and flu-like illness, especially after travel to endemic areas.\nRecommended next steps: Seek urgent medical attention, inform doctor about travel history, immediate blood test for malaria parasites.\n\n2. Dengue Fever\nLikelihood: Medium\nBrief explanation: A mosquito-borne viral infection causing flu-like illness, severe muscle and joint pain, rash, and fever. More common in tropical and subtropical regions.\nRecommended next steps: Consult a doctor, symptomatic treatment, monitoring for warning signs.\n\n3. Influenza (Flu)\nLikelihood: Low\nBrief explanation: While symptoms can overlap, the travel history makes malaria or dengue more likely.\nRecommended next steps: Standard flu treatment if diagnosed, but prioritize ruling out tropical diseases.""",
+    "prediction.bowel_changes": """1. Colon Cancer\nLikelihood: High\nBrief explanation: Cancer of the large intestine. Symptoms can include changes in bowel habits, blood in stool, fatigue, and unexplained weight loss.\nRecommended next steps: Consult a gastroenterologist for screening and diagnostic tests (e.g., colonoscopy).\n\n2. Pancreatic Cancer\nLikelihood: Medium\nBrief explanation: Often presents with non-specific symptoms like weight loss, fatigue, and abdominal pain. Can also affect digestion leading to bowel changes.\nRecommended next steps: Seek medical evaluation, potentially imaging and specific blood tests.\n\n3. Irritable Bowel Syndrome (IBS)\nLikelihood: Low\nBrief explanation: While IBS causes changes in bowel habits, unexplained weight loss and significant fatigue are less typical primary symptoms, but can occur due to chronic discomfort.\nRecommended next steps: Consult a doctor for differential diagnosis and management.""",
+    "prediction.diabetes": """1. Diabetes (Type 2)\nLikelihood: High\nBrief explanation: A chronic condition that affects the way your body processes blood sugar (glucose). Classic symptoms include increased thirst, frequent urination, and blurred vision.\nRecommended next steps: Get blood sugar tested (fasting glucose, HbA1c), consult an endocrinologist or primary care doctor for management.\n\n2. Diabetes Insipidus\nLikelihood: Low\nBrief explanation: A rare condition where your body can't balance fluids, leading to extreme thirst and frequent urination. Not related to blood sugar.\nRecommended next steps: Medical evaluation to differentiate from diabetes mellitus.\n\n3. Urinary Tract Infection (UTI)\nLikelihood: Low\nBrief explanation: Can cause frequent urination and discomfort, but typically not increased thirst or blurred vision.\nRecommended next steps: Urinalysis if UTI is suspected.""",
+    "prediction.dengue": """1. Dengue Fever\nLikelihood: High\nBrief explanation: A mosquito-borne viral infection prevalent in tropical and subtropical regions. Characterized by high fever, severe headache, joint/muscle pain ("breakbone fever"), and a rash.\nRecommended next steps: Consult a doctor immediately, manage symptoms with pain relievers (avoid NSAIDs), monitor for warning signs (e.g., severe abdominal pain, bleeding).\n\n2. Chikungunya\nLikelihood: Medium\nBrief explanation: Another mosquito-borne viral infection with similar symptoms, but joint pain is often more prominent and debilitating.\nRecommended next steps: Medical evaluation for diagnosis and symptomatic treatment.\n\n3. Measles\nLikelihood: Low\nBrief explanation: While it causes fever and rash, measles typically presents with a specific sequence of symptoms including cough, coryza, conjunctivitis before the rash, and less severe joint pain.\nRecommended next steps: Consult doctor if measles is suspected.""",
+    "prediction.inconclusive": """Based on the provided symptoms and patient data, I can't give a definitive prediction.
+            Please consult a healthcare professional for diagnosis.""",
+    "treatment.mouth_ulcer": """
+                **Personalized Treatment Plan for Mouth Ulcer:**
+
+                1.  **Recommended Medications:**
+                    * **Topical Gels/Pastes:** Over-the-counter products containing benzocaine (e.g., Orajel), triamcinolone acetonide (prescription), or amlexanox may reduce pain and inflammation. Apply as directed, typically 3-4 times daily after meals.
+                    * **Antiseptic Mouthwashes:** Chlorhexidine gluconate or diluted salt water rinses (1/2 teaspoon salt in 1 cup warm water) can help keep the area clean and prevent secondary infection. Use 2-3 times daily.
+                    * **Pain Relievers:** Over-the-counter pain relievers like ibuprofen or acetaminophen can help manage pain if discomfort is significant.
+                2.  **Lifestyle Modifications:**
+                    * **Avoid Irritants:** Steer clear of spicy, acidic, salty, or very hot foods/drinks that can irritate the ulcer.
+                    * **Soft Diet:** Opt for soft, bland foods that are easy to chew and swallow.
+                    * **Good Oral Hygiene:** Gently brush your teeth with a soft-bristled toothbrush. Avoid abrasive toothpaste.
+                    * **Stress Reduction:** Stress can sometimes trigger or worsen mouth ulcers. Practice relaxation techniques like meditation or deep breathing.
+                3.  **Follow-up Testing and Monitoring:**
+                    * Monitor the ulcer for signs of healing. Most simple mouth ulcers heal within 1-2 weeks.
+                    * If the ulcer does not heal within 3 weeks, becomes larger, more painful, or you develop new symptoms (like fever or swollen lymph nodes), consult your dentist or doctor for further evaluation to rule out other conditions.
+                    * Recurrent ulcers may require further investigation to identify underlying causes (e.g., nutritional deficiencies, autoimmune conditions).
+                4.  **Dietary Recommendations:**
+                    * Ensure adequate intake of B vitamins (especially B12, folate) and iron, as deficiencies can contribute to ulcers. Consider supplements if dietary intake is insufficient, but consult a doctor first.
+                    * Stay well-hydrated.
+                5.  **Physical Activity Guidelines:**
+                    * Maintain regular, moderate physical activity to support overall health and stress reduction. No specific restrictions due to mouth ulcers unless discomfort is severe.
+                6.  **Mental Health Considerations:**
+                    * Recognize that stress can impact physical health, including oral health. Manage stress through adequate sleep, hobbies, and if necessary, professional support.
+                *Disclaimer: This plan is for informational purposes only and is not a substitute for professional medical advice. Always consult a qualified healthcare provider for diagnosis and treatment.*
+                """,
+    "treatment.hypertension": """
+                **Personalized Treatment Plan for Hypertension (High Blood Pressure):**
+
+                1.  **Recommended Medications:**
+                    * Your doctor may prescribe medications such as ACE inhibitors (e.g., lisinopril), ARBs (e.g., valsartan), calcium channel blockers (e.g., amlodipine), or diuretics (e.g., hydrochlorothiazide).
+                    * Dosage and specific medication will be determined by your doctor based on your individual health profile and response. It's crucial to take medications exactly as prescribed and not to stop without consulting your doctor.
+                2.  **Lifestyle Modifications:**
+                    * **DASH Diet:** Adopt the Dietary Approaches to Stop Hypertension (DASH) eating plan, which emphasizes fruits, vegetables, whole grains, lean protein, and low-fat dairy, while limiting saturated and trans fats, cholesterol, and sodium.
+                    * **Sodium Reduction:** Aim for less than 2,300 mg of sodium per day, ideally less than 1,500 mg for most adults. Read food labels carefully.
+                    * **Weight Management:** If overweight or obese, losing even a small amount of weight can significantly lower blood pressure.
+                    * **Regular Physical Activity:** Aim for at least 150 minutes of moderate-intensity aerobic activity or 75 minutes of vigorous-intensity activity per week.
+                    * **Limit Alcohol:** If you drink alcohol, do so in moderation (up to one drink per day for women, up to two for men).
+                    * **Quit Smoking:** Smoking significantly increases the risk of heart disease and stroke.
+                    * **Stress Management:** Practice stress-reducing techniques such as meditation, yoga, or deep breathing.
+                3.  **Follow-up Testing and Monitoring:**
+                    * Regularly monitor your blood pressure at home and keep a record to share with your doctor.
+                    * Schedule regular follow-up appointments with your healthcare provider to monitor your blood pressure, review your medication effectiveness, and adjust your treatment plan as needed.
+                    * Regular blood tests (e.g., kidney function, electrolytes) may be performed to monitor medication side effects.
+                4.  **Dietary Recommendations:**
+                    * Increase intake of potassium-rich foods (e.g., bananas, spinach, potatoes), but consult your doctor if you have kidney issues or are on certain medications.
+                    * Consume foods rich in magnesium and calcium.
+
+                5.  **Physical Activity Guidelines:**
+                    * Incorporate a mix of aerobic activities (walking, jogging, swimming) and strength training (at least twice a week).
+                    * Consult your doctor before starting any new exercise regimen.
+                6.  **Mental Health Considerations:**
+                    * Manage stress effectively as chronic stress can contribute to high blood pressure. Seek support if you experience anxiety or depression.
+
+                *Disclaimer: This plan is for informational purposes only and is not a substitute for professional medical advice. Always consult a qualified healthcare provider for diagnosis and treatment of hypertension.*
+                """,
+    "treatment.asthma": """
+                **Personalized Treatment Plan for Asthma:**
+
+                1.  **Recommended Medications:**
+                    * **Reliever Inhalers (Short-Acting Beta-Agonists - SABAs):** Such as albuterol, used for quick relief of symptoms.
+                    * **Controller Inhalers (Inhaled Corticosteroids - ICS):** Such as fluticasone or budesonide, used daily to reduce inflammation and prevent attacks.
+                    * **Combination Inhalers (ICS + Long-Acting Beta-Agonists - LABAs):** For more severe asthma.
+                    * **Oral Corticosteroids:** For severe exacerbations.
+                    * **Leukotriene Modifiers:** Such as montelukast, can help reduce inflammation and improve lung function.
+                    * **Biologics:** For severe allergic or eosinophilic asthma.
+                    * *Dosage and specific medication will be determined by your doctor based on your asthma severity and triggers. Adherence to the prescribed regimen is crucial.*
+                2.  **Lifestyle Modifications:**
+                    * **Identify and Avoid Triggers:** Common triggers include allergens (pollen, dust mites, pet dander), irritants (smoke, pollution, strong odors), exercise, cold air, and stress.
+                    * **Maintain a Clean Environment:** Regularly clean your home to reduce dust mites and mold.
+                    * **Avoid Smoking and Secondhand Smoke.**
+                    * **Get Vaccinated:** Annual flu shots and pneumonia vaccines are recommended.
+                3.  **Follow-up Testing and Monitoring:**
+                    * **Regular Doctor Visits:** For ongoing assessment of asthma control and adjustment of medication.
+                    * **Peak Flow Monitoring:** Use a peak flow meter daily to monitor lung function and detect early signs of worsening asthma.
+                    * **Asthma Action Plan:** Develop a written plan with your doctor that outlines daily management, how to handle worsening symptoms, and when to seek emergency care.
+                4.  **Dietary Recommendations:**
+                    * No specific diet cures asthma, but a healthy, balanced diet rich in fruits, vegetables, and whole grains can support overall health.
+                    * Some studies suggest vitamin D and omega-3 fatty acids might have a protective effect, but consult your doctor before taking supplements.
+                5.  **Physical Activity Guidelines:**
+                    * Regular physical activity is encouraged, as it strengthens the lungs and improves overall fitness.
+                    * Warm-up exercises before activity and using a reliever inhaler (if prescribed) can help prevent exercise-induced asthma.
+                    * Choose activities suitable for your condition; swimming is often well-tolerated.
+                6.  **Mental Health Considerations:**
+                    * Stress and anxiety can trigger asthma symptoms. Practice stress-reduction techniques like deep breathing, meditation, or yoga.
+                    * Seek support if you experience anxiety or depression related to your asthma.
+                *Disclaimer: This plan is for informational purposes only and is not a substitute for professional medical advice. Always consult a qualified healthcare provider for diagnosis and treatment of asthma.*
+                """,
+    "treatment.diabetes": """
+                **Personalized Treatment Plan for Diabetes (Type 2):**
+
+                1.  **Recommended Medications:**
+                    * **Metformin:** Often the first-line medication, helps reduce glucose production by the liver and improve insulin sensitivity.
+                    * **Sulfonylureas (e.g., glipizide):** Stimulate the pancreas to produce more insulin.
+                    * **DPP-4 Inhibitors (e.g., sitagliptin):** Help the body make more insulin and reduce glucose.
+                    * **SGLT2 Inhibitors (e.g., empagliflozin):** Help the kidneys remove glucose from the body.
+                    * **GLP-1 Receptor Agonists (e.g., liraglutide):** Slow digestion and help the body produce more insulin.
+                    * **Insulin Therapy:** May be required if other medications are not sufficient to control blood sugar.
+                    * *Medication choice and dosage depend on individual factors, blood sugar levels, and other health conditions. Strict adherence and regular monitoring are essential.*
+                2.  **Lifestyle Modifications:**
+                    * **Healthy Eating:** Focus on a balanced diet rich in non-starchy vegetables, lean proteins, and whole grains. Limit refined carbohydrates, sugary drinks, and unhealthy fats.
+                    * **Portion Control:** Manage portion sizes to control calorie and carbohydrate intake.
+                    * **Regular Physical Activity:** Aim for at least 150 minutes of moderate-intensity aerobic activity per week, plus muscle-strengthening activities at least two days a week.
+                    * **Weight Management:** If overweight or obese, even modest weight loss can significantly improve blood sugar control.
+                    * **Quit Smoking:** Smoking worsens diabetes complications.
+                    * **Limit Alcohol:** Consume alcohol in moderation, if at all.
+                3.  **Follow-up Testing and Monitoring:**
+                    * **Regular Blood Glucose Monitoring:** Home blood glucose monitoring (HBGM) as advised by your doctor.
+                    * **HbA1c Testing:** Every 3-6 months to assess long-term blood sugar control.
+                    * **Regular Doctor Visits:** For medication adjustments, screening for complications (eyes, kidneys, nerves, feet), and overall health assessment.
+                    * **Blood Pressure and Cholesterol Monitoring:** Manage these to reduce cardiovascular risk.
+                4.  **Dietary Recommendations:**
+                    * **Carbohydrate Counting:** Learn to count carbohydrates to manage blood sugar levels, especially if on insulin.
+                    * **Glycemic Index (GI):** Understand how different foods affect blood sugar and choose lower GI options.
+                    * **Fiber Intake:** Increase fiber-rich foods (vegetables, fruits, whole grains) to help regulate blood sugar.
+                5.  **Physical Activity Guidelines:**
+                    * Incorporate both aerobic (walking, cycling, swimming) and resistance training.
+                    * Monitor blood sugar before, during, and after exercise, especially if on insulin or certain medications, to prevent hypoglycemia.
+                6.  **Mental Health Considerations:**
+                    * Managing a chronic condition like diabetes can be stressful. Seek support for anxiety or depression.
+                    * Diabetes education and support groups can provide valuable resources and coping strategies.
+                *Disclaimer: This plan is for informational purposes only and is not a substitute for professional medical advice. Always consult a qualified healthcare provider for diagnosis and treatment of diabetes.*
+                """,
+    "treatment.cancer": """
+                **Personalized Treatment Plan for Cancer:**
+
+                1.  **Recommended Treatments (Varies Greatly by Cancer Type and Stage):**
+                    * **Surgery:** To remove the tumor and surrounding tissue.
+                    * **Chemotherapy:** Medications that kill cancer cells or slow their growth. Administered orally or intravenously.
+                    * **Radiation Therapy:** Uses high-energy rays to kill cancer cells. Can be external beam radiation or brachytherapy (internal).
+                    * **Targeted Therapy:** Drugs that specifically target cancer cells' unique vulnerabilities, often with fewer side effects than chemotherapy.
+                    * **Immunotherapy:** Boosts the body's own immune system to fight cancer.
+                    * **Hormone Therapy:** Used for hormone-sensitive cancers (e.g., breast, prostate) to block hormone production or action.
+                    * **Stem Cell Transplant:** Used for certain blood cancers to replace diseased bone marrow.
+                    * *The specific treatment regimen will be determined by a multidisciplinary team of oncologists, surgeons, radiation therapists, etc., based on the cancer type, stage, patient's overall health, and genetic markers.*
+                2.  **Lifestyle Modifications:**
+                    * **Nutritional Support:** Maintain a balanced diet, often with the help of a dietitian, to manage treatment side effects and maintain strength.
+                    * **Gentle Physical Activity:** As tolerated and approved by your medical team, light exercise can help with fatigue and mood.
+                    * **Avoid Smoking and Alcohol:** Crucial for improving treatment outcomes and preventing recurrence or new cancers.
+                    * **Rest:** Adequate rest is vital during treatment.
+                3.  **Follow-up Testing and Monitoring:**
+                    * **Regular Imaging (CT, MRI, PET scans):** To monitor treatment response and detect recurrence.
+                    * **Blood Tests (Tumor Markers, CBC):** To monitor cancer activity, treatment side effects, and overall health.
+                    * **Frequent Oncologist Visits:** For treatment adjustments, symptom management, and long-term surveillance.
+                    * **Genetic Testing:** May be recommended to guide targeted therapies.
+                4.  **Dietary Recommendations:**
+                    * Focus on nutrient-dense foods, small frequent meals to manage nausea and appetite changes.
+                    * Stay hydrated.
+                    * Avoid raw or undercooked foods if your immune system is compromised.
+                5.  **Physical Activity Guidelines:**
+                    * Tailored exercise plans are important. Start with short walks and gradually increase activity as tolerated.
+                    * Consult with your care team before starting any new exercise program.
+                6.  **Mental Health Considerations:**
+                    * Cancer diagnosis and treatment are emotionally challenging. Seek psychological support, counseling, or support groups.
+                    * Manage stress through relaxation techniques, mindfulness, or professional therapy.
+                    * Discuss concerns about pain, fatigue, and other side effects with your medical team.
+                *Disclaimer: This plan is for informational purposes only and is not a substitute for professional medical advice. Cancer treatment is highly individualized and requires comprehensive care from a specialized medical team.*
+                """,
+    "treatment.migraine": """
+                **Personalized Treatment Plan for Migraine:**
+
+                1.  **Recommended Medications:**
+                    * **Acute Treatment (for attacks):**
+                        * **Over-the-counter pain relievers:** Ibuprofen, naproxen, acetaminophen (for mild migraines).
+                        * **Triptans (e.g., sumatriptan, zolmitriptan):** Specific migraine medications that relieve pain, nausea, and light/sound sensitivity.
+                        * **CGRP Receptor Antagonists (e.g., ubrogepant, rimegepant):** Newer drugs for acute treatment.
+                        * **Ergotamines:** Used for severe, prolonged attacks.
+                        * **Anti-nausea medications:** If nausea and vomiting are significant.
+                    * **Preventive Treatment (taken regularly to reduce frequency/severity):**
+                        * **Beta-blockers (e.g., propranolol):** Originally for heart conditions, effective for migraine prevention.
+                        * **Antidepressants (e.g., amitriptyline):** Tricyclic antidepressants can help.
+                        * **Anti-seizure drugs (e.g., topiramate, valproate):** Also effective for migraine prevention.
+                        * **CGRP Monoclonal Antibodies (e.g., erenumab, fremanezumab):** Newer injectable preventive treatments.
+                        * **Botox Injections:** For chronic migraine (15 or more headache days per month).
+                    * *Medication selection depends on frequency, severity, and other health conditions. Work with your doctor to find the most effective combination.*
+                2.  **Lifestyle Modifications:**
+                    * **Identify and Avoid Triggers:** Common triggers include certain foods (aged cheese, processed meats, caffeine withdrawal), stress, sleep deprivation, hormonal changes, bright lights, loud noises, and strong smells. Keep a migraine diary.
+                    * **Regular Sleep Schedule:** Go to bed and wake up at consistent times.
+                    * **Regular Meals:** Don't skip meals.
+                    * **Hydration:** Drink plenty of water throughout the day.
+                    * **Stress Management:** Practice relaxation techniques like yoga, meditation, deep breathing, or biofeedback.
+                3.  **Follow-up Testing and Monitoring:**
+                    * **Migraine Diary:** Crucial for tracking triggers, symptoms, and medication effectiveness.
+                    * **Regular Doctor Visits:** To review medication effectiveness, adjust treatment, and discuss new strategies.
+                    * **Neurological Evaluation:** May be performed to rule out other conditions.
+                4.  **Dietary Recommendations:**
+                    * While not a universal solution, identifying and avoiding food triggers can be helpful for some.
+                    * Maintain a balanced diet.
+                5.  **Physical Activity Guidelines:**
+                    * Regular, moderate exercise can help reduce migraine frequency and severity.
+                    * Avoid intense exercise during an impending or active migraine attack.
+                    * Warm up and cool down properly.
+                6.  **Mental Health Considerations:**
+                    * Migraines can significantly impact quality of life and lead to anxiety or depression.
+                    * Seek counseling or therapy to cope with chronic pain and stress.
+                    * Support groups can provide a sense of community and shared experience.
+                *Disclaimer: This plan is for informational purposes only and is not a substitute for professional medical advice. Always consult a qualified healthcare provider for diagnosis and treatment of migraine.*
+                """,
+    "treatment.insufficient_details": "A personalized treatment plan cannot be generated with the provided information. Please ensure the condition and patient details are complete.",
+    "default": "I am unable to generate a response for this request at the moment. Please try rephrasing your query.",}
+
+# --- Rule Table ---
+# Intents are detected from a marker phrase in the prompt template. For chat
+# prompts only the text after the marker (the patient's question) is matched.
+INTENTS = [
+    # (intent, marker phrase, match only after the marker, fallback response id)
+    ("chat", "patient question:", True, "chat.general"),
+    ("prediction", "predict potential health conditions", False, "prediction.inconclusive"),
+    ("treatment", "generate a personalized treatment plan", False, "treatment.insufficient_details"),
+]
+DEFAULT_RESPONSE_ID = "default"
+# Prompts may open with retrieved reference material (see prompts.format_references).
+# Only the text after its closing line is matched, so references never select a rule.
+REFERENCE_START, REFERENCE_END = "reference material", "end of reference material"
+
+# (intent, required keywords, response id). A rule matches when every keyword
+# occurs in the prompt; among matching rules the one with the most keywords
+# wins, and ties go to the rule declared first.
+RULES = [
+    ("chat", ("fever", "cough"), "chat.flu_or_cold"),
+    ("chat", ("headache", "fatigue", "fever"), "chat.headache_fatigue_fever"),
+    ("chat", ("stomach pain",), "chat.stomach_pain"),
+    ("chat", ("persistent cough", "low-grade fever"), "chat.persistent_cough_low_fever"),
+    ("chat", ("fever", "runny nose", "headache", "joint pain"), "chat.flu_symptom_cluster"),
+    ("chat", ("headache", "fatigue", "mild fever"), "chat.headache_fatigue_mild_fever"),
+    ("chat", ("fever",), "chat.fever"),
+    ("chat", ("cough",), "chat.cough"),
+    ("chat", ("cold",), "chat.cold"),
+    ("chat", ("cold", "fever"), "chat.cold_and_fever"),
+    ("chat", ("headache",), "chat.headache"),
+
+    ("prediction", ("dry cough", "shortness of breath"), "prediction.respiratory_viral"),
+    ("prediction", ("headache", "fatigue", "fever"), "prediction.headache_fatigue_fever"),
+    ("prediction", ("fever", "body aches", "cough"), "prediction.influenza"),
+    ("prediction", ("unexplained weight loss", "fatigue", "night sweats"), "prediction.weight_loss_night_sweats"),
+    ("prediction", ("persistent cough", "chest pain", "shortness of breath"), "prediction.lung_infection"),
+    ("prediction", ("fever", "chills", "sweating", "muscle pain", "travel history to malaria-prone area"), "prediction.malaria"),
+    ("prediction", ("unexplained weight loss", "fatigue", "changes in bowel habits"), "prediction.bowel_changes"),
+    ("prediction", ("frequent urination", "increased thirst", "blurred vision"), "prediction.diabetes"),
+    ("prediction", ("high fever", "severe headache", "joint and muscle pain", "skin rash"), "prediction.dengue"),
+
+    ("treatment", ("mouth ulcer",), "treatment.mouth_ulcer"),
+    ("treatment", ("hypertension",), "treatment.hypertension"),
+    ("treatment", ("asthma",), "treatment.asthma"),
+    ("treatment", ("diabetes",), "treatment.diabetes"),
+    ("treatment", ("cancer",), "treatment.cancer"),
+    ("treatment", ("migraine",), "treatment.migraine"),
+]
+
+
+# --- Compiled Matcher ---
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over every keyword of a rule table, plus an
+    inverted index from keyword to the rules that require it.
+    Scanning costs one pass over the text; selecting a rule only touches
+    the rules whose keywords were actually seen.
+    """
+    def __init__(self, rules, markers=()):
+        self.rules = [(intent, tuple(k.lower() for k in keywords), response_id)
+                      for intent, keywords, response_id in rules]
+        self.keywords = []
+        self.keyword_ids = {}
+        self.postings = []  # keyword id -> [rule index, ...]
+        for phrase in markers:
+            self._keyword_id(phrase.lower())
+        for rule_index, (_, keywords, _) in enumerate(self.rules):
+            for keyword in set(keywords):
+                self.postings[self._keyword_id(keyword)].append(rule_index)
+        self._build_automaton()
+
+    def _keyword_id(self, keyword):
+        if keyword not in self.keyword_ids:
+            self.keyword_ids[keyword] = len(self.keywords)
+            self.keywords.append(keyword)
+            self.postings.append([])
+        return self.keyword_ids[keyword]
+
+    def _build_automaton(self):
+        goto, fail, output = [{}], [0], [()]
+        for keyword_id, keyword in enumerate(self.keywords):
+            state = 0
+            for ch in keyword:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    fail.append(0)
+                    output.append(())
+                state = nxt
+            output[state] += (keyword_id,)
+
+        # Breadth-first pass to wire failure links and merge outputs
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                output[nxt] += output[fail[nxt]]
+
+        self._goto, self._fail, self._output = goto, fail, output
+
+    def scan(self, text):
+        """
+        Single pass over `text` (already lowercased).
+        Returns {keyword id: (first end offset, last end offset)}.
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        hits = {}
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for keyword_id in output[state]:
+                first = hits.get(keyword_id)
+                hits[keyword_id] = (first[0] if first else i, i)
+        return hits
+
+    def best_rule(self, hits, intent, after=-1):
+        """
+        Most specific rule of `intent` whose keywords all occur in `hits`.
+        Keywords must end after offset `after` (used to scope chat prompts
+        to the patient's question). Returns a rule index or None.
+        """
+        counts = {}
+        for keyword_id, (_, last) in hits.items():
+            if last - len(self.keywords[keyword_id]) < after:
+                continue
+            for rule_index in self.postings[keyword_id]:
+                if self.rules[rule_index][0] == intent:
+                    counts[rule_index] = counts.get(rule_index, 0) + 1
+
+        best = None
+        for rule_index, count in counts.items():
+            if count != len(set(self.rules[rule_index][1])):
+                continue
+            rank = (count, -rule_index)
+            if best is None or rank > best[0]:
+                best = (rank, rule_index)
+        return best[1] if best else None
+
+
+# --- Latency Profiles ---
+def count_tokens(text):
+    """Rough token estimate (~4 characters per token, like most BPE vocabularies)."""
+    return max(1, (len(text) + 3) // 4)
+
+
+class LatencyModel:
+    """Zero-latency profile. Subclasses override `delay`."""
+    def delay(self, response):
+        """Seconds the simulated backend takes to return `response`."""
+        return 0.0
+
+    def wait(self, response):
+        seconds = self.delay(response)
+        if seconds > 0:
+            time.sleep(seconds)
+        return seconds
+
+    def chunk_delays(self, chunks):
+        """
+        Delay before each streamed chunk. By default the full-response delay
+        is spread evenly, so streaming and non-streaming calls take as long.
+        """
+        if not chunks:
+            return []
+        per_chunk = self.delay("".join(chunks)) / len(chunks)
+        return [per_chunk] * len(chunks)
+
+
+class FixedLatency(LatencyModel):
+    """Same delay for every request."""
+    def __init__(self, seconds):
+        self.seconds = float(seconds)
+
+    def delay(self, response):
+        return self.seconds
+
+
+class SampledLatency(LatencyModel):
+    """Delay drawn from a recorded distribution of latencies (in seconds)."""
+    def __init__(self, samples, seed=None):
+        self.samples = [float(s) for s in samples]
+        if not self.samples:
+            raise ValueError("SampledLatency needs at least one recorded latency")
+        self._rng = random.Random(seed)
+
+    def delay(self, response):
+        return self._rng.choice(self.samples)
+
+
+class TokensPerSecondLatency(LatencyModel):
+    """Time-to-first-token plus a delay proportional to the response length."""
+    def __init__(self, tokens_per_second, first_token_seconds=0.0):
+        self.tokens_per_second = float(tokens_per_second)
+        if self.tokens_per_second <= 0:
+            raise ValueError("tokens_per_second must be positive")
+        self.first_token_seconds = float(first_token_seconds)
+
+    def delay(self, response):
+        return self.first_token_seconds + count_tokens(response) / self.tokens_per_second
+
+    def chunk_delays(self, chunks):
+        delays = [count_tokens(chunk) / self.tokens_per_second for chunk in chunks]
+        if delays:
+            delays[0] += self.first_token_seconds
+        return delays
+
+
+def _load_samples(source):
+    """Comma-separated seconds, or a file with one latency (in seconds) per line."""
+    if "," not in source:
+        try:
+            with open(source) as f:
+                return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+        except FileNotFoundError:
+            pass
+    return [s for s in source.split(",") if s.strip()]
+
+
+def parse_latency_profile(spec, seed=None):
+    """
+    Builds a latency model from a profile string, e.g. the GRANITE_LATENCY
+    environment variable:
+        zero                       no delay (throughput testing)
+        fixed:2                    2 seconds per request
+        sampled:latencies.txt      sampled from a recorded distribution
+        sampled:0.4,0.8,1.1,4.5    same, inline
+        tokens:40                  40 tokens/second of response
+        tokens:40:0.3              same, plus 0.3s before the first token
+    """
+    kind, _, args = (spec or "zero").strip().partition(":")
+    kind = kind.lower()
+    try:
+        if kind in ("zero", "none", "off"):
+            return LatencyModel()
+        if kind == "fixed":
+            return FixedLatency(args)
+        if kind == "sampled":
+            return SampledLatency(_load_samples(args), seed=seed)
+        if kind == "tokens":
+            return TokensPerSecondLatency(*args.split(":"))
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid latency profile {spec!r}: {e}") from e
+    raise ValueError(f"Unknown latency profile {spec!r}; expected zero, fixed, sampled or tokens")
+
+
+# --- Streaming ---
+# A chunk is one word with its leading whitespace, close to the size of the
+# tokens a real backend streams. Trailing whitespace becomes its own chunk so
+# that joining the chunks gives back the exact response.
+_CHUNK_RE = re.compile(r"\s*\S+|\s+")
+
+
+def split_chunks(text):
+    """Splits a response into token-sized chunks that join back to `text`."""
+    return _CHUNK_RE.findall(text)
+
+
+# --- Mock IBM Granite Model Integration ---
+class MockGraniteModel:
+    """
+    A mock class to simulate IBM Granite-13b-instruct-v2 model's generate_text method.
+    In a real application, this would be replaced with actual IBM Watson ML SDK calls.
+    """
+    def __init__(self, rules=RULES, responses=RESPONSES, latency=None):
+        self.responses = responses
+        self.latency = latency or LatencyModel()
+        self.matcher = KeywordMatcher(rules, markers=[marker for _, marker, _, _ in INTENTS])
+
+    def match(self, prompt):
+        """Returns the response id the rule table selects for `prompt`."""
+        matcher = self.matcher
+        text = prompt.lower()
+        if text.lstrip().startswith(REFERENCE_START):
+            text = text.partition(REFERENCE_END)[2]
+        hits = matcher.scan(text)
+        for intent, marker, scoped, fallback in INTENTS:
+            marker_hit = hits.get(matcher.keyword_ids[marker])
+            if marker_hit is None:
+                continue
+            rule_index = matcher.best_rule(hits, intent, after=marker_hit[0] if scoped else -1)
+            return matcher.rules[rule_index][2] if rule_index is not None else fallback
+        return DEFAULT_RESPONSE_ID
+
+    def generate_text(self, prompt):
+        response = self.responses[self.match(prompt)]
+        # Simulate the delay of AI processing
+        self.latency.wait(response)
+        return response
+
+    def generate_text_stream(self, prompt):
+        """Like `generate_text`, but yields the response chunk by chunk."""
+        chunks = split_chunks(self.responses[self.match(prompt)])
+        for chunk, seconds in zip(chunks, self.latency.chunk_delays(chunks)):
+            if seconds > 0:
+                time.sleep(seconds)
+            yield chunk
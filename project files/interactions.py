@@ -0,0 +1,317 @@
+"""
+Drug interaction and allergy screening.
+
+Free text (a profile's current medications and allergies, or a generated
+plan) is parsed into normalized drug ids by a lexicon of generic names,
+brand names and drug-class names. Each drug expands to its concepts, i.e.
+itself plus its classes. Pairs of concepts are looked up in a hash index
+compiled once from the interaction table, so screening a drug pair costs a
+handful of dict lookups (a few microseconds) and every plan is checked
+inline, without a model call.
+
+The built-in tables are a small illustrative subset for the conditions the
+app covers, not a clinical reference. Extra rows can be loaded from a CSV
+file (see `load_table`).
+"""
+import csv
+import re
+from dataclasses import dataclass
+
+CONTRAINDICATED, MAJOR, MODERATE = "contraindicated", "major", "moderate"
+SEVERITY_RANK = {CONTRAINDICATED: 0, MAJOR: 1, MODERATE: 2}
+
+# Drug id -> (other names, classes)
+DRUGS = {
+    "ibuprofen": (("advil", "motrin", "nurofen"), ("nsaid",)),
+    "naproxen": (("aleve", "naprosyn"), ("nsaid",)),
+    "aspirin": (("acetylsalicylic acid",), ("nsaid", "antiplatelet")),
+    "acetaminophen": (("paracetamol", "tylenol"), ()),
+    "lisinopril": (("zestril", "prinivil"), ("ace_inhibitor",)),
+    "enalapril": ((), ("ace_inhibitor",)),
+    "valsartan": (("diovan",), ("arb",)),
+    "losartan": (("cozaar",), ("arb",)),
+    "amlodipine": (("norvasc",), ("calcium_channel_blocker",)),
+    "hydrochlorothiazide": (("hctz",), ("thiazide", "sulfonamide")),
+    "spironolactone": (("aldactone",), ("potassium_sparing_diuretic",)),
+    "metformin": (("glucophage",), ()),
+    "glipizide": ((), ("sulfonylurea", "sulfonamide")),
+    "sitagliptin": (("januvia",), ("dpp4_inhibitor",)),
+    "empagliflozin": (("jardiance",), ("sglt2_inhibitor",)),
+    "liraglutide": (("victoza",), ("glp1_agonist",)),
+    "insulin": ((), ()),
+    "albuterol": (("salbutamol", "ventolin"), ("beta_agonist",)),
+    "fluticasone": (("flovent",), ("inhaled_corticosteroid",)),
+    "budesonide": (("pulmicort",), ("inhaled_corticosteroid",)),
+    "montelukast": (("singulair",), ()),
+    "prednisone": (("prednisolone",), ("corticosteroid",)),
+    "triamcinolone": ((), ("corticosteroid",)),
+    "sumatriptan": (("imitrex",), ("triptan",)),
+    "zolmitriptan": (("zomig",), ("triptan",)),
+    "ergotamine": (("cafergot",), ("ergot",)),
+    "propranolol": (("inderal",), ("beta_blocker",)),
+    "metoprolol": (("lopressor", "toprol"), ("beta_blocker",)),
+    "amitriptyline": (("elavil",), ("tricyclic_antidepressant",)),
+    "topiramate": (("topamax",), ()),
+    "valproate": (("valproic acid", "depakote"), ()),
+    "sertraline": (("zoloft",), ("ssri",)),
+    "fluoxetine": (("prozac",), ("ssri",)),
+    "phenelzine": (("nardil",), ("maoi",)),
+    "tramadol": (("ultram",), ("opioid",)),
+    "codeine": ((), ("opioid",)),
+    "warfarin": (("coumadin",), ("anticoagulant",)),
+    "apixaban": (("eliquis",), ("anticoagulant",)),
+    "clopidogrel": (("plavix",), ("antiplatelet",)),
+    "simvastatin": (("zocor",), ("statin",)),
+    "clarithromycin": (("biaxin",), ("macrolide",)),
+    "amoxicillin": (("amoxil",), ("penicillin",)),
+    "penicillin": ((), ("penicillin",)),
+    "sulfamethoxazole": (("bactrim", "septra"), ("sulfonamide",)),
+    "lithium": ((), ()),
+    "sildenafil": (("viagra",), ("pde5_inhibitor",)),
+    "nitroglycerin": (("glyceryl trinitrate",), ("nitrate",)),
+    "benzocaine": (("orajel",), ("local_anesthetic",)),
+    "chlorhexidine": ((), ()),
+}
+
+# Class id -> names it is written as (in plans and profiles)
+CLASSES = {
+    "nsaid": ("nsaid", "nsaids", "anti-inflammatory", "anti-inflammatories"),
+    "ace_inhibitor": ("ace inhibitor", "ace inhibitors"),
+    "arb": ("arb", "arbs", "angiotensin receptor blocker", "angiotensin receptor blockers"),
+    "calcium_channel_blocker": ("calcium channel blocker", "calcium channel blockers"),
+    "thiazide": ("thiazide", "thiazides"),
+    "sulfonylurea": ("sulfonylurea", "sulfonylureas"),
+    "sulfonamide": ("sulfa", "sulfa drugs", "sulfonamide", "sulfonamides"),
+    "beta_blocker": ("beta blocker", "beta blockers", "beta-blocker", "beta-blockers"),
+    "corticosteroid": ("corticosteroid", "corticosteroids", "steroid", "steroids"),
+    "triptan": ("triptan", "triptans"),
+    "ssri": ("ssri", "ssris"),
+    "maoi": ("maoi", "maois"),
+    "opioid": ("opioid", "opioids"),
+    "anticoagulant": ("anticoagulant", "anticoagulants", "blood thinner", "blood thinners"),
+    "penicillin": ("penicillins",),
+    "statin": ("statin", "statins"),
+    "nitrate": ("nitrate", "nitrates"),
+}
+
+# Display names of class ids that are not plain words
+CLASS_LABELS = {"nsaid": "NSAIDs", "ace_inhibitor": "ACE inhibitors", "arb": "ARBs", "ssri": "SSRIs",
+                "maoi": "MAOIs", "glp1_agonist": "GLP-1 agonists", "dpp4_inhibitor": "DPP-4 inhibitors",
+                "sglt2_inhibitor": "SGLT2 inhibitors", "pde5_inhibitor": "PDE5 inhibitors"}
+
+# Allergy to the first concept implies caution with the second (cross-reactivity)
+ALLERGY_CROSS_REACTIVITY = {"aspirin": "nsaid"}
+
+# (concept, concept, severity, note); concepts are drug or class ids
+INTERACTIONS = [
+    ("nsaid", "anticoagulant", MAJOR, "raises the risk of serious bleeding"),
+    ("nsaid", "antiplatelet", MODERATE, "raises the risk of stomach bleeding"),
+    ("nsaid", "ace_inhibitor", MODERATE, "can blunt the blood-pressure effect and strain the kidneys"),
+    ("nsaid", "arb", MODERATE, "can blunt the blood-pressure effect and strain the kidneys"),
+    ("nsaid", "thiazide", MODERATE, "can blunt the diuretic and blood-pressure effect"),
+    ("nsaid", "lithium", MAJOR, "raises lithium to toxic levels"),
+    ("nsaid", "ssri", MODERATE, "raises the risk of stomach bleeding"),
+    ("corticosteroid", "nsaid", MODERATE, "raises the risk of stomach ulcers and bleeding"),
+    ("ace_inhibitor", "arb", MAJOR, "dual blockade raises potassium and the risk of kidney injury"),
+    ("ace_inhibitor", "potassium_sparing_diuretic", MAJOR, "can raise potassium to dangerous levels"),
+    ("arb", "potassium_sparing_diuretic", MAJOR, "can raise potassium to dangerous levels"),
+    ("ace_inhibitor", "lithium", MAJOR, "raises lithium levels"),
+    ("thiazide", "lithium", MAJOR, "raises lithium levels"),
+    ("triptan", "ssri", MAJOR, "risk of serotonin syndrome"),
+    ("triptan", "maoi", CONTRAINDICATED, "risk of serotonin syndrome; MAOIs block triptan breakdown"),
+    ("triptan", "ergot", CONTRAINDICATED, "additive narrowing of blood vessels; separate doses by 24 hours"),
+    ("ssri", "maoi", CONTRAINDICATED, "risk of serotonin syndrome"),
+    ("tricyclic_antidepressant", "maoi", CONTRAINDICATED, "risk of serotonin syndrome and hypertensive crisis"),
+    ("tramadol", "ssri", MAJOR, "risk of serotonin syndrome and seizures"),
+    ("tramadol", "maoi", CONTRAINDICATED, "risk of serotonin syndrome"),
+    ("amitriptyline", "ssri", MODERATE, "fluoxetine and sertraline raise amitriptyline levels"),
+    ("beta_blocker", "beta_agonist", MODERATE, "non-selective beta-blockers oppose reliever inhalers"),
+    ("sulfonylurea", "insulin", MODERATE, "additive risk of low blood sugar"),
+    ("corticosteroid", "insulin", MODERATE, "steroids raise blood sugar; insulin needs may change"),
+    ("corticosteroid", "metformin", MODERATE, "steroids raise blood sugar"),
+    ("warfarin", "antiplatelet", MAJOR, "raises the risk of serious bleeding"),
+    ("warfarin", "clarithromycin", MAJOR, "raises warfarin levels and bleeding risk"),
+    ("warfarin", "acetaminophen", MODERATE, "regular use can raise INR"),
+    ("simvastatin", "clarithromycin", CONTRAINDICATED, "raises simvastatin levels (muscle damage)"),
+    ("simvastatin", "amlodipine", MODERATE, "keep simvastatin at 20 mg/day or less"),
+    ("pde5_inhibitor", "nitrate", CONTRAINDICATED, "can cause a dangerous drop in blood pressure"),
+    ("valproate", "topiramate", MODERATE, "raises the risk of high ammonia levels"),
+    ("opioid", "benzocaine", MODERATE, "combined sedation in children; avoid unsupervised use"),
+]
+
+# Conditions recognized in the medical history: condition -> phrases
+CONDITIONS = {
+    "asthma": ("asthma", "copd"),
+    "kidney_disease": ("kidney disease", "kidney failure", "renal", "ckd"),
+    "peptic_ulcer": ("stomach ulcer", "peptic ulcer", "gastric ulcer", "gi bleed", "stomach bleeding"),
+    "heart_failure": ("heart failure",),
+    "diabetes": ("diabetes", "diabetic"),
+    "liver_disease": ("liver disease", "cirrhosis", "hepatitis"),
+    "coronary_disease": ("coronary", "angina", "heart attack", "stroke"),
+}
+
+# (concept, condition, severity, note)
+CONDITION_WARNINGS = [
+    ("beta_blocker", "asthma", MAJOR, "non-selective beta-blockers can trigger bronchospasm"),
+    ("nsaid", "asthma", MODERATE, "can trigger asthma attacks in aspirin-sensitive asthma"),
+    ("nsaid", "kidney_disease", MAJOR, "can worsen kidney function"),
+    ("nsaid", "peptic_ulcer", MAJOR, "can cause ulcer bleeding"),
+    ("nsaid", "heart_failure", MAJOR, "causes fluid retention"),
+    ("metformin", "kidney_disease", MAJOR, "dose must be reduced or stopped with poor kidney function"),
+    ("sglt2_inhibitor", "kidney_disease", MODERATE, "less effective with poor kidney function; check eGFR"),
+    ("corticosteroid", "diabetes", MODERATE, "raises blood sugar"),
+    ("acetaminophen", "liver_disease", MODERATE, "keep to the reduced daily limit your doctor sets"),
+    ("triptan", "coronary_disease", CONTRAINDICATED, "narrows blood vessels, including the heart's"),
+    ("ergot", "coronary_disease", CONTRAINDICATED, "narrows blood vessels, including the heart's"),
+]
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def label(concept):
+    """Display name of a drug or class id ("ace_inhibitor" -> "ACE inhibitors")."""
+    return CLASS_LABELS.get(concept, concept.replace("_", " "))
+
+
+@dataclass
+class Finding:
+    """One screening result. `kind` is "allergy", "interaction" or "condition"."""
+    __slots__ = ("kind", "severity", "subject", "other", "note")
+    kind: str
+    severity: str
+    subject: str
+    other: str
+    note: str
+
+    def to_markdown(self):
+        severity, subject, other = self.severity.capitalize(), label(self.subject), label(self.other)
+        if self.kind == "allergy":
+            return f"* **{severity}: {subject}** - you listed an allergy to {other}; {self.note}."
+        if self.kind == "condition":
+            return f"* **{severity}: {subject}** with {other} - {self.note}."
+        return f"* **{severity}: {subject} + {other}** - {self.note}."
+
+
+def load_table(path):
+    """Interaction rows (concept, concept, severity, note) from a CSV file with those four columns."""
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(row["a"].strip(), row["b"].strip(), row["severity"].strip().lower(), row["note"].strip())
+                for row in csv.DictReader(f, fieldnames=["a", "b", "severity", "note"]) if row["a"] != "a"]
+
+
+class InteractionChecker:
+    """Lexicon and interaction tables compiled into hash indexes. Read-only, so safe to share."""
+    def __init__(self, drugs=DRUGS, classes=CLASSES, interactions=INTERACTIONS,
+                 conditions=CONDITIONS, condition_warnings=CONDITION_WARNINGS):
+        self.names = {}  # name (1-3 words) -> drug or class id
+        self.concepts = {}  # drug or class id -> frozenset of concepts
+        for drug, (aliases, drug_classes) in drugs.items():
+            for name in (drug, *aliases):
+                self.names[" ".join(_WORD_RE.findall(name))] = drug
+            self.concepts[drug] = frozenset((drug, *drug_classes))
+        for drug_class, names in classes.items():
+            for name in names:
+                self.names.setdefault(" ".join(_WORD_RE.findall(name)), drug_class)
+            self.concepts.setdefault(drug_class, frozenset((drug_class,)))
+        self.max_name_words = {}  # first word -> longest name starting with it, in words
+        for name in self.names:
+            first, *rest = name.split()
+            self.max_name_words[first] = max(self.max_name_words.get(first, 1), 1 + len(rest))
+        self.pairs = {}
+        for a, b, severity, note in interactions:
+            self.pairs[frozenset((a, b))] = (severity, note)
+        self.conditions = conditions
+        self.condition_warnings = {}
+        for concept, condition, severity, note in condition_warnings:
+            self.condition_warnings[(concept, condition)] = (severity, note)
+
+    def parse(self, text, collapse_classes=True):
+        """
+        Normalized drug/class ids mentioned in `text`, in order of first
+        mention. With `collapse_classes`, a class is dropped when one of its
+        drugs is also mentioned ("ACE inhibitors (e.g. lisinopril)" -> lisinopril).
+        """
+        words = _WORD_RE.findall((text or "").lower())
+        found = {}
+        i = 0
+        while i < len(words):
+            word = words[i]
+            n = min(self.max_name_words.get(word) or self.max_name_words.get(word[:-1], 1), len(words) - i)
+            for n in range(n, 0, -1):
+                name = " ".join(words[i:i + n]) if n > 1 else word
+                drug = self.names.get(name) or (self.names.get(name[:-1]) if name.endswith("s") else None)
+                if drug is not None:
+                    found.setdefault(drug, None)
+                    break
+            i += n
+        if not collapse_classes:
+            return list(found)
+        covered = set().union(*(self.concepts[drug] - {drug} for drug in found))
+        return [drug for drug in found if drug not in covered]
+
+    def parse_conditions(self, text):
+        text = (text or "").lower()
+        return [condition for condition, phrases in self.conditions.items() if any(p in text for p in phrases)]
+
+    def check_pair(self, a, b):
+        """(severity, note) of the most severe interaction between drugs/classes `a` and `b`, or None."""
+        best = None
+        for x in self.concepts.get(a, (a,)):
+            for y in self.concepts.get(b, (b,)):
+                hit = self.pairs.get(frozenset((x, y))) if x != y else None
+                if hit is not None and (best is None or SEVERITY_RANK[hit[0]] < SEVERITY_RANK[best[0]]):
+                    best = hit
+        return best
+
+    def _allergy(self, drug, allergens):
+        concepts = self.concepts.get(drug, (drug,))
+        for allergen in allergens:
+            if allergen in concepts:
+                return allergen, CONTRAINDICATED, "do not take it"
+            cross = ALLERGY_CROSS_REACTIVITY.get(allergen)
+            if cross is not None and cross in concepts:
+                return allergen, MAJOR, "cross-reactions are possible; ask your doctor first"
+        return None
+
+    def screen(self, profile, plan=""):
+        """
+        Findings for a profile's current medications, allergies and medical
+        history, and for the drugs a plan mentions, most severe first:
+        allergies to any of the drugs, interactions of the plan's drugs with
+        the medications (and of the medications with each other), and
+        drugs that conflict with a recorded condition.
+        """
+        medications = self.parse(profile.get("current_medications"))
+        allergens = self.parse(profile.get("allergies"), collapse_classes=False)
+        conditions = self.parse_conditions(profile.get("medical_history"))
+        plan_drugs = [drug for drug in self.parse(plan) if drug not in medications]
+        findings = []
+        for drug in medications + plan_drugs:
+            allergy = self._allergy(drug, allergens)
+            if allergy is not None:
+                allergen, severity, note = allergy
+                findings.append(Finding("allergy", severity, drug, allergen, note))
+        for i, drug in enumerate(medications + plan_drugs):
+            for other in medications[:min(i, len(medications))]:
+                hit = self.check_pair(drug, other)
+                if hit is not None:
+                    findings.append(Finding("interaction", hit[0], drug, other, hit[1]))
+            for condition in conditions:
+                for concept in self.concepts.get(drug, (drug,)):
+                    hit = self.condition_warnings.get((concept, condition))
+                    if hit is not None:
+                        findings.append(Finding("condition", hit[0], drug, condition, hit[1]))
+                        break
+        findings.sort(key=lambda finding: SEVERITY_RANK[finding.severity])
+        return findings
+
+
+def safety_section(findings, profile):
+    """Markdown "Safety check" section for a plan, or "" when the profile lists no medications or allergies."""
+    if findings:
+        return "**Safety check (medications, allergies and conditions):**\n" + "\n".join(
+            finding.to_markdown() for finding in findings)
+    if (profile.get("current_medications") or "").strip() or (profile.get("allergies") or "").strip():
+        return ("**Safety check:** no known conflicts between this plan and your listed medications and "
+                "allergies. Your pharmacist can double-check.")
+    return ""
@@ -0,0 +1,139 @@
+"""
+Background execution of model calls.
+
+The Streamlit script submits a streaming model call to a shared JobRunner
+and keeps the returned Job handle in session state. A worker thread drains
+the stream into the job, so the UI can poll its partial text without
+blocking the script run. Identical in-flight requests (same key) share one
+job, and a job is cancelled once every session holding it lets go.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+PENDING, RUNNING, DONE, FAILED, CANCELLED = "pending", "running", "done", "failed", "cancelled"
+
+
+class Job:
+    """Handle to one background model call."""
+    def __init__(self, key, progress=None):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.progress = progress
+        self.status = PENDING
+        self.chunks = []
+        self.error = None
+        self.subscribers = 1
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._cancel = threading.Event()
+
+    @property
+    def text(self):
+        """Everything generated so far."""
+        return "".join(self.chunks)
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def cancel_requested(self):
+        return self._cancel.is_set()
+
+
+class JobRunner:
+    """
+    Thread pool for model calls shared by every session of the process.
+    `stream_fn` passed to `submit` must return an iterable of text chunks;
+    cancellation is checked between chunks and closes the stream. A stream
+    whose output goes elsewhere (e.g. a results file) can yield empty chunks
+    just to give cancellation a chance, and report through `progress`.
+    """
+    def __init__(self, max_workers=8):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-job")
+        self._lock = threading.Lock()
+        self._in_flight = {}  # key -> Job
+        self.submitted = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    def submit(self, key, stream_fn, progress=None):
+        """
+        Starts a job, or joins the in-flight job with the same key. `progress`
+        is kept as the job's `progress`, an object the stream updates as it runs.
+        """
+        with self._lock:
+            job = self._in_flight.get(key)
+            if job is not None and not job.finished and not job.cancel_requested:
+                job.subscribers += 1
+                self.deduplicated += 1
+                return job
+            job = Job(key, progress)
+            self._in_flight[key] = job
+            self.submitted += 1
+        self._executor.submit(self._run, job, stream_fn)
+        return job
+
+    def release(self, job):
+        """
+        Called when a session no longer wants a job's result (it submitted
+        again, or pressed cancel). The job is cancelled once nobody holds it.
+        """
+        with self._lock:
+            job.subscribers -= 1
+            if job.subscribers <= 0 and not job.finished:
+                job._cancel.set()
+
+    def _run(self, job, stream_fn):
+        if job.cancel_requested:
+            self._finish(job, CANCELLED)
+            return
+        job.status = RUNNING
+        job.started_at = time.time()
+        status = DONE
+        stream = None
+        try:
+            stream = stream_fn()
+            for chunk in stream:
+                if job.cancel_requested:
+                    status = CANCELLED
+                    break
+                if chunk:
+                    job.chunks.append(chunk)
+        except Exception as e:
+            job.error = e
+            status = FAILED
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+            self._finish(job, status)
+
+    def _finish(self, job, status):
+        with self._lock:
+            job.finished_at = time.time()
+            job.status = status
+            if self._in_flight.get(job.key) is job:
+                del self._in_flight[job.key]
+            if status == DONE:
+                self.completed += 1
+            elif status == FAILED:
+                self.failed += 1
+            else:
+                self.cancelled += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._in_flight),
+                "submitted": self.submitted,
+                "deduplicated": self.deduplicated,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+            }
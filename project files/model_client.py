@@ -0,0 +1,85 @@
+"""
+Process-wide, thread-safe client around the Granite backend.
+
+One client is built per process and shared by every Streamlit session, so
+authentication and HTTP connection setup happen once instead of once per
+visitor. A bounded semaphore caps the number of concurrent backend calls,
+and the client keeps pool-utilization metrics.
+"""
+import threading
+import time
+
+
+class ModelBusyError(RuntimeError):
+    """Raised when no backend slot frees up within the acquire timeout."""
+
+
+class ModelClient:
+    """
+    Shares one backend between threads, allowing at most `max_concurrency`
+    calls in flight. `generate_text_stream` holds its slot until the stream
+    is exhausted or closed.
+    """
+    def __init__(self, backend, max_concurrency=8, acquire_timeout=None):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.acquire_timeout = acquire_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.total_calls = 0
+        self.waited_calls = 0
+        self.total_wait_seconds = 0.0
+        self.rejected_calls = 0
+
+    def _acquire(self):
+        start = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            acquired = self._slots.acquire(timeout=self.acquire_timeout)
+            waited = time.perf_counter() - start
+            with self._lock:
+                self.waited_calls += 1
+                self.total_wait_seconds += waited
+                if not acquired:
+                    self.rejected_calls += 1
+            if not acquired:
+                raise ModelBusyError(
+                    f"All {self.max_concurrency} model slots busy for {waited:.1f}s"
+                )
+        with self._lock:
+            self.total_calls += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def generate_text(self, prompt):
+        self._acquire()
+        try:
+            return self.backend.generate_text(prompt)
+        finally:
+            self._release()
+
+    def generate_text_stream(self, prompt):
+        self._acquire()
+        try:
+            yield from self.backend.generate_text_stream(prompt)
+        finally:
+            self._release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "utilization": self.in_flight / self.max_concurrency,
+                "peak_in_flight": self.peak_in_flight,
+                "total_calls": self.total_calls,
+                "waited_calls": self.waited_calls,
+                "avg_wait_seconds": self.total_wait_seconds / self.waited_calls if self.waited_calls else 0.0,
+                "rejected_calls": self.rejected_calls,
+            }
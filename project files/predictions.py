@@ -0,0 +1,116 @@
+"""
+Structured disease predictions.
+
+The model answers the prediction prompt as numbered conditions, each with
+"Likelihood:", "Brief explanation:" and "Recommended next steps:" lines.
+Models that copy the prompt's numbered format number those lines too
+("2. Likelihood: High"); a numbered field label never starts a condition.
+`parse_predictions` turns that text into typed records in one pass over
+its lines, so the UI and batch jobs can sort, filter and aggregate by
+condition and likelihood without re-parsing text.
+"""
+import re
+from dataclasses import dataclass
+from enum import Enum
+
+
+class Likelihood(Enum):
+    HIGH = "High"
+    MEDIUM = "Medium"
+    LOW = "Low"
+    UNKNOWN = "Unknown"
+
+    @property
+    def rank(self):
+        """Sort key: High first."""
+        return _LIKELIHOOD_RANK[self]
+
+    @classmethod
+    def parse(cls, text):
+        return _LIKELIHOOD_BY_NAME.get(text.strip().lower(), cls.UNKNOWN)
+
+
+_LIKELIHOOD_RANK = {Likelihood.HIGH: 0, Likelihood.MEDIUM: 1, Likelihood.LOW: 2, Likelihood.UNKNOWN: 3}
+_LIKELIHOOD_BY_NAME = {level.value.lower(): level for level in Likelihood}
+
+
+@dataclass
+class PredictedCondition:
+    __slots__ = ("rank", "condition", "likelihood", "explanation", "next_steps")
+    rank: int
+    condition: str
+    likelihood: Likelihood
+    explanation: str
+    next_steps: str
+
+    def to_dict(self):
+        return {
+            "rank": self.rank,
+            "condition": self.condition,
+            "likelihood": self.likelihood.value,
+            "explanation": self.explanation,
+            "next_steps": self.next_steps,
+        }
+
+
+_CONDITION_RE = re.compile(r"^\s*(\d+)[.)]\s*(?:(?:potential\s+)?condition(?:\s+name)?\s*:\s*)?(.+?)\s*$",
+                           re.IGNORECASE)
+# A field line, optionally numbered or bulleted, in bold, or with the prompt's hint ("2. Likelihood (High/Low): High")
+_FIELD_RE = re.compile(r"^\s*(?:\d+[.)]\s*)?(?:[-*•]\s+)?\**\s*"
+                       r"(likelihood|brief explanation|explanation|recommended next steps|next steps)"
+                       r"\s*(?:\([^)]*\))?\s*\**\s*[:\-–]\s*\**\s*(.*?)\s*$", re.IGNORECASE)
+_FIELD_NAMES = {
+    "likelihood": "likelihood",
+    "brief explanation": "explanation",
+    "explanation": "explanation",
+    "recommended next steps": "next_steps",
+    "next steps": "next_steps",
+}
+
+
+def parse_predictions(text):
+    """
+    Parses a prediction response into a list of PredictedCondition, in the
+    order the model ranked them (ranks are 1, 2, 3... in that order, even
+    if the model restarts its numbering for each condition). Returns [] if
+    the response has no numbered conditions (e.g. an inconclusive answer).
+    """
+    predictions = []
+    current = None
+    field = None
+    for line in text.splitlines():
+        match = _FIELD_RE.match(line)
+        if match:
+            if current is not None:
+                field = _FIELD_NAMES[match.group(1).lower()]
+                current[field] = match.group(2)
+            continue
+        match = _CONDITION_RE.match(line)
+        if match:
+            current = {"rank": len(predictions) + 1, "condition": match.group(2),
+                       "likelihood": "", "explanation": "", "next_steps": ""}
+            predictions.append(current)
+            field = None
+        elif current is not None and field is not None and line.strip():
+            current[field] = f"{current[field]} {line.strip()}".strip()
+
+    return [
+        PredictedCondition(p["rank"], p["condition"], Likelihood.parse(p["likelihood"]),
+                           p["explanation"], p["next_steps"])
+        for p in predictions
+    ]
+
+
+def as_columns(predictions):
+    """Columnar dict (column -> list) for building a DataFrame or aggregating."""
+    return {
+        "Condition": [p.condition for p in predictions],
+        "Likelihood": [p.likelihood.value for p in predictions],
+        "Explanation": [p.explanation for p in predictions],
+        "Next Steps": [p.next_steps for p in predictions],
+    }
+
+
+def sort_by_likelihood(predictions):
+    """Most likely first; the model's own ranking breaks ties."""
+    return sorted(predictions, key=lambda p: (p.likelihood.rank, p.rank))
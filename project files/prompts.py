@@ -0,0 +1,112 @@
+"""
+Prompt templates for the Granite model.
+
+Kept free of Streamlit so the app, the batch CLI and other entry points
+build exactly the same prompts.
+
+Retrieved reference passages (see retrieval.py) go in a section at the very
+top of a prompt, closed by an END OF REFERENCE MATERIAL line, so everything
+about the patient follows the last line of reference text.
+"""
+REFERENCE_END = "END OF REFERENCE MATERIAL"
+
+
+def format_references(passages, max_words=80):
+    """Reference section for the top of a prompt, or "" without passages. Each passage is clipped to `max_words`."""
+    if not passages:
+        return ""
+    lines = []
+    for i, passage in enumerate(passages, 1):
+        words = passage.text.split()
+        text = " ".join(words[:max_words]) + ("..." if len(words) > max_words else "")
+        lines.append(f"    [{i}] {passage.title}: {text}")
+    body = "\n".join(lines)
+    return f"""
+    REFERENCE MATERIAL (use it where relevant, do not quote it verbatim):
+{body}
+    {REFERENCE_END}
+"""
+
+
+def build_prediction_prompt(symptoms, patient_profile, vitals_findings=None, references=""):
+    """
+    Disease-prediction prompt for the given symptoms and patient profile.
+    `vitals_findings` are optional one-line anomaly descriptions from the
+    Health Analytics detector; `references` a section from format_references.
+    """
+    findings = "".join(f"\n    - Vitals anomaly: {finding}" for finding in vitals_findings or [])
+    return f"""{references}
+    As a medical AI assistant, predict potential health conditions based on the following patient data:
+
+    Current Symptoms: {symptoms}
+    Age: {patient_profile['age']}
+    Gender: {patient_profile['gender']}
+    Medical History: {patient_profile['medical_history'] if patient_profile['medical_history'] else 'None'}
+    Recent Health Metrics:
+    - (Mock data: Average Heart Rate: 70 bpm)
+    - (Mock data: Average Blood Pressure: 120/80 mmHg)
+    - (Mock data: Average Blood Glucose: 90 mg/dL){findings}
+    - Recently Reported Symptoms: {symptoms}
+
+    Format your response as:
+    1. Potential condition name
+    2. Likelihood (High/Medium/Low)
+    3. Brief explanation
+    4. Recommended next steps
+
+    Provide the top 3 most likely conditions based on the data provided.
+    """
+
+
+def build_chat_prompt(query, history="", references=""):
+    """
+    Patient-chat prompt for `query`. `history` is the conversation so far
+    (see conversation.ConversationMemory). It goes before the instructions,
+    so the question is the only patient text after the "patient question:"
+    marker. `references` is a section from format_references.
+    """
+    context = f"""
+    CONVERSATION SO FAR:
+{history}
+""" if history else ""
+    return f"""{references}{context}
+    As a healthcare AI assistant, provide a helpful, accurate, and evidence-based response to the following patient question:
+
+    PATIENT QUESTION: {query}
+
+    Provide a clear, empathetic response that:
+    - Directly addresses the question
+    - Includes relevant medical facts
+    - Acknowledges limitations (when appropriate)
+    - Suggests when to seek professional medical advice
+    - Avoids making definitive diagnoses
+    - Uses accessible, non-technical language
+    - Takes the conversation so far into account (when given)
+
+    RESPONSE:
+    """
+
+
+def build_treatment_prompt(condition, patient_profile, references=""):
+    """Treatment-plan prompt for the given condition and patient profile, after optional `references`."""
+    return f"""{references}
+    As a medical AI assistant, generate a personalized treatment plan for the following scenario:
+
+    Patient Profile:
+    - Condition: {condition}
+    - Age: {patient_profile['age']}
+    - Gender: {patient_profile['gender']}
+    - Medical History: {patient_profile['medical_history'] if patient_profile['medical_history'] else 'None'}
+    - Current Medications: {patient_profile.get('current_medications') or 'None'}
+    - Allergies: {patient_profile.get('allergies') or 'None'}
+
+    Create a comprehensive, evidence-based treatment plan that includes:
+    1. Recommended medications (include dosage guidelines if appropriate)
+    2. Lifestyle modifications
+    3. Follow-up testing and monitoring
+    4. Dietary recommendations
+    5. Physical activity guidelines
+    6. Mental health considerations
+
+    Format this as a clear, structured treatment plan that follows current medical guidelines while being personalized to this patient's specific needs.
+    """
@@ -0,0 +1,166 @@
+"""
+Process-wide response cache for the Granite model.
+
+Responses are keyed on the normalized prompt (lowercased, whitespace
+collapsed). The prompt templates already embed the patient profile fields a
+personalized answer depends on, so those are part of the key too. The
+in-memory tier is a bounded LRU with a TTL. An optional SQLite tier keeps
+entries across restarts.
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt):
+    """Lowercases and collapses whitespace so trivially different prompts share a key."""
+    return _WHITESPACE_RE.sub(" ", prompt).strip().lower()
+
+
+def cache_key(prompt):
+    """Stable, fixed-size key for a prompt."""
+    return hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Thread-safe LRU + TTL cache of model responses, shared by every session
+    of the process. Pass `path` to add an SQLite persistence tier.
+    """
+    def __init__(self, max_entries=1024, ttl_seconds=3600, path=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (stored_at, response)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, response TEXT NOT NULL, stored_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _expired(self, stored_at, now):
+        return self.ttl_seconds is not None and now - stored_at > self.ttl_seconds
+
+    def get(self, prompt):
+        """Cached response for `prompt`, or None."""
+        key = cache_key(prompt)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[0], now):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT response, stored_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    response, stored_at = row
+                    if not self._expired(stored_at, now):
+                        self._store(key, response, stored_at)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return response
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.expirations += 1
+
+            self.misses += 1
+            return None
+
+    def put(self, prompt, response):
+        key = cache_key(prompt)
+        now = time.time()
+        with self._lock:
+            self._store(key, response, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, stored_at) VALUES (?, ?, ?)",
+                    (key, response, now),
+                )
+                self._db.commit()
+
+    def _store(self, key, response, stored_at):
+        self._entries[key] = (stored_at, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def purge_expired(self):
+        """Drops expired entries from both tiers."""
+        now = time.time()
+        with self._lock:
+            for key in [k for k, (stored_at, _) in self._entries.items() if self._expired(stored_at, now)]:
+                del self._entries[key]
+                self.expirations += 1
+            if self._db is not None and self.ttl_seconds is not None:
+                self._db.execute("DELETE FROM responses WHERE stored_at < ?", (now - self.ttl_seconds,))
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class CachedModel:
+    """
+    Wraps a Granite model so `generate_text` and `generate_text_stream`
+    consult a ResponseCache first. Streamed responses are only cached once
+    the stream has been fully consumed.
+    """
+    def __init__(self, model, cache):
+        self.model = model
+        self.cache = cache
+
+    def generate_text(self, prompt):
+        response = self.cache.get(prompt)
+        if response is None:
+            response = self.model.generate_text(prompt)
+            self.cache.put(prompt, response)
+        return response
+
+    def generate_text_stream(self, prompt):
+        response = self.cache.get(prompt)
+        if response is not None:
+            yield response
+            return
+        chunks = []
+        for chunk in self.model.generate_text_stream(prompt):
+            chunks.append(chunk)
+            yield chunk
+        self.cache.put(prompt, "".join(chunks))
@@ -0,0 +1,504 @@
+"""
+Retrieval over a local medical knowledge corpus.
+
+The corpus is the app's own reference answers (granite.RESPONSES) plus any
+documents found at KNOWLEDGE_CORPUS_PATH. It is indexed once into a
+directory of flat files, which every process then memory-maps. Nothing is
+rebuilt or unpickled at startup:
+
+- BM25, stored as CSR postings of precomputed impact weights. A query adds
+  up the postings of its terms into one score array and takes the top hits
+  with argpartition.
+- Optionally, an IVF index over document embeddings (see embeddings.py).
+  The k-means lists are probed a few at a time, and the dense hits are
+  fused with the BM25 hits by reciprocal rank.
+- The documents themselves, as JSON lines read on demand through an offsets
+  array.
+
+Every build is a new version directory, named by the corpus fingerprint,
+and the index directory's CURRENT file names the live one:
+
+    <index>/CURRENT
+    <index>/v-<fingerprint>/meta.json, postings.npy, ...
+
+A build writes to a temporary directory, renames it into place and then
+replaces CURRENT, both atomic. Processes that start together and build
+the same corpus produce the same version, so whichever rename loses just
+discards its copy, and an index already open in another process is never
+touched while it is live.
+
+Each hit carries a confidence: the share of the query's idf mass that the
+hit contains. Confidence alone says nothing about relevance (a long answer
+mentions many symptoms in passing), so a hit is only served directly as the
+answer when the query asks for exactly its topic: every query term is one
+of its title keywords, and it clearly beats the runner-up. Questions that
+mention red-flag symptoms (see RED_FLAGS) always go to the model.
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+
+import numpy as np
+
+from embeddings import load_embedder
+from granite import DEFAULT_RESPONSE_ID, INTENTS, RESPONSES, RULES
+from prompts import format_references
+
+FORMAT_VERSION = 1
+CURRENT_FILE = "CURRENT"
+K1, B = 1.2, 0.75
+RRF_K = 60  # Reciprocal rank fusion constant
+TITLE_WEIGHT = 3  # Title terms count this many times (titles carry the rule keywords)
+MIN_SIMILARITY = 0.2  # Dense-only hits below this cosine similarity are dropped
+IVF_TRAINING_SAMPLE = 20_000
+IVF_PROBES = 16  # k-means lists scanned per query
+
+# Symptoms that need a careful answer (and usually urgent care), never a canned one
+RED_FLAGS = (
+    "chest pain", "chest pressure", "chest tightness", "tight chest", "shortness of breath", "short of breath",
+    "breathless", "difficulty breathing", "trouble breathing", "can't breathe", "cannot breathe", "fainted",
+    "fainting", "passed out", "unconscious", "seizure", "stroke", "slurred speech", "numbness", "paralysis",
+    "confusion", "coughing blood", "coughing up blood", "vomiting blood", "blood in", "severe bleeding",
+    "stiff neck", "worst headache", "suicidal", "suicide", "overdose", "anaphylaxis", "swollen throat",
+    "throat swelling",
+)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_RED_FLAG_RE = re.compile(r"\b(?:" + "|".join(re.escape(flag) for flag in RED_FLAGS) + r")\b")
+STOPWORDS = frozenset("""
+a about am an and any are as at be been but by can could do does for from get got had has have how i if in
+into is it its me my of on or our should so some than that the their them then there these they this to
+too was we were what when which who why will with would you your
+""".split())
+
+
+def tokenize(text):
+    """Lowercased word terms without stopwords, with a naive plural strip ("fevers" -> "fever")."""
+    terms = []
+    for word in _WORD_RE.findall(text.lower()):
+        if word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def has_red_flags(text):
+    """Whether `text` mentions any of the RED_FLAGS symptoms."""
+    return _RED_FLAG_RE.search(" ".join(text.lower().replace("\u2019", "'").split())) is not None
+
+
+@dataclass
+class Document:
+    __slots__ = ("id", "kind", "title", "text")
+    id: str
+    kind: str
+    title: str
+    text: str
+
+
+@dataclass
+class Passage:
+    """A search hit. `score` is its BM25 score, `similarity` its cosine similarity (None without embeddings)."""
+    __slots__ = ("id", "kind", "title", "text", "score", "confidence", "similarity")
+    id: str
+    kind: str
+    title: str
+    text: str
+    score: float
+    confidence: float
+    similarity: float
+
+
+# --- Corpus ---
+def _clean(text):
+    return "\n".join(line.strip() for line in text.strip().splitlines())
+
+
+def seed_documents():
+    """One document per canned answer (fallback answers excluded), titled with its rule keywords."""
+    excluded = {DEFAULT_RESPONSE_ID} | {fallback for *_, fallback in INTENTS}
+    keywords = {}
+    for _, words, response_id in RULES:
+        keywords.setdefault(response_id, set()).update(words)
+    documents = []
+    for response_id, text in RESPONSES.items():
+        if response_id in excluded:
+            continue
+        kind, _, name = response_id.partition(".")
+        title = name.replace("_", " ").capitalize()
+        if response_id in keywords:
+            title += f" ({', '.join(sorted(keywords[response_id]))})"
+        documents.append(Document(response_id, kind, title, _clean(text)))
+    return documents
+
+
+def load_corpus(path):
+    """
+    Extra documents from a JSON Lines file ({"id", "title", "text"} and an
+    optional "kind") or from a directory of .txt/.md files (title: first line).
+    """
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() not in (".txt", ".md"):
+                continue
+            with open(os.path.join(path, name), encoding="utf-8") as f:
+                title, _, body = f.read().strip().partition("\n")
+            yield Document(stem, "reference", title.strip("# "), _clean(body))
+        return
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield Document(str(record["id"]), record.get("kind", "reference"), record.get("title", ""),
+                               _clean(record["text"]))
+
+
+def corpus_fingerprint(documents, embedder_spec=None):
+    digest = hashlib.sha1(f"{FORMAT_VERSION}\0{embedder_spec}".encode())
+    for doc in documents:
+        digest.update(f"\0{doc.id}\0{doc.kind}\0{doc.title}\0{doc.text}".encode())
+    return digest.hexdigest()
+
+
+# --- Index Build ---
+def _kmeans(vectors, n_lists, iterations=8, seed=0):
+    """Spherical k-means centroids (unit length) of unit vectors."""
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), min(len(vectors), IVF_TRAINING_SAMPLE), replace=False)]
+    centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assign = (sample @ centroids.T).argmax(axis=1)
+        for j in range(n_lists):
+            members = sample[assign == j]
+            if len(members):
+                centroids[j] = members.sum(axis=0)
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+
+def _assign(vectors, centroids, batch=8192):
+    return np.concatenate([(vectors[i:i + batch] @ centroids.T).argmax(axis=1)
+                           for i in range(0, len(vectors), batch)])
+
+
+def version_dir(path):
+    """Directory of the live index version at `path` (an index built before versioning is `path` itself)."""
+    try:
+        with open(os.path.join(path, CURRENT_FILE), encoding="utf-8") as f:
+            return os.path.join(path, f.read().strip())
+    except FileNotFoundError:
+        return path
+
+
+def _prune(path, keep):
+    """Removes the versions other than `keep`; best effort (an open version may not be removable)."""
+    for entry in os.listdir(path):
+        if entry.startswith("v-") and entry != keep:
+            shutil.rmtree(os.path.join(path, entry), ignore_errors=True)
+
+
+def build_index(path, documents, embedder_spec=None, fingerprint=None):
+    """Builds the index of `documents` as a new version in the directory `path` and makes it the live one."""
+    documents = list(documents)
+    if not documents:
+        raise ValueError("Cannot index an empty corpus")
+    fingerprint = fingerprint or corpus_fingerprint(documents, embedder_spec)
+    os.makedirs(path, exist_ok=True)
+    tmp = tempfile.mkdtemp(prefix=".build-", dir=path)
+    save = lambda name, array: np.save(os.path.join(tmp, name + ".npy"), array)  # noqa: E731
+
+    # Documents, as JSON lines plus byte offsets
+    kinds = sorted({doc.kind for doc in documents})
+    kind_codes = {kind: code for code, kind in enumerate(kinds)}
+    offsets = [0]
+    with open(os.path.join(tmp, "documents.jsonl"), "wb") as f:
+        for doc in documents:
+            line = json.dumps({"id": doc.id, "kind": doc.kind, "title": doc.title, "text": doc.text}).encode() + b"\n"
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    save("doc_offsets", np.array(offsets, dtype=np.int64))
+    save("doc_kinds", np.array([kind_codes[doc.kind] for doc in documents], dtype=np.int8))
+
+    # BM25 postings, term-major and doc-sorted within each term
+    vocab, terms, tfs, lengths = {}, [], [], np.zeros(len(documents), dtype=np.float32)
+    for i, doc in enumerate(documents):
+        counts = Counter(tokenize(f"{doc.title}\n" * TITLE_WEIGHT + doc.text))
+        lengths[i] = sum(counts.values())
+        terms.append(np.fromiter((vocab.setdefault(t, len(vocab)) for t in counts), dtype=np.int32, count=len(counts)))
+        tfs.append(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    term = np.concatenate(terms)
+    tf = np.concatenate(tfs)
+    doc_ids = np.repeat(np.arange(len(documents), dtype=np.int32), [len(t) for t in terms])
+    n, avgdl = len(documents), max(float(lengths.mean()), 1.0)
+    df = np.bincount(term, minlength=len(vocab))
+    idf = np.log1p((n - df + 0.5) / (df + 0.5)).astype(np.float32)
+    weights = idf[term] * tf * (K1 + 1) / (tf + K1 * (1 - B + B * lengths[doc_ids] / avgdl))
+    order = np.lexsort((doc_ids, term))
+    save("term_offsets", np.r_[0, np.cumsum(df)].astype(np.int64))
+    save("postings", doc_ids[order])
+    save("weights", weights[order].astype(np.float32))
+    save("idf", idf)
+
+    # Optional IVF index over embeddings
+    if embedder_spec:
+        embedder = load_embedder(embedder_spec)
+        vectors = embedder.embed([f"{doc.title}\n{doc.text[:1000]}" for doc in documents])
+        n_lists = max(1, int(np.sqrt(n))) if n >= 1024 else 1
+        centroids = _kmeans(vectors, n_lists) if n_lists > 1 else np.zeros((1, vectors.shape[1]), np.float32)
+        assign = _assign(vectors, centroids) if n_lists > 1 else np.zeros(n, dtype=np.int64)
+        order = np.argsort(assign, kind="stable")
+        save("ivf_centroids", centroids)
+        save("ivf_offsets", np.r_[0, np.cumsum(np.bincount(assign, minlength=n_lists))].astype(np.int64))
+        save("ivf_ids", order.astype(np.int32))
+        # int8 with a scale per vector: a quarter of the float32 size, and fast to widen at query time
+        vectors = vectors[order]
+        scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+        save("ivf_vectors", np.round(vectors / scales[:, None]).astype(np.int8))
+        save("ivf_scales", scales.astype(np.float32))
+
+    with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"format": FORMAT_VERSION, "fingerprint": fingerprint,
+                   "documents": n, "kinds": kinds, "embedder": embedder_spec, "vocab": vocab}, f)
+    version = "v-" + fingerprint[:16]
+    try:
+        os.rename(tmp, os.path.join(path, version))
+    except OSError:
+        if not os.path.exists(os.path.join(path, version, "meta.json")):
+            raise
+        shutil.rmtree(tmp, ignore_errors=True)  # Another process built the same version first
+    pointer = os.path.join(path, f".{CURRENT_FILE}-{uuid.uuid4().hex[:8]}")
+    with open(pointer, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(path, CURRENT_FILE))
+    _prune(path, version)
+
+
+def _load(path, name):
+    try:
+        return np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+    except ValueError:  # Empty arrays cannot be memory-mapped
+        return np.load(os.path.join(path, name + ".npy"))
+
+
+# --- Search ---
+class KnowledgeIndex:
+    """The live version of a built index directory, memory-mapped. Safe to share between threads (all reads)."""
+    def __init__(self, path, attempts=3):
+        self.path = path
+        for attempt in range(attempts):
+            try:
+                self._open(version_dir(path))
+                return
+            except FileNotFoundError:
+                if attempt == attempts - 1:  # Otherwise a newer build pruned it meanwhile: open that one
+                    raise
+
+    def _open(self, path):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"{path} was built by an incompatible version; rebuild it")
+        self.fingerprint = meta["fingerprint"]
+        self.n_docs = meta["documents"]
+        self.kinds = meta["kinds"]
+        self.vocab = meta["vocab"]
+        for name in ("doc_offsets", "doc_kinds", "term_offsets", "postings", "weights", "idf"):
+            setattr(self, name, _load(path, name))
+        self.unknown_idf = float(np.log1p((self.n_docs + 0.5) / 0.5))  # A term no document contains
+        self._kind_masks = {}
+        with open(os.path.join(path, "documents.jsonl"), "rb") as f:
+            self._documents = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.embedder = None
+        if meta["embedder"]:
+            self.embedder = load_embedder(meta["embedder"])
+            for name in ("ivf_centroids", "ivf_offsets", "ivf_ids", "ivf_vectors", "ivf_scales"):
+                setattr(self, name, _load(path, name))
+
+    def document(self, i):
+        record = json.loads(self._documents[self.doc_offsets[i]:self.doc_offsets[i + 1]])
+        return Document(record["id"], record["kind"], record["title"], record["text"])
+
+    def _postings(self, term_id):
+        lo, hi = self.term_offsets[term_id], self.term_offsets[term_id + 1]
+        return self.postings[lo:hi], self.weights[lo:hi]
+
+    def _kind_mask(self, kinds):
+        """Boolean mask of the documents of `kinds`, computed once per combination of kinds."""
+        key = tuple(sorted(kinds))
+        mask = self._kind_masks.get(key)
+        if mask is None:
+            codes = [self.kinds.index(kind) for kind in key if kind in self.kinds]
+            mask = self._kind_masks[key] = np.isin(self.doc_kinds, codes)
+        return mask
+
+    @staticmethod
+    def _top(scores, k):
+        """Indices of the k highest positive scores, best first."""
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        return top[scores[top] > 0]
+
+    def _bm25(self, term_ids, kinds):
+        if not term_ids:
+            return np.zeros(self.n_docs)
+        postings = [self._postings(term_id) for term_id in term_ids]
+        scores = np.bincount(np.concatenate([docs for docs, _ in postings]),
+                             weights=np.concatenate([weights for _, weights in postings]), minlength=self.n_docs)
+        if kinds is not None:
+            scores *= self._kind_mask(kinds)
+        return scores
+
+    def _ann(self, query, k, kinds, probes=IVF_PROBES):
+        """(doc ids, cosine similarities) of the nearest documents among the `probes` closest lists."""
+        q = self.embedder.embed_one(query)
+        lists = self._top(self.ivf_centroids @ q + 2, probes)  # +2 keeps every list's score positive
+        ids, sims = [], []
+        for j in lists:
+            lo, hi = self.ivf_offsets[j], self.ivf_offsets[j + 1]
+            ids.append(self.ivf_ids[lo:hi])
+            sims.append((self.ivf_vectors[lo:hi].astype(np.float32) @ q) * self.ivf_scales[lo:hi])
+        ids, sims = np.concatenate(ids), np.concatenate(sims)
+        if kinds is not None:
+            keep = self._kind_mask(kinds)[ids]
+            ids, sims = ids[keep], sims[keep]
+        top = self._top(sims + 2, k)
+        return ids[top], sims[top]
+
+    def _coverage(self, doc_id, term_ids, total_idf):
+        covered = 0.0
+        for term_id in term_ids:
+            docs, _ = self._postings(term_id)
+            i = np.searchsorted(docs, doc_id)
+            if i < len(docs) and docs[i] == doc_id:
+                covered += float(self.idf[term_id])
+        return covered / total_idf
+
+    def search(self, query, k=3, kinds=None, hybrid=True):
+        """
+        The `k` best passages for `query`, optionally only of the given kinds
+        ("chat", "prediction", "treatment", "reference", ...). With an
+        embedding index and `hybrid`, BM25 and dense hits are fused by rank.
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        term_ids = [self.vocab[t] for t in terms if t in self.vocab]
+        total_idf = sum(float(self.idf[t]) for t in term_ids) + self.unknown_idf * (len(terms) - len(term_ids))
+        scores = self._bm25(term_ids, kinds)
+        similarity = {}
+        if not hybrid or self.embedder is None:
+            ranked = self._top(scores, k)
+        else:
+            depth = max(4 * k, 20)
+            bm25_ids = self._top(scores, depth)
+            dense_ids, sims = self._ann(query, depth, kinds)
+            keep = (sims >= MIN_SIMILARITY) | (scores[dense_ids] > 0)
+            dense_ids, sims = dense_ids[keep], sims[keep]
+            similarity = dict(zip(dense_ids.tolist(), sims.tolist()))
+            fused = Counter()
+            for ids in (bm25_ids, dense_ids):
+                for rank, doc_id in enumerate(ids.tolist()):
+                    fused[doc_id] += 1 / (RRF_K + rank + 1)
+            ranked = [doc_id for doc_id, _ in fused.most_common(k)]
+        passages = []
+        for doc_id in ranked:
+            doc = self.document(int(doc_id))
+            passages.append(Passage(doc.id, doc.kind, doc.title, doc.text, float(scores[doc_id]),
+                                    self._coverage(doc_id, term_ids, total_idf), similarity.get(int(doc_id))))
+        return passages
+
+    def grounding(self, query, kind, k=3):
+        """Reference section (see prompts.format_references) of the best `kind` or "reference" passages."""
+        return format_references(self.search(query, k, kinds=[kind, "reference"]))
+
+    def answer(self, query, kinds, min_confidence=0.9, min_margin=0.5):
+        """
+        The best passage of `kinds` if it can stand in for a model answer:
+        every query term is one of its title keywords, it contains (nearly)
+        every query term, and its BM25 score beats the runner-up's by at
+        least `min_margin` (relative). Otherwise, or if the query mentions a
+        red-flag symptom, None.
+        """
+        if has_red_flags(query):
+            return None
+        hits = self.search(query, k=2, kinds=kinds, hybrid=False)
+        if not hits or hits[0].confidence < min_confidence:
+            return None
+        if not set(tokenize(query)) <= set(tokenize(hits[0].title)):
+            return None
+        if len(hits) > 1 and 1 - hits[1].score / hits[0].score < min_margin:
+            return None
+        return hits[0]
+
+
+def open_index(path, documents, embedder_spec=None):
+    """The index of `documents` at `path`, (re)built first if missing or built from another corpus."""
+    documents = list(documents)
+    fingerprint = corpus_fingerprint(documents, embedder_spec)
+    try:
+        with open(os.path.join(version_dir(path), "meta.json"), encoding="utf-8") as f:
+            current = json.load(f).get("fingerprint") == fingerprint
+    except (OSError, ValueError):
+        current = False
+    if not current:
+        build_index(path, documents, embedder_spec, fingerprint)
+    return KnowledgeIndex(path)
+
+
+def knowledge_corpus(extra_path=None):
+    """The seed documents plus those at `extra_path` (a JSON Lines file or a directory), if given."""
+    documents = seed_documents()
+    if extra_path:
+        documents.extend(load_corpus(extra_path))
+    return documents
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or query the knowledge retrieval index.")
+    parser.add_argument("--index", default=os.getenv("KNOWLEDGE_INDEX_PATH", "knowledge_index"),
+                        help="Index directory (default: $KNOWLEDGE_INDEX_PATH or knowledge_index)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Index the seed documents plus an optional corpus")
+    build.add_argument("--corpus", default=os.getenv("KNOWLEDGE_CORPUS_PATH"),
+                       help="JSON Lines file or directory of .txt/.md documents")
+    build.add_argument("--embedder", default=os.getenv("KNOWLEDGE_EMBEDDER") or None,
+                       help="Also build an embedding index, e.g. hashed or sentence-transformers:<model>")
+    search = commands.add_parser("search", help="Print the best passages for a query")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=3, help="Number of passages (default: 3)")
+    search.add_argument("--kind", action="append", help="Only passages of this kind (repeatable)")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        start = time.perf_counter()
+        documents = knowledge_corpus(args.corpus)
+        build_index(args.index, documents, args.embedder)
+        print(f"Indexed {len(documents)} documents in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+        return 0
+    index = KnowledgeIndex(args.index)
+    start = time.perf_counter()
+    passages = index.search(args.query, args.k, args.kind)
+    print(f"{len(passages)} passages in {(time.perf_counter() - start) * 1000:.2f} ms", file=sys.stderr)
+    for passage in passages:
+        print(f"{passage.score:7.2f}  {passage.confidence:4.2f}  [{passage.kind}] {passage.id}: {passage.title}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
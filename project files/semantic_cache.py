@@ -0,0 +1,181 @@
+"""
+Semantic cache of patient-chat answers.
+
+Patients ask the same question in many ways ("I have a fever and cough",
+"cough with fever"). The exact-prompt ResponseCache misses every such
+rewording. This cache embeds the question instead, stopwords removed, and
+reuses a stored answer when a previous question lies within the similarity
+threshold. Embeddings barely move when a question gains a "no" or changes
+a number ("I have chest pain" vs "I have no chest pain", "fever for 2 days"
+vs "fever for 10 days"), so each question also keeps its qualifiers (the
+numbers it mentions and the terms it negates), and a hit needs equal
+qualifiers as well. Entries occupy the rows of one preallocated matrix, so a lookup
+is a single matrix-vector product. When the cache is full, the least
+recently used entry is evicted. Expired entries are freed when they are
+next seen.
+
+Every hit records the time its original answer took, so `stats` reports
+the model latency saved.
+"""
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+from embeddings import HashedNgramEmbedder
+from response_cache import normalize_prompt
+from retrieval import STOPWORDS, tokenize
+
+_QUALIFIER_RE = re.compile(r"[a-z]+n't|[a-z]+|\d+(?:\.\d+)?")
+NEGATIONS = frozenset(("no", "not", "never", "without", "none", "nor", "neither", "cannot"))
+NUMBER_WORDS = {word: str(n) for n, word in enumerate(
+    "zero one two three four five six seven eight nine ten eleven twelve".split())}
+
+
+def qualifiers(question):
+    """
+    The numbers a question mentions and the terms it negates (the first
+    content word after each negation), as a sorted tuple. Questions that
+    differ here must not share an answer.
+    """
+    words = _QUALIFIER_RE.findall(question.lower().replace("\u2019", "'"))
+    found = []
+    for i, word in enumerate(words):
+        word = NUMBER_WORDS.get(word, word)
+        if word[0].isdigit():
+            found.append(("number", str(float(word))))
+        elif word in NEGATIONS or word.endswith("n't"):
+            negated = next((term for w in words[i + 1:] if w not in STOPWORDS for term in tokenize(w)), "")
+            found.append(("not", negated))
+    return tuple(sorted(found))
+
+
+@dataclass
+class SemanticHit:
+    __slots__ = ("answer", "question", "similarity", "saved_seconds")
+    answer: str
+    question: str
+    similarity: float
+    saved_seconds: float
+
+
+class SemanticCache:
+    """
+    Thread-safe near-duplicate cache of answers, shared by every session of
+    the process. Questions with cosine similarity >= `threshold` share an
+    answer.
+    """
+    def __init__(self, embedder=None, threshold=0.85, max_entries=2048, ttl_seconds=3600):
+        self.embedder = embedder or HashedNgramEmbedder()
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((max_entries, self.embedder.dim), dtype=np.float32)
+        self._active = np.zeros(max_entries, dtype=bool)
+        self._stored_at = np.zeros(max_entries)
+        self._used_at = np.zeros(max_entries)
+        self._entries = [None] * max_entries  # (question, answer, seconds the answer took, qualifiers)
+        self._slots = {}  # normalized question -> row
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.saved_seconds = 0.0
+        self.lookup_seconds = 0.0
+
+    def _embed(self, question):
+        return self.embedder.embed_one(" ".join(tokenize(question)) or question)
+
+    def _free(self, row):
+        self._active[row] = False
+        self._slots.pop(normalize_prompt(self._entries[row][0]), None)
+        self._entries[row] = None
+
+    def get(self, question):
+        """A SemanticHit for the closest earlier question within the threshold, or None."""
+        start = time.perf_counter()
+        vector = self._embed(question)
+        question_qualifiers = qualifiers(question)
+        now = time.time()
+        with self._lock:
+            hit = None
+            similarities = np.where(self._active, self._vectors @ vector, -np.inf)
+            while True:
+                row = int(similarities.argmax())
+                if similarities[row] < self.threshold:
+                    break
+                if self.ttl_seconds is not None and now - self._stored_at[row] > self.ttl_seconds:
+                    self._free(row)
+                    self.expirations += 1
+                    similarities[row] = -np.inf
+                    continue
+                cached_question, answer, seconds, cached_qualifiers = self._entries[row]
+                if cached_qualifiers != question_qualifiers:
+                    similarities[row] = -np.inf
+                    continue
+                self._used_at[row] = now
+                hit = SemanticHit(answer, cached_question, float(similarities[row]), seconds)
+                break
+            if hit is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.saved_seconds += hit.saved_seconds
+            self.lookup_seconds += time.perf_counter() - start
+        return hit
+
+    def put(self, question, answer, seconds=0.0):
+        """Stores the answer to `question`; `seconds` is how long producing it took."""
+        vector = self._embed(question)
+        key = normalize_prompt(question)
+        now = time.time()
+        with self._lock:
+            row = self._slots.get(key)
+            if row is None:
+                free = np.flatnonzero(~self._active)
+                if len(free):
+                    row = int(free[0])
+                else:
+                    row = int(self._used_at.argmin())  # Least recently used
+                    self._free(row)
+                    self.evictions += 1
+                self._slots[key] = row
+            self._vectors[row] = vector
+            self._active[row] = True
+            self._stored_at[row] = self._used_at[row] = now
+            self._entries[row] = (question, answer, seconds, qualifiers(question))
+
+    def record(self, question, chunks):
+        """
+        Passes a streamed answer through, then caches it with the time it took.
+        Nothing is cached if the stream is not consumed to the end.
+        """
+        start = time.perf_counter()
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        self.put(question, "".join(parts), time.perf_counter() - start)
+
+    def clear(self):
+        with self._lock:
+            self._active[:] = False
+            self._entries = [None] * self.max_entries
+            self._slots.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": int(self._active.sum()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "saved_seconds": self.saved_seconds,
+                "mean_lookup_ms": self.lookup_seconds / lookups * 1000 if lookups else 0.0,
+            }
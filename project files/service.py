@@ -0,0 +1,421 @@
+"""
+UI-independent core of HealthAI: patient chat, disease prediction,
+treatment plans and vitals analytics, shared by the Streamlit app (app.py)
+and the HTTP API (api.py).
+
+HealthService owns the process-wide components (model client, caches,
+knowledge index, treatment templates, interaction tables, vitals store).
+Each is built from the configuration (see config.py) the first time it is
+needed, so a process only pays for what it serves. Model-backed answers
+are returned as a Generation, a dedup key plus a function that streams the
+text; the caller decides where it runs (the app in a background job, the
+API in a worker thread). Everything here is thread-safe.
+"""
+import json
+import threading
+from dataclasses import dataclass
+
+from config import (CHAT_CONTEXT_TOKENS, CHAT_DIGEST_TOKENS, GRANITE_ACQUIRE_TIMEOUT, GRANITE_LATENCY,
+                    GRANITE_LATENCY_SEED, GRANITE_MAX_CONCURRENCY, INTERACTIONS_TABLE_PATH, KNOWLEDGE_CORPUS_PATH,
+                    KNOWLEDGE_EMBEDDER, KNOWLEDGE_INDEX_PATH, METRICS_JSON_LOG, OTEL_EXPORTER_OTLP_ENDPOINT,
+                    RESPONSE_CACHE_PATH, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RETRIEVAL_ANSWER_CONFIDENCE,
+                    RETRIEVAL_PASSAGES, SEMANTIC_CACHE_EMBEDDER, SEMANTIC_CACHE_SIZE, SEMANTIC_CACHE_THRESHOLD,
+                    TREATMENT_TEMPLATES_MAX, TREATMENT_TEMPLATES_PATH, VITALS_STORE_PATH)
+from conversation import ConversationMemory
+from embeddings import load_embedder
+from granite import MockGraniteModel, parse_latency_profile
+from interactions import INTERACTIONS, InteractionChecker, load_table, safety_section
+from model_client import ModelClient
+from predictions import parse_predictions, sort_by_likelihood
+from prompts import build_prediction_prompt, build_treatment_prompt
+from response_cache import CachedModel, ResponseCache, cache_key
+from retrieval import knowledge_corpus, open_index
+from semantic_cache import SemanticCache
+from telemetry import Telemetry, TimedModel, otlp_tracer
+from treatment_plans import NEUTRAL_PROFILE, TemplateStore, looks_like_plan, personalize, unusual_profile
+
+DEFAULT_PROFILE = {
+    "name": "",
+    "age": 0,
+    "gender": "Male",
+    "medical_history": "",
+    "current_medications": "",
+    "allergies": "",
+}
+
+
+@dataclass
+class Generation:
+    """A model-backed answer, not yet run. Equal keys mean equal answers."""
+    __slots__ = ("key", "stream", "source")
+    key: str
+    stream: object  # () -> iterator of text chunks
+    source: str  # "model", "template", "semantic_cache" or "retrieval"
+
+    def text(self):
+        """Runs the generation to the end (blocking) and returns the whole text."""
+        return "".join(self.stream())
+
+
+MAX_AGE = 120
+
+
+def _age(value):
+    """A whole number of years from 0 to MAX_AGE, from an int, an integral float or a numeric string."""
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValueError(f"age must be a number, not {value!r}") from None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise TypeError(f"age must be a number, not {type(value).__name__}")
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(f"age must be a whole number of years, not {value}")
+    if not 0 <= value <= MAX_AGE:
+        raise ValueError(f"age must be between 0 and {MAX_AGE}, not {value:g}")
+    return int(value)
+
+
+def normalize_profile(profile):
+    """
+    A complete patient profile: DEFAULT_PROFILE overridden by the known keys
+    of `profile`. Raises ValueError or TypeError for an invalid value.
+    """
+    normalized = dict(DEFAULT_PROFILE)
+    for key, default in DEFAULT_PROFILE.items():
+        value = (profile or {}).get(key)
+        if value is None:
+            continue
+        if key == "age":
+            normalized[key] = _age(value)
+        elif isinstance(value, str):
+            normalized[key] = value
+        else:
+            raise TypeError(f"{key} must be a string, not {type(value).__name__}")
+    return normalized
+
+
+def init_granite_model():
+    """
+    Initializes the mock IBM Granite model.
+    In a real scenario, this would involve authenticating with IBM Watson ML and
+    loading the Granite-13b-instruct-v2 model. It runs once per process (see
+    HealthService.model), so the client's authenticated HTTP session and its
+    keep-alive connections are reused by every caller.
+    """
+    # Placeholder for actual IBM Watson ML client initialization
+    # from ibm_watson_machine_learning.foundation_models.utils.enums import ModelTypes
+    # from ibm_watson_machine_learning.foundation_models import Model
+    # model = Model(
+    #     model_id=ModelTypes.GRANITE_13B_INSTRUCT_V2,
+    #     params={...}, # Add necessary model parameters
+    #     credentials={
+    #         "url": "https://us-south.ml.cloud.ibm.com", # Or your region's endpoint
+    #         "apikey": WATSONX_API_KEY
+    #     },
+    #     project_id=WATSONX_PROJECT_ID
+    # )
+    latency = parse_latency_profile(GRANITE_LATENCY, seed=GRANITE_LATENCY_SEED)
+    return MockGraniteModel(latency=latency) # Return the mock model instance
+
+
+def create_telemetry():
+    """Telemetry with the exporters the configuration enables (serving /metrics is up to the caller)."""
+    tracer = otlp_tracer(OTEL_EXPORTER_OTLP_ENDPOINT) if OTEL_EXPORTER_OTLP_ENDPOINT else None
+    return Telemetry(json_log=METRICS_JSON_LOG, tracer=tracer)
+
+
+class HealthService:
+    """The core functions and the process-wide components they share."""
+    def __init__(self, telemetry=None):
+        self.telemetry = telemetry if telemetry is not None else Telemetry()
+        self._lock = threading.RLock() # Components may build the ones they use
+        self._components = {}
+        self._cohort_refresh = None # Background thread of refresh_cohort
+
+    def _component(self, name, build):
+        component = self._components.get(name)
+        if component is None:
+            with self._lock:
+                component = self._components.get(name)
+                if component is None:
+                    component = self._components[name] = build()
+        return component
+
+    # --- Components (built on first use) ---
+    @property
+    def response_cache(self):
+        def build():
+            cache = ResponseCache(max_entries=RESPONSE_CACHE_SIZE, ttl_seconds=RESPONSE_CACHE_TTL,
+                                  path=RESPONSE_CACHE_PATH)
+            self.telemetry.register("healthai_response_cache", cache.stats)
+            return cache
+        return self._component("response_cache", build)
+
+    @property
+    def model(self):
+        """Model client shared by every caller; cache hits don't take one of its concurrency slots."""
+        def build():
+            client = ModelClient(TimedModel(init_granite_model(), self.telemetry),
+                                 max_concurrency=GRANITE_MAX_CONCURRENCY, acquire_timeout=GRANITE_ACQUIRE_TIMEOUT)
+            self.telemetry.register("healthai_model_client", client.stats)
+            return CachedModel(client, self.response_cache)
+        return self._component("model", build)
+
+    @property
+    def knowledge_index(self):
+        """Memory-mapped retrieval index."""
+        return self._component("knowledge_index", lambda: open_index(
+            KNOWLEDGE_INDEX_PATH, knowledge_corpus(KNOWLEDGE_CORPUS_PATH), KNOWLEDGE_EMBEDDER))
+
+    @property
+    def semantic_cache(self):
+        """Near-duplicate cache of chat answers."""
+        def build():
+            cache = SemanticCache(load_embedder(SEMANTIC_CACHE_EMBEDDER), threshold=SEMANTIC_CACHE_THRESHOLD,
+                                  max_entries=SEMANTIC_CACHE_SIZE, ttl_seconds=RESPONSE_CACHE_TTL)
+            self.telemetry.register("healthai_semantic_cache", cache.stats)
+            return cache
+        return self._component("semantic_cache", build)
+
+    @property
+    def treatment_templates(self):
+        """Base treatment plans by condition."""
+        return self._component("treatment_templates",
+                               lambda: TemplateStore(TREATMENT_TEMPLATES_PATH, TREATMENT_TEMPLATES_MAX))
+
+    @property
+    def interaction_checker(self):
+        """Drug interaction and allergy screening tables."""
+        def build():
+            if INTERACTIONS_TABLE_PATH:
+                return InteractionChecker(interactions=INTERACTIONS + load_table(INTERACTIONS_TABLE_PATH))
+            return InteractionChecker()
+        return self._component("interaction_checker", build)
+
+    @property
+    def vitals_store(self):
+        """
+        Columnar store of imported vitals. Imports also keep the cohort
+        rollups and per-patient summary rows up to date; patients written
+        behind the cohort index's back are recomputed in the background
+        (see refresh_cohort). Built on pandas and pyarrow, which are only
+        imported here.
+        """
+        def build():
+            from vitals_store import open_store
+
+            store = open_store(VITALS_STORE_PATH)
+            self.refresh_cohort(store)
+            return store
+        return self._component("vitals_store", build)
+
+    def refresh_cohort(self, store=None):
+        """
+        Recomputes the stale patients of the cohort index (see
+        CohortIndex.refresh) in a background thread, unless one is running.
+        Returns the thread, or None if a refresh is already running.
+        """
+        store = store if store is not None else self.vitals_store
+        with self._lock:
+            if self._cohort_refresh is not None and self._cohort_refresh.is_alive():
+                return None
+
+            def refresh():
+                with self.telemetry.span("cohort.refresh"):
+                    store.cohort.refresh(store)
+
+            self._cohort_refresh = threading.Thread(target=refresh, name="cohort-refresh", daemon=True)
+            self._cohort_refresh.start()
+            return self._cohort_refresh
+
+    def cohort_refreshing(self):
+        """Whether a refresh_cohort thread is running."""
+        refresh = self._cohort_refresh
+        return refresh is not None and refresh.is_alive()
+
+    def references(self, text, task):
+        """Reference passages for a prompt (see KnowledgeIndex.grounding)."""
+        return self.knowledge_index.grounding(text, task, RETRIEVAL_PASSAGES)
+
+    # --- Patient chat ---
+    def conversation(self, turns=()):
+        """Chat memory holding earlier (role, message) turns, for answer_query."""
+        return ConversationMemory.from_turns(list(turns), token_budget=CHAT_CONTEXT_TOKENS,
+                                             digest_budget=CHAT_DIGEST_TOKENS)
+
+    def answer_query(self, query, memory=None):
+        """
+        Answers a patient health question, with the conversation so far (a
+        ConversationMemory, see conversation()) and reference passages in the
+        prompt. Cheaper answers come first: a reworded earlier question's
+        answer from the semantic cache, then a high-confidence passage from
+        the knowledge index. The semantic cache is shared by every patient,
+        so it only serves and stores answers to questions asked without
+        earlier turns. `memory` should not hold `query` yet.
+        """
+        memory = memory if memory is not None else self.conversation()
+        shareable = not (memory.turns or memory.digest)
+        semantic_cache = self.semantic_cache
+        if shareable:
+            with self.telemetry.span("chat.semantic_cache"):
+                hit = semantic_cache.get(query)
+            if hit is not None:
+                return Generation("semantic:" + cache_key(hit.question), lambda: iter([hit.answer]), "semantic_cache")
+        index = self.knowledge_index
+        with self.telemetry.span("chat.retrieval"):
+            passage = index.answer(query, ["chat", "reference"], min_confidence=RETRIEVAL_ANSWER_CONFIDENCE)
+        if passage is not None:
+            return Generation("retrieval:" + passage.id, lambda: iter([passage.text]), "retrieval")
+        with self.telemetry.span("chat.prompt"):
+            references = index.grounding(query, "chat", RETRIEVAL_PASSAGES)
+            prompt = memory.build_prompt(query, references)
+        model = self.model
+
+        def generate():
+            chunks = model.generate_text_stream(prompt)
+            return semantic_cache.record(query, chunks) if shareable else chunks
+
+        return Generation(cache_key(prompt), generate, "model")
+
+    # --- Disease prediction ---
+    def predict(self, symptoms, profile, vitals_findings=None):
+        """Potential conditions for the symptoms; parse the answer with ranked_conditions."""
+        with self.telemetry.span("prediction.prompt"):
+            prompt = build_prediction_prompt(symptoms, normalize_profile(profile), vitals_findings,
+                                             self.references(symptoms, "prediction"))
+        model = self.model
+        return Generation(cache_key(prompt), lambda: model.generate_text_stream(prompt), "model")
+
+    def ranked_conditions(self, text):
+        """PredictedCondition records parsed from a prediction answer, most likely first."""
+        with self.telemetry.span("prediction.parse"):
+            return sort_by_likelihood(parse_predictions(text))
+
+    # --- Treatment plans ---
+    def screen_plan(self, plan, profile):
+        """`plan` followed by its safety check against the profile's medications, allergies and history."""
+        if not looks_like_plan(plan):
+            return plan
+        with self.telemetry.span("treatment.screen"):
+            section = safety_section(self.interaction_checker.screen(profile, plan), profile)
+        return f"{plan}\n\n{section}" if section else plan
+
+    def treatment_plan(self, condition, profile):
+        """
+        Treatment plan for `condition`, personalized to the profile. Routine
+        profiles get the condition's base plan plus local personalization; a
+        condition without a base plan gets one generated once, with a neutral
+        profile. Unusual profiles (see unusual_profile) get a full model
+        generation. Every plan ends with a safety check of the drugs it
+        mentions (see screen_plan).
+        """
+        profile = normalize_profile(profile)
+        model = self.model
+        if unusual_profile(profile):
+            with self.telemetry.span("treatment.prompt"):
+                prompt = build_treatment_prompt(condition, profile, self.references(condition, "treatment"))
+
+            def generate_full_plan():
+                parts = []
+                for chunk in model.generate_text_stream(prompt):
+                    parts.append(chunk)
+                    yield chunk
+                plan = "".join(parts)
+                yield self.screen_plan(plan, profile)[len(plan):]
+
+            return Generation(cache_key(prompt), generate_full_plan, "model")
+
+        templates = self.treatment_templates
+        template = templates.get(condition)
+        if template is not None:
+            with self.telemetry.span("treatment.personalize"):
+                plan = self.screen_plan(personalize(template, profile), profile)
+            return Generation("template:" + cache_key(plan), lambda: iter([plan]), "template")
+
+        with self.telemetry.span("treatment.prompt"):
+            prompt = build_treatment_prompt(condition, NEUTRAL_PROFILE, self.references(condition, "treatment"))
+
+        def generate_base_plan():
+            base = model.generate_text(prompt)
+            yield self.screen_plan(personalize(base, profile) if templates.add(condition, base) else base, profile)
+
+        key = "template-base:" + cache_key(prompt + json.dumps(profile, sort_keys=True))
+        return Generation(key, generate_base_plan, "model")
+
+    # --- Vitals analytics ---
+    def read_vitals(self, patient_id, start=None, end=None, default_days=30):
+        """
+        A patient's stored readings with start <= Date < end (by default the
+        last `default_days` days on record), or None if the patient has none.
+        """
+        import pandas as pd
+
+        store = self.vitals_store
+        if store.version(patient_id) is None:
+            return None
+        if start is None and end is None:
+            start = store.date_bounds(patient_id)[1] - pd.Timedelta(days=default_days)
+        with self.telemetry.span("analytics.load"):
+            return store.read_range(patient_id, start, end)
+
+    def summarize_vitals(self, readings):
+        """
+        Latest reading of every vital with its week-over-week delta and
+        threshold flag (see analytics.latest_values), or None if there are
+        no readings.
+        """
+        from analytics import compute_vitals_analytics, latest_values
+
+        if readings.empty:
+            return None
+        with self.telemetry.span("analytics.pandas"):
+            return latest_values(compute_vitals_analytics(readings, window="7D"))
+
+    def vitals_anomalies(self, readings=None, days=7, detector=None):
+        """
+        Feeds `readings` (if any) to a streaming anomaly detector (a new one
+        unless `detector` is given) and returns its anomalies of the last
+        `days` days, newest first.
+        """
+        import pandas as pd
+        from anomaly import VitalsAnomalyDetector
+
+        detector = detector if detector is not None else VitalsAnomalyDetector()
+        if readings is not None:
+            with self.telemetry.span("analytics.anomalies"):
+                detector.update(readings)
+        latest = detector.last_seen()
+        if latest is None:
+            return []
+        return detector.recent(since=latest - pd.Timedelta(days=days))
+
+    def vitals_report(self, patient_id, start=None, end=None, anomaly_days=7):
+        """
+        A patient's latest readings and recent anomalies as plain JSON data, or
+        None if the patient has no stored readings.
+        """
+        readings = self.read_vitals(patient_id, start, end)
+        if readings is None:
+            return None
+        latest = self.summarize_vitals(readings)
+        anomalies = self.vitals_anomalies(readings, anomaly_days) if latest is not None else []
+        return {
+            "patient_id": patient_id,
+            "readings": len(readings),
+            "latest": {key: _plain(value) for key, value in latest.items()} if latest is not None else None,
+            "anomalies": [{"vital": a.vital, "timestamp": _plain(a.timestamp), "value": _plain(a.value),
+                           "kind": a.kind, "severity": a.severity, "direction": a.direction,
+                           "description": a.describe()} for a in anomalies],
+        }
+
+
+def _plain(value):
+    """JSON-serializable form of a pandas/NumPy scalar (missing values become None)."""
+    import pandas as pd
+
+    if pd.isna(value):
+        return None
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value.item() if hasattr(value, "item") else value
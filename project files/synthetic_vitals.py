@@ -0,0 +1,213 @@
+"""
+Seeded synthetic vitals for many patients, for demos and load/scale tests.
+
+Each patient gets baselines drawn from population distributions. A reading
+is the patient's baseline plus a circadian cosine, post-meal glucose rises,
+a day-to-day offset and reading noise (systolic and diastolic noise is
+correlated). Readings are daily (at the patient's usual measuring time),
+hourly or per minute. Optional anomalies are injected: single-reading
+spikes and whole-day episodes of one raised vital. The `Anomaly` column
+labels them, so detectors can be scored against it.
+
+A chunk of patients is generated as (patients x readings) arrays in a few
+NumPy operations and yielded as one long frame, so output of any size
+streams in bounded memory. Given the same arguments the output is always
+the same.
+
+Usage (from the `project files` directory):
+    python synthetic_vitals.py --patients 10000 --days 30 --store vitals_store
+    python synthetic_vitals.py --patients 200 --days 7 --freq min --parquet vitals.parquet
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from analytics import DATE_COLUMN, VITALS
+from vitals_store import CHUNK_ROWS, ROW_GROUP_ROWS, SCHEMA, SOURCE_COLUMN, VALID_RANGES, open_store
+
+PATIENT_COLUMN = "Patient ID"
+ANOMALY_COLUMN = "Anomaly"
+SOURCE = "synthetic"
+
+# Reading interval in minutes
+FREQUENCIES = {"D": 1440, "h": 60, "min": 1}
+# Population distribution of patient baselines: vital -> (mean, sd)
+BASELINES = {"heart_rate": (72, 8), "systolic": (122, 12), "diastolic": (79, 8), "glucose": (98, 10)}
+# Within-patient variability: vital -> (reading noise sd, day-to-day sd)
+VARIABILITY = {"heart_rate": (4, 2), "systolic": (6, 3), "diastolic": (4, 2), "glucose": (6, 3)}
+# Circadian cosine: vital -> (amplitude, peak hour)
+CIRCADIAN = {"heart_rate": (6, 15), "systolic": (6, 11), "diastolic": (4, 11), "glucose": (3, 5)}
+MEAL_HOURS = (8, 13, 19)
+MEAL_GLUCOSE_RISE = 30  # mg/dL at the post-meal peak, 45 minutes after eating
+BP_NOISE_CORRELATION = 0.6
+# Rise of an injected anomaly per vital (spikes and episodes alike)
+ANOMALY_RISE = {"heart_rate": 35, "systolic": 35, "diastolic": 20, "glucose": 90}
+_KEYS = list(VITALS)
+
+
+def _circadian(hours):
+    """(vitals x readings) circadian and meal component for times of day in hours."""
+    out = np.empty((len(_KEYS),) + hours.shape, dtype=np.float32)
+    for i, key in enumerate(_KEYS):
+        amplitude, peak = CIRCADIAN[key]
+        out[i] = amplitude * np.cos(2 * np.pi * (hours - peak) / 24)
+    for meal in MEAL_HOURS:
+        out[_KEYS.index("glucose")] += MEAL_GLUCOSE_RISE * np.exp(-0.5 * ((hours - meal - 0.75) / 0.6) ** 2)
+    return out
+
+
+def patient_ids(patients, prefix="synthetic-"):
+    width = len(str(max(patients - 1, 0)))
+    return [f"{prefix}{i:0{width}d}" for i in range(patients)]
+
+
+def generate_vitals(patients, days, freq="D", seed=0, start=None, anomaly_rate=0.0, episode_rate=0.0,
+                    missing_rate=0.0, chunk_rows=CHUNK_ROWS * 20, prefix="synthetic-"):
+    """
+    Yields long frames (Patient ID, Date, one column per vital, Anomaly) of
+    whole patients, about `chunk_rows` readings each, covering `days` days
+    from `start` (default: midnight `days` days ago) at `freq` ("D", "h" or
+    "min"). `anomaly_rate` is the chance that a reading of a vital spikes,
+    `episode_rate` the chance that a patient-day is an episode of one raised
+    vital, and `missing_rate` the chance that a value is missing (the
+    integer vitals are then nullable Int16).
+    """
+    if freq not in FREQUENCIES:
+        raise ValueError(f"Unknown frequency {freq!r}; expected one of {', '.join(FREQUENCIES)}")
+    step = FREQUENCIES[freq]
+    per_day = 1440 // step
+    readings = days * per_day
+    start = pd.Timestamp(start) if start is not None else pd.Timestamp.now().normalize() - pd.Timedelta(days=days)
+    start = np.datetime64(start.floor("min").to_datetime64(), "ms")
+    ids = patient_ids(patients, prefix)
+
+    rng = np.random.default_rng(seed)
+    baselines = np.stack([rng.normal(*BASELINES[key], patients) for key in _KEYS], axis=1).astype(np.float32)
+    baselines[:, 2] = np.minimum(baselines[:, 2], baselines[:, 1] - 20)  # Keep a pulse pressure
+    measuring_hour = np.clip(rng.normal(8, 1.5, patients), 5, 22)  # Daily readings only
+    chunk_patients = max(1, chunk_rows // max(readings, 1))
+
+    for first in range(0, patients, chunk_patients):
+        n = min(chunk_patients, patients - first)
+        crng = np.random.default_rng([seed, first])
+        # Minutes since start of every reading, (patients x readings)
+        minutes = np.broadcast_to(np.arange(readings, dtype=np.int64) * step, (n, readings))
+        if freq == "D":
+            jitter = crng.normal(0, 20, (n, readings))
+            minutes = minutes + np.clip(measuring_hour[first:first + n, None] * 60 + jitter, 0, 1439).astype(np.int64)
+        hours = ((minutes % 1440) / 60).astype(np.float32)
+        day = (minutes // 1440).astype(np.int64)
+
+        values = baselines[first:first + n].T[:, :, None] + _circadian(hours)
+        noise = crng.standard_normal((len(_KEYS), n, readings), dtype=np.float32)
+        noise[2] = BP_NOISE_CORRELATION * noise[1] + np.sqrt(1 - BP_NOISE_CORRELATION ** 2) * noise[2]
+        daily = crng.standard_normal((len(_KEYS), n, days), dtype=np.float32)
+        daily[2] = BP_NOISE_CORRELATION * daily[1] + np.sqrt(1 - BP_NOISE_CORRELATION ** 2) * daily[2]
+        daily_offset = np.take_along_axis(daily, np.broadcast_to(day, (len(_KEYS), n, readings)), axis=2)
+        for i, key in enumerate(_KEYS):
+            reading_sd, day_sd = VARIABILITY[key]
+            values[i] += reading_sd * noise[i] + day_sd * daily_offset[i]
+
+        anomaly = np.zeros((n, readings), dtype=bool)
+        if anomaly_rate > 0:
+            spikes = crng.random((len(_KEYS), n, readings)) < anomaly_rate
+            for i, key in enumerate(_KEYS):
+                values[i][spikes[i]] += ANOMALY_RISE[key]
+            anomaly |= spikes.any(axis=0)
+        if episode_rate > 0:
+            episodes = crng.random((n, days)) < episode_rate
+            vital = crng.integers(0, len(_KEYS), (n, days))
+            on_day = np.take_along_axis(episodes, day, axis=1)
+            vital_on_day = np.take_along_axis(vital, day, axis=1)
+            for i, key in enumerate(_KEYS):
+                values[i][on_day & (vital_on_day == i)] += ANOMALY_RISE[key]
+            anomaly |= on_day
+
+        frame = {
+            PATIENT_COLUMN: pd.Categorical.from_codes(np.repeat(np.arange(first, first + n), readings), ids),
+            DATE_COLUMN: (start + minutes.astype("timedelta64[m]")).ravel(),
+        }
+        missing = crng.random((len(_KEYS), n, readings)) < missing_rate if missing_rate > 0 else None
+        for i, key in enumerate(_KEYS):
+            column = np.clip(values[i], *VALID_RANGES[key]).ravel()
+            column = column.round(1) if key == "glucose" else column.round().astype(np.int16)
+            if missing is not None:
+                mask = missing[i].ravel()
+                column = (pd.array(column, dtype="Int16") if key != "glucose"
+                          else pd.array(column, dtype="Float32")).copy()
+                column[mask] = pd.NA
+            frame[VITALS[key]] = column
+        frame[ANOMALY_COLUMN] = anomaly.ravel()
+        yield pd.DataFrame(frame)
+
+
+def sample_metrics(days=30, seed=0, end=None, anomaly_rate=0.03):
+    """One patient's daily readings ending today, in the dashboard's metrics layout."""
+    end = pd.Timestamp(end) if end is not None else pd.Timestamp.now()
+    start = end.normalize() - pd.Timedelta(days=days - 1)
+    frame = next(generate_vitals(1, days, "D", seed=seed, start=start, anomaly_rate=anomaly_rate))
+    return frame.drop(columns=[PATIENT_COLUMN, ANOMALY_COLUMN])
+
+
+def write_store(store, frames):
+    """Appends generated frames to a VitalsStore, one patient at a time. Returns row and patient counts."""
+    counts = {"rows": 0, "patients": 0}
+    for frame in frames:
+        readings = frame.drop(columns=[ANOMALY_COLUMN])
+        readings[SOURCE_COLUMN] = pd.Categorical([SOURCE] * len(readings))
+        for patient_id, part in readings.groupby(PATIENT_COLUMN, observed=True, sort=False):
+            counts["rows"] += store.append(patient_id, part.drop(columns=[PATIENT_COLUMN]))
+            counts["patients"] += 1
+    return counts
+
+
+def write_parquet(path, frames):
+    """Writes generated frames to one Parquet file (all patients, long format). Returns the row count."""
+    schema = pa.schema([(PATIENT_COLUMN, pa.dictionary(pa.int32(), pa.string()))]
+                       + [SCHEMA.field(name) for name in SCHEMA.names if name != SOURCE_COLUMN]
+                       + [(ANOMALY_COLUMN, pa.bool_())])
+    rows = 0
+    with pq.ParquetWriter(path + ".tmp", schema, compression="zstd") as writer:
+        for frame in frames:
+            writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False),
+                               row_group_size=ROW_GROUP_ROWS)
+            rows += len(frame)
+    os.replace(path + ".tmp", path)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate seeded synthetic vitals for many patients.")
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--freq", choices=list(FREQUENCIES), default="D", help="Reading interval (default: D)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", help="First day, e.g. 2026-01-01 (default: --days days ago)")
+    parser.add_argument("--anomaly-rate", type=float, default=0.0, help="Chance a reading of a vital spikes")
+    parser.add_argument("--episode-rate", type=float, default=0.0, help="Chance a patient-day is an episode")
+    parser.add_argument("--missing-rate", type=float, default=0.0, help="Chance a value is missing")
+    parser.add_argument("--prefix", default="synthetic-", help="Patient id prefix")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--store", help="Vitals store directory to append to")
+    target.add_argument("--parquet", help="Single Parquet file to write")
+    args = parser.parse_args(argv)
+
+    frames = generate_vitals(args.patients, args.days, args.freq, args.seed, args.start, args.anomaly_rate,
+                             args.episode_rate, args.missing_rate, prefix=args.prefix)
+    start = time.perf_counter()
+    if args.store:
+        rows = write_store(open_store(args.store), frames)["rows"]
+    else:
+        rows = write_parquet(args.parquet, frames)
+    print(f"{rows} readings for {args.patients} patients in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+"""
+Tracing spans, counters and latency histograms for the app's hot paths.
+
+`span("stage")` times a block. Every span is observed in the stage's
+latency histogram. Spans inside a script rerun (between `start_rerun` and
+`finish_rerun`) also form that rerun's timing breakdown, nested spans
+indented under their parent. Background jobs run outside any rerun, so
+their spans (and the model calls timed by TimedModel) only feed the
+histograms.
+
+Exports:
+    prometheus()   Prometheus text format; `serve(port)` answers GET /metrics
+    json_log       one JSON line per rerun and per model call
+    tracer         optional OpenTelemetry tracer (see otlp_tracer); every
+                   span is also sent as an OTLP span
+
+Histograms use fixed buckets, so observing is a bisect and a few additions
+under a lock, and quantiles are estimated from the buckets as Prometheus
+does.
+"""
+import bisect
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HELP = {
+    "healthai_stage_seconds": "Time spent in an instrumented stage",
+    "healthai_rerun_seconds": "Duration of a full script rerun",
+    "healthai_reruns_total": "Script reruns",
+    "healthai_model_call_seconds": "Duration of a model call, streamed to the end",
+    "healthai_model_first_token_seconds": "Time to the first chunk of a streamed model call",
+    "healthai_model_calls_total": "Model calls by method and status",
+}
+
+_trace = contextvars.ContextVar("healthai_trace", default=None)  # Open rerun: [stages, depth, start]
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot: above the largest bucket
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate of the q-quantile, interpolated linearly inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                low = self.buckets[i - 1] if i else 0.0
+                high = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return low + (high - low) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+def _labels_text(labels):
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}" if labels else ""
+
+
+class Telemetry:
+    """Process-wide registry of counters and histograms; thread-safe."""
+    def __init__(self, json_log=None, tracer=None):
+        self.json_log = json_log
+        self.tracer = tracer
+        self._lock = threading.Lock()
+        self._counters = {}  # (name, labels) -> value
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._collectors = []  # (prefix, stats function)
+        self._log_file = open(json_log, "a", encoding="utf-8") if json_log else None
+
+    # --- Recording ---
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def register(self, prefix, stats):
+        """Exports the numeric values of `stats()` (e.g. ModelClient.stats) as gauges named prefix_<key>."""
+        with self._lock:
+            self._collectors.append((prefix, stats))
+
+    def log(self, record):
+        if self._log_file is None:
+            return
+        line = json.dumps(dict(record, time=time.time()), default=str)
+        with self._lock:
+            self._log_file.write(line + "\n")
+            self._log_file.flush()
+
+    @contextmanager
+    def span(self, stage, **attributes):
+        """Times the block as `stage` (see the module docstring)."""
+        trace = _trace.get()
+        entry = None
+        if trace is not None:
+            entry = [stage, trace[1], 0.0]  # Listed when it starts, so parents precede their children
+            trace[0].append(entry)
+            trace[1] += 1
+        wall_start = time.time_ns()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.observe("healthai_stage_seconds", seconds, stage=stage)
+            if entry is not None:
+                entry[2] = seconds
+                trace[1] -= 1
+            if self.tracer is not None:
+                span = self.tracer.start_span(stage, start_time=wall_start, attributes=attributes)
+                span.end(end_time=wall_start + int(seconds * 1e9))
+
+    def start_rerun(self):
+        """Opens the timing breakdown of a script rerun in the current thread."""
+        _trace.set([[], 0, time.perf_counter()])
+
+    def finish_rerun(self, **attributes):
+        """
+        Closes the current rerun. Returns its total seconds and its stages as
+        (stage, depth, seconds) in the order they started, or None if no
+        rerun is open.
+        """
+        trace = _trace.get()
+        if trace is None:
+            return None
+        _trace.set(None)
+        total = time.perf_counter() - trace[2]
+        stages = [tuple(entry) for entry in trace[0]]
+        self.observe("healthai_rerun_seconds", total)
+        self.count("healthai_reruns_total")
+        self.log({"type": "rerun", "seconds": total, **attributes,
+                  "stages": [{"stage": s, "depth": d, "seconds": t} for s, d, t in stages]})
+        return total, stages
+
+    # --- Reading ---
+    def histogram(self, name, **labels):
+        with self._lock:
+            return self._histograms.get((name, tuple(sorted(labels.items()))))
+
+    def histograms(self, name):
+        """{labels: Histogram} of every histogram named `name`; labels are sorted (key, value) tuples."""
+        with self._lock:
+            return {labels: h for (n, labels), h in self._histograms.items() if n == name}
+
+    def snapshot(self):
+        """Counters, histogram summaries and registered gauges as a JSON-serializable dict."""
+        with self._lock:
+            counters = [{"name": n, "labels": dict(labels), "value": v} for (n, labels), v in self._counters.items()]
+            histograms = [{"name": n, "labels": dict(labels), "count": h.count, "sum": h.sum,
+                           "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99)}
+                          for (n, labels), h in self._histograms.items()]
+            collectors = list(self._collectors)
+        gauges = {f"{prefix}_{k}": v for prefix, stats in collectors for k, v in stats().items()
+                  if isinstance(v, (int, float))}
+        return {"counters": counters, "histograms": histograms, "gauges": gauges}
+
+    def prometheus(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda item: item[0])
+            collectors = list(self._collectors)
+            typed = set()
+            for (name, labels), value in counters:
+                if name not in typed:
+                    typed.add(name)
+                    lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} counter"]
+                lines.append(f"{name}{_labels_text(labels)} {value}")
+            for (name, labels), h in histograms:
+                if name not in typed:
+                    typed.add(name)
+                    lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} histogram"]
+                cumulative = 0
+                for bound, n in zip(h.buckets + (float("inf"),), h.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{_labels_text(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{_labels_text(labels)} {h.sum}")
+                lines.append(f"{name}_count{_labels_text(labels)} {h.count}")
+        for prefix, stats in collectors:
+            for key, value in stats().items():
+                if isinstance(value, (int, float)):
+                    lines += [f"# TYPE {prefix}_{key} gauge", f"{prefix}_{key} {float(value)}"]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        """Serves `prometheus()` at http://host:port/metrics from a daemon thread. Returns the server."""
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = telemetry.prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
+
+
+class TimedModel:
+    """
+    Wraps a Granite model so every call is counted and its latency observed
+    (for streams also the time to the first chunk). Wrap the backend itself,
+    inside any cache, so cache hits are not counted as model calls.
+    """
+    def __init__(self, model, telemetry):
+        self.model = model
+        self.telemetry = telemetry
+
+    def _done(self, method, start, status, first_token=None):
+        seconds = time.perf_counter() - start
+        self.telemetry.observe("healthai_model_call_seconds", seconds, method=method)
+        self.telemetry.count("healthai_model_calls_total", method=method, status=status)
+        self.telemetry.log({"type": "model_call", "method": method, "status": status, "seconds": seconds,
+                            "first_token_seconds": first_token})
+
+    def generate_text(self, prompt):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            response = self.model.generate_text(prompt)
+            status = "ok"
+            return response
+        finally:
+            self._done("generate_text", start, status)
+
+    def generate_text_stream(self, prompt):
+        start = time.perf_counter()
+        first_token = None
+        status = "cancelled"  # Stream closed before the end
+        try:
+            for chunk in self.model.generate_text_stream(prompt):
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                    self.telemetry.observe("healthai_model_first_token_seconds", first_token)
+                yield chunk
+            status = "ok"
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            self._done("generate_text_stream", start, status, first_token)
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+
+def otlp_tracer(endpoint, service_name="healthai"):
+    """An OpenTelemetry tracer exporting spans over OTLP/HTTP to `endpoint` (e.g. http://localhost:4318)."""
+    try:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError as e:
+        raise ImportError("OTLP export needs OpenTelemetry: pip install opentelemetry-sdk "
+                          "opentelemetry-exporter-otlp-proto-http") from e
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint.rstrip("/") + "/v1/traces")))
+    return provider.get_tracer("healthai")
@@ -0,0 +1,22 @@
+"""
+Test setup: the app's modules are imported from the project directory, and
+every on-disk path points into a temporary directory, so tests never touch
+(or depend on) a developer's stores and indexes. The mock model answers
+without simulated latency.
+"""
+import os
+import sys
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix="healthai-tests-")
+os.environ.update({
+    "GRANITE_LATENCY": "zero",
+    "KNOWLEDGE_INDEX_PATH": os.path.join(_workdir, "knowledge_index"),
+    "VITALS_STORE_PATH": os.path.join(_workdir, "vitals_store"),
+    "CHAT_HISTORY_PATH": os.path.join(_workdir, "chat_history.sqlite"),
+})
+for name in ("RESPONSE_CACHE_PATH", "TREATMENT_TEMPLATES_PATH", "KNOWLEDGE_CORPUS_PATH", "KNOWLEDGE_EMBEDDER",
+             "METRICS_PORT", "METRICS_JSON_LOG", "OTEL_EXPORTER_OTLP_ENDPOINT"):
+    os.environ.pop(name, None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
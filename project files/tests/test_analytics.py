@@ -0,0 +1,39 @@
+import io
+
+import numpy as np
+
+from service import HealthService
+from vitals_store import VitalsStore
+
+# A wearable-style long export: one row per vital, blood pressure and heart rate at different times
+LONG_EXPORT = b"""timestamp,type,value,unit
+2026-01-01T08:00:00,heart_rate,72,bpm
+2026-01-01T08:05:00,blood_pressure,118/76,mmHg
+2026-01-02T08:00:00,heart_rate,75,bpm
+2026-01-02T08:05:00,blood_pressure,135/85,mmHg
+2026-01-02T09:00:00,heart_rate,71,bpm
+"""
+
+
+def test_summary_uses_each_vitals_own_latest_reading(tmp_path):
+    store = VitalsStore(str(tmp_path))
+    store.ingest("p1", io.BytesIO(LONG_EXPORT), "csv")
+    readings = store.read_range("p1")
+    assert readings.iloc[-1].isna().any()  # The last row holds heart rate only
+
+    latest = HealthService().summarize_vitals(readings)
+    assert latest["Heart Rate (bpm)"] == 71 and latest["heart_rate_abnormal"] == False  # noqa: E712
+    assert (latest["Systolic BP (mmHg)"], latest["Diastolic BP (mmHg)"]) == (135, 85)
+    assert latest["bp_abnormal"] is True
+    assert latest["systolic_delta"] == 135 - 118
+    assert np.isnan(latest["Blood Glucose (mg/dL)"]) and latest["glucose_abnormal"] is None
+
+
+def test_vitals_report_has_no_nulls_for_vitals_with_readings(tmp_path, monkeypatch):
+    service = HealthService()
+    store = VitalsStore(str(tmp_path))
+    store.ingest("p1", io.BytesIO(LONG_EXPORT), "csv")
+    monkeypatch.setitem(service._components, "vitals_store", store)
+    latest = service.vitals_report("p1")["latest"]
+    assert (latest["Systolic BP (mmHg)"], latest["Diastolic BP (mmHg)"], latest["bp_abnormal"]) == (135, 85, True)
+    assert latest["Blood Glucose (mg/dL)"] is None and latest["glucose_abnormal"] is None
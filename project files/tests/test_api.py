@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import pytest
+
+import api
+from service import HealthService
+
+
+@pytest.fixture(scope="module", autouse=True)
+def service():
+    api.app.state.service = HealthService()
+
+
+def post(path, body, headers=(), method="POST"):
+    """(status, JSON body) of a request (POST by default) to the app, driven through its ASGI interface."""
+    messages = [{"type": "http.request", "body": json.dumps(body).encode() if body is not None else b"",
+                 "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+             "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+             "headers": [(b"content-type", b"application/json"), *headers], "client": ("127.0.0.1", 1),
+             "server": ("127.0.0.1", 80), "app": api.app}
+    asyncio.run(api.app(scope, receive, send))
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    return status, json.loads(b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body"))
+
+
+@pytest.mark.parametrize("profile", [
+    {"age": [1]},
+    {"age": {"years": 35}},
+    {"age": True},
+    {"age": "old"},
+    {"age": "35.5"},
+    {"age": -1},
+    {"age": 500},
+    {"allergies": ["penicillin"]},
+    "35",
+])
+def test_malformed_profile_is_a_400(profile):
+    for path, field in (("/v1/predictions", "symptoms"), ("/v1/treatment-plans", "condition")):
+        status, body = post(path, {field: "fever", "profile": profile})
+        assert status == 400, body
+        assert "profile" in body["error"]
+
+
+@pytest.mark.parametrize("age", [35, 35.0, "35", " 35.0 "])
+def test_numeric_ages_are_accepted(age):
+    status, body = post("/v1/predictions", {"symptoms": "headache, fatigue and fever", "profile": {"age": age}})
+    assert status == 200, body
+    assert body["conditions"]
+
+
+def test_api_key_is_required_when_configured(monkeypatch):
+    monkeypatch.setattr(api.app.state, "api_key", "s3cret")
+    vitals = "/v1/patients/p1/vitals"
+
+    assert post(vitals, None, method="GET")[0] == 401
+    assert post(vitals, None, [(b"authorization", b"Bearer wrong")], method="GET")[0] == 401
+    assert post("/v1/predictions", {"symptoms": "fever"})[0] == 401
+    assert post(vitals, None, [(b"authorization", b"Bearer s3cret")], method="GET")[0] == 404 # Authorized; no readings
+    assert post(vitals, None, [(b"x-api-key", b"s3cret")], method="GET")[0] == 404
+
+
+def test_open_api_only_listens_on_loopback(monkeypatch):
+    monkeypatch.setattr(api, "API_KEY", None)
+    with pytest.raises(SystemExit):
+        api.main(["--host", "0.0.0.0"])
+    assert api.is_loopback("127.0.0.1") and api.is_loopback("::1") and api.is_loopback("localhost")
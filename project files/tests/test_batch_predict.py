@@ -0,0 +1,51 @@
+import json
+
+from batch_predict import ResultsFile, prepare_resume, run_batch
+
+
+class FlakyModel:
+    """Fails every prompt the first time it is sent, then answers."""
+    def __init__(self):
+        self.seen = set()
+
+    def generate_text(self, prompt):
+        if prompt not in self.seen:
+            self.seen.add(prompt)
+            raise TimeoutError("backend timed out")
+        return "1. Influenza\\nLikelihood: High\\nBrief explanation: Viral.\\nRecommended next steps: Rest."
+
+
+def test_resume_keeps_one_record_per_row(tmp_path):
+    cases = tmp_path / "cases.csv"
+    cases.write_text("case_id,symptoms\na,fever and cough\nb,headache\nc,\n")
+    output = tmp_path / "predictions.jsonl"
+    model = FlakyModel()
+
+    assert run_batch(str(cases), str(output), model) == {"ok": 0, "error": 3, "skipped": 0}
+    with open(output, "a") as f:
+        f.write('{"row": 1, "status": "ok", "case')  # Interrupted mid-write
+    assert run_batch(str(cases), str(output), model) == {"ok": 2, "error": 1, "skipped": 0}
+    assert run_batch(str(cases), str(output), model) == {"ok": 0, "error": 1, "skipped": 2}
+
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(r["row"] for r in records) == [0, 1, 2]
+    assert {r["row"]: r["status"] for r in records} == {0: "ok", 1: "ok", 2: "error"}
+
+
+def test_results_file_counts_records_as_they_are_written(tmp_path):
+    results = ResultsFile(str(tmp_path / "results.jsonl"))
+    records = results.write([{"row": 0, "status": "ok"}, {"row": 1, "status": "error"}])
+
+    assert next(records)["row"] == 0 and len(results) == 1
+    assert next(records)["row"] == 1 and results.counts == {"ok": 1, "error": 1}
+    records.close()
+    assert [json.loads(line)["row"] for line in results.read_bytes().splitlines()] == [0, 1]
+
+
+def test_prepare_resume_keeps_the_first_success_of_each_row(tmp_path):
+    output = tmp_path / "predictions.jsonl"
+    output.write_text('{"row": 3, "status": "ok", "n": 1}\n{"row": 0, "status": "error"}\n'
+                      '{"row": 3, "status": "ok", "n": 2}\n{"row": 0, "status": "ok", "n": 3}\n{"row": 5, "sta')
+
+    assert prepare_resume(str(output)) == {0, 3}
+    assert [json.loads(line)["n"] for line in output.read_text().splitlines()] == [1, 3]
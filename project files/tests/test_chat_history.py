@@ -0,0 +1,27 @@
+from chat_history import ChatHistoryStore
+
+
+def test_purge_drops_old_messages_and_least_recent_conversations(tmp_path):
+    store = ChatHistoryStore(str(tmp_path / "chat.sqlite"), max_age=3600, max_conversations=2)
+    for conversation in ("a", "b", "c"):
+        store.append(conversation, "user", "hello")
+    store._db.execute("UPDATE messages SET created_at = created_at - 7200 WHERE conversation = 'a'")
+    store._db.commit()
+    store.append("b", "ai", "hi")
+
+    assert store.purge() == 1 # "a" is too old; "b" and "c" are the two most recent
+    assert [store.count(c) for c in ("a", "b", "c")] == [0, 2, 1]
+
+    store.append("d", "user", "hello")
+    assert store.purge() == 1 # "b" was active after "c", so "c" goes
+    assert [store.count(c) for c in ("b", "c", "d")] == [2, 0, 1]
+
+
+def test_purge_runs_on_open(tmp_path):
+    path = str(tmp_path / "chat.sqlite")
+    store = ChatHistoryStore(path)
+    store.append("a", "user", "hello")
+    store.append("b", "user", "hello")
+
+    assert ChatHistoryStore(path, max_conversations=1).count("a") == 0
+    assert store.count("b") == 1
@@ -0,0 +1,46 @@
+import pandas as pd
+
+from vitals_store import VitalsStore, normalize_chunk, open_store
+
+
+def readings(start, days, heart_rate):
+    raw = pd.DataFrame({"date": pd.date_range(start, periods=days, freq="D"), "heart_rate": heart_rate})
+    return normalize_chunk(raw)[0]
+
+
+def heart_rate_count(cohort, patient_id):
+    rollups = cohort.rollups(patient_id)
+    return int(rollups.loc[rollups["vital"] == "heart_rate", "n"].sum())
+
+
+def test_writes_through_open_store_keep_the_cohort_current(tmp_path):
+    store = open_store(str(tmp_path))
+    store.append("p1", readings("2026-01-01", 5, 120))
+    store.append("p1", readings("2026-01-06", 5, 70))
+    assert heart_rate_count(store.cohort, "p1") == 10
+    assert store.cohort.stale_patients(store) == []
+
+
+def test_writes_behind_the_cohorts_back_are_found_and_refreshed(tmp_path):
+    store = open_store(str(tmp_path))
+    store.append("p1", readings("2026-01-01", 5, 70))
+    VitalsStore(str(tmp_path)).append("p1", readings("2026-01-06", 3, 130))  # No cohort index
+    VitalsStore(str(tmp_path)).append("p2", readings("2026-01-01", 4, 70))
+    assert store.cohort.stale_patients(store) == ["p1", "p2"]
+
+    store.append("p1", readings("2026-01-09", 2, 70))  # Stale: left to refresh, not folded in twice
+    assert store.cohort.refresh(store) == ["p1", "p2"]
+    assert heart_rate_count(store.cohort, "p1") == 10
+    assert heart_rate_count(store.cohort, "p2") == 4
+    assert store.cohort.stale_patients(store) == []
+    assert store.cohort.count() == 2
+
+
+def test_compaction_recomputes_the_patient(tmp_path):
+    store = open_store(str(tmp_path))
+    store.append("p1", readings("2026-01-01", 5, 70))
+    store.append("p1", readings("2026-01-01", 5, 70))  # The same export imported twice
+    assert heart_rate_count(store.cohort, "p1") == 10
+    store.compact("p1")
+    assert heart_rate_count(store.cohort, "p1") == 5
+    assert store.cohort.stale_patients(store) == []
@@ -0,0 +1,32 @@
+from granite import RESPONSES
+from predictions import Likelihood, parse_predictions
+
+
+def test_prompt_format_with_numbered_fields():
+    # The prediction prompt asks for "1. condition, 2. Likelihood, 3. Brief explanation, 4. Recommended next steps"
+    text = """1. Influenza
+2. Likelihood: High
+3. Brief explanation: Fever, aches and cough in flu season.
+4. Recommended next steps: Rest and fluids;
+   see a doctor if breathing gets harder.
+
+1. Potential condition name: Common cold
+2. Likelihood (High/Medium/Low): Medium
+3. **Brief explanation:** Milder infection of the nose and throat.
+4. Recommended next steps - Symptom relief."""
+
+    conditions = parse_predictions(text)
+
+    assert [(c.rank, c.condition, c.likelihood) for c in conditions] == [
+        (1, "Influenza", Likelihood.HIGH), (2, "Common cold", Likelihood.MEDIUM)]
+    assert conditions[0].next_steps == "Rest and fluids; see a doctor if breathing gets harder."
+    assert conditions[1].explanation == "Milder infection of the nose and throat."
+    assert conditions[1].next_steps == "Symptom relief."
+
+
+def test_curated_answers():
+    conditions = parse_predictions(RESPONSES["prediction.diabetes"])
+    assert [c.condition for c in conditions] == ["Diabetes (Type 2)", "Diabetes Insipidus",
+                                                 "Urinary Tract Infection (UTI)"]
+    assert [c.likelihood for c in conditions] == [Likelihood.HIGH, Likelihood.LOW, Likelihood.LOW]
+    assert parse_predictions(RESPONSES["prediction.inconclusive"]) == []
@@ -0,0 +1,75 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from retrieval import Document, KnowledgeIndex, has_red_flags, knowledge_corpus, open_index
+from service import HealthService
+
+CHAT_KINDS = ["chat", "reference"]
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    return open_index(str(tmp_path_factory.mktemp("index") / "knowledge_index"), knowledge_corpus())
+
+
+def test_on_topic_question_is_answered_from_the_index(index):
+    passage = index.answer("I have a persistent cough and a low-grade fever", CHAT_KINDS)
+    assert passage is not None and passage.id == "chat.persistent_cough_low_fever"
+
+
+@pytest.mark.parametrize("query", [
+    "I have a fever and a sore throat",  # Every term is in a passage, but no passage is about it
+    "What should I eat for better energy?",
+    "headache",  # Two passages are about equally good
+])
+def test_wrong_topic_question_is_not_answered_from_the_index(index, query):
+    assert index.answer(query, CHAT_KINDS) is None
+
+
+@pytest.mark.parametrize("query", [
+    "severe chest pain and shortness of breath",
+    "persistent cough and low fever, and now I can't breathe",
+    "Persistent cough, low fever and coughing up blood",
+])
+def test_red_flag_question_is_never_answered_from_the_index(index, query):
+    assert has_red_flags(query)
+    assert index.answer(query, CHAT_KINDS) is None
+
+
+def test_red_flags_match_whole_phrases():
+    assert has_red_flags("Sudden CHEST  PAIN")
+    assert not has_red_flags("my chest painted red by a rash")
+    assert not has_red_flags("persistent cough and low fever")
+
+
+@pytest.mark.parametrize("query", ["severe chest pain and shortness of breath", "I have a fever and a sore throat"])
+def test_wrong_topic_chat_question_goes_to_the_model(query):
+    generation = HealthService().answer_query(query)
+    assert generation.source == "model"
+    assert "persistent cough" not in generation.text().lower()
+
+
+def _open_and_search(path):
+    return [p.id for p in open_index(path, knowledge_corpus()).search("persistent cough", 1)]
+
+
+def test_processes_starting_together_share_one_build(tmp_path):
+    path = str(tmp_path / "knowledge_index")
+    with ProcessPoolExecutor(max_workers=6, mp_context=multiprocessing.get_context("spawn")) as pool:
+        results = list(pool.map(_open_and_search, [path] * 12))
+    assert results == [["chat.persistent_cough_low_fever"]] * 12
+    assert [e for e in os.listdir(path) if e.startswith("v-")] == [open(os.path.join(path, "CURRENT")).read()]
+    assert not [e for e in os.listdir(path) if e.startswith(".")]
+
+
+def test_rebuilding_leaves_an_open_index_usable(tmp_path):
+    path = str(tmp_path / "knowledge_index")
+    old = open_index(path, knowledge_corpus())
+    extra = Document("ref.sleep", "reference", "Sleep hygiene", "Keep a regular bedtime and a dark, quiet room.")
+    new = open_index(path, knowledge_corpus() + [extra])
+    assert new.search("bedtime", 1)[0].id == "ref.sleep"
+    assert old.search("persistent cough", 1)[0].id == "chat.persistent_cough_low_fever"
+    assert KnowledgeIndex(path).n_docs == old.n_docs + 1
@@ -0,0 +1,35 @@
+import pytest
+
+from semantic_cache import SemanticCache, qualifiers
+
+
+@pytest.mark.parametrize("asked, stored", [
+    ("I have no chest pain", "I have chest pain"),
+    ("I have chest pain", "I have no chest pain"),
+    ("I don't have a fever", "I have a fever"),
+    ("fever for 10 days", "fever for 2 days"),
+    ("fever for 2 days", "fever for 10 days"),
+    ("temperature of 39.5", "temperature of 38.5"),
+])
+def test_negation_or_number_changes_are_not_hits(asked, stored):
+    cache = SemanticCache()
+    cache.put(stored, "answer")
+    assert cache.get(asked) is None
+
+
+@pytest.mark.parametrize("asked, stored", [
+    ("cough and fever", "I have a fever and cough"),
+    ("I don’t have any fever", "I don't have a fever"),
+    ("fever for 2 days", "I've had a fever for 2 days"),
+])
+def test_rewordings_are_hits(asked, stored):
+    cache = SemanticCache()
+    cache.put(stored, "answer")
+    hit = cache.get(asked)
+    assert hit is not None and hit.answer == "answer"
+
+
+def test_qualifiers():
+    assert qualifiers("I have no chest pain") == (("not", "chest"),)
+    assert qualifiers("fever for two days") == qualifiers("fever for 2 days") == (("number", "2.0"),)
+    assert qualifiers("What helps a cough?") == ()
@@ -0,0 +1,21 @@
+from service import HealthService
+
+QUESTION = "What can I do about my sore throat and fever?"
+
+
+def test_answers_given_in_a_conversation_are_not_shared():
+    service = HealthService()
+    history = service.conversation([("user", "I am 8 months pregnant"), ("ai", "Congratulations!")])
+    first = service.answer_query(QUESTION, history)
+    assert first.source == "model"
+    first.text()
+    assert service.semantic_cache.stats()["entries"] == 0
+    assert service.answer_query(QUESTION).source == "model"
+
+
+def test_answers_without_a_conversation_are_shared_with_new_conversations_only():
+    service = HealthService()
+    service.answer_query(QUESTION).text()
+    assert service.answer_query("sore throat and fever, what can I do?").source == "semantic_cache"
+    history = service.conversation([("user", "I am allergic to penicillin"), ("ai", "Noted.")])
+    assert service.answer_query(QUESTION, history).source == "model"
@@ -0,0 +1,32 @@
+from treatment_plans import TemplateStore
+
+PLAN = "**Plan:**\n1. Medications\n2. Lifestyle\n3. Follow-up"
+
+
+def test_generated_plans_are_capped_least_recently_used_first(tmp_path):
+    path = str(tmp_path / "templates.sqlite")
+    store = TemplateStore(path, max_generated=2)
+    assert store.add("Gout", PLAN) and store.add("Psoriasis", PLAN)
+    assert store.get("gout") == PLAN # Psoriasis is now the least recently used
+    assert store.add("Eczema", PLAN)
+
+    assert store.get("psoriasis") is None
+    assert store.get("gout") == PLAN and store.get("eczema") == PLAN
+    assert store.get("asthma") is not None # Curated plans are never evicted
+    assert len(TemplateStore(path, max_generated=2)) == len(store)
+
+
+def test_unstructured_answers_are_not_stored():
+    store = TemplateStore()
+    assert not store.add("Gout", "I cannot help with that.")
+    assert store.get("gout") is None
+
+
+def test_only_whole_curated_conditions_get_curated_plans():
+    store = TemplateStore()
+    for condition in ("Type 2 Diabetes", "diabetes, type II", "High blood pressure", "my asthma", "Migraines"):
+        assert store.key(condition).startswith("treatment."), condition
+    for condition in ("Diabetes insipidus", "Type 1 diabetes", "Breast cancer", "Pulmonary hypertension",
+                      "Cardiac asthma"):
+        assert store.key(condition) == " ".join(condition.lower().split()), condition
+        assert store.get(condition) is None # Its base plan comes from the model
@@ -0,0 +1,29 @@
+import os
+
+import pandas as pd
+
+from analytics import DATE_COLUMN, VITALS
+from vitals_store import VitalsStore, normalize_chunk
+
+
+def readings(heart_rate, days=3):
+    raw = pd.DataFrame({"date": pd.date_range("2026-01-01", periods=days, freq="D"), "heart_rate": heart_rate})
+    return normalize_chunk(raw)[0]
+
+
+def test_distinct_patient_ids_get_distinct_partitions(tmp_path):
+    store = VitalsStore(str(tmp_path))
+    store.append("Jane Doe", readings(60))
+    store.append("Jane_Doe", readings(90))
+    store.append("jane doe", readings(120))
+    assert store.patients() == ["Jane Doe", "Jane_Doe", "jane doe"]
+    for patient_id, heart_rate in (("Jane Doe", 60), ("Jane_Doe", 90), ("jane doe", 120)):
+        frame = store.read_range(patient_id)
+        assert len(frame) == 3 and (frame[VITALS["heart_rate"]] == heart_rate).all()
+
+
+def test_partition_names_do_not_reveal_the_patient(tmp_path):
+    store = VitalsStore(str(tmp_path))
+    store.append("Jane Doe", readings(70))
+    assert not any("jane" in entry.lower() for entry in os.listdir(tmp_path))
+    assert store.read_range("Jane Doe")[DATE_COLUMN].is_monotonic_increasing
@@ -0,0 +1,199 @@
+"""
+Treatment-plan templates with local personalization.
+
+Plans for a condition are mostly the same across patients, so each
+condition gets one base plan. The base plans are the curated answers in
+granite.RESPONSES, plus plans the model generated once with a neutral
+profile. A plan for a given patient is the base plan plus a "tailored to
+your profile" section built from the profile's age, gender and medical
+history by the rule tables below. That takes well under a millisecond.
+Medications and allergies are screened separately (see interactions.py).
+
+Profiles the rules cannot handle safely (children, pregnancy,
+immunosuppression, dialysis) are reported by `unusual_profile`. Their plans
+still come from the model with the full prompt.
+"""
+import re
+import sqlite3
+import textwrap
+import threading
+import time
+from collections import OrderedDict
+
+from granite import RESPONSES
+
+# Profile fields the model must see in full: (field, substring, reason)
+UNUSUAL_PROFILE = [
+    ("medical_history", "pregnan", "pregnancy"),
+    ("medical_history", "breastfeed", "breastfeeding"),
+    ("medical_history", "transplant", "organ transplant"),
+    ("medical_history", "immunosuppress", "immunosuppression"),
+    ("medical_history", "chemotherapy", "ongoing chemotherapy"),
+    ("medical_history", "dialysis", "dialysis"),
+]
+MIN_ADULT_AGE = 18  # Pediatric dosing is not templated
+OLDER_ADULT_AGE = 65
+# Profile the base plans are generated with
+NEUTRAL_PROFILE = {"age": "Not specified", "gender": "Not specified", "medical_history": ""}
+
+# (medical history substrings, note) for conditions the plan should take into account
+HISTORY_NOTES = [
+    (("diabetes",), "**Diabetes:** keep monitoring your blood glucose; some treatments (e.g. oral corticosteroids) "
+                    "can raise it."),
+    (("hypertension", "high blood pressure"), "**High blood pressure:** avoid decongestants and limit NSAIDs such "
+                                              "as ibuprofen or naproxen, which can raise blood pressure."),
+    (("asthma",), "**Asthma:** NSAIDs and beta-blockers (e.g. propranolol) can trigger breathing problems in some "
+                  "people with asthma; ask before using them."),
+    (("kidney", "renal"), "**Kidney disease:** doses of many medicines need adjusting, and NSAIDs are usually "
+                          "best avoided."),
+    (("liver", "hepat", "cirrhosis"), "**Liver disease:** keep acetaminophen (paracetamol) within the reduced "
+                                      "daily limit your doctor sets."),
+    (("heart", "cardiac", "angina"), "**Heart disease:** check with your cardiologist before starting new "
+                                     "medicines or vigorous exercise."),
+]
+# Phrasings of each curated condition, compared as sets of words once FILLER_WORDS are dropped, so word
+# order does not matter but every word must match. A condition that merely contains one of them ("diabetes
+# insipidus", "breast cancer") is a different condition; its base plan comes from the model.
+CURATED_CONDITIONS = {
+    "treatment.mouth_ulcer": ("mouth ulcer", "mouth ulcers", "oral ulcer", "oral ulcers", "canker sore",
+                              "canker sores", "aphthous ulcer", "aphthous ulcers"),
+    "treatment.hypertension": ("hypertension", "high blood pressure", "essential hypertension",
+                               "primary hypertension"),
+    "treatment.asthma": ("asthma", "bronchial asthma"),
+    "treatment.diabetes": ("diabetes", "diabetes mellitus", "type 2 diabetes", "type ii diabetes",
+                           "type 2 diabetes mellitus", "t2dm"),
+    "treatment.cancer": ("cancer",),
+    "treatment.migraine": ("migraine", "migraines", "migraine headache", "migraine headaches"),
+}
+FILLER_WORDS = {"a", "an", "the", "my", "of", "for", "with", "treatment", "plan", "management"}
+_PLAN_SECTION_RE = re.compile(r"^\s*\d\.\s", re.M)
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def condition_words(condition):
+    """The condition's words, lowercased, without punctuation or FILLER_WORDS."""
+    return [word for word in _WORD_RE.findall(condition.lower()) if word not in FILLER_WORDS]
+
+
+def _mentions(text, phrases):
+    text = (text or "").lower()
+    return any(phrase in text for phrase in phrases)
+
+
+def _age(profile):
+    try:
+        return int(profile.get("age") or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def unusual_profile(profile):
+    """Reasons this profile needs a model-generated plan ([] if the template rules cover it)."""
+    reasons = [reason for field, phrase, reason in UNUSUAL_PROFILE if _mentions(profile.get(field), (phrase,))]
+    if 0 < _age(profile) < MIN_ADULT_AGE:
+        reasons.append("pediatric patient")
+    return reasons
+
+
+def looks_like_plan(text):
+    """True for a structured plan (numbered sections), False for refusals and fallback answers."""
+    return len(_PLAN_SECTION_RE.findall(text)) >= 3
+
+
+def profile_notes(profile):
+    """The personalization notes for `profile`, one markdown bullet each."""
+    notes = []
+    age, gender = _age(profile), profile.get("gender")
+    if age >= OLDER_ADULT_AGE:
+        notes.append(f"**Age {age}:** medicines are often started at lower doses; watch for dizziness and falls, "
+                     "and have kidney function checked regularly.")
+    if gender == "Female" and (age == 0 or 12 <= age <= 50):
+        notes.append("**Pregnancy:** if you are or may become pregnant, or are breastfeeding, tell your doctor "
+                     "before starting any medication above.")
+    history = profile.get("medical_history")
+    notes.extend(note for phrases, note in HISTORY_NOTES if _mentions(history, phrases))
+    return [f"* {note}" for note in notes]
+
+
+def personalize(template, profile):
+    """`template` with a section of profile-specific notes after its title line."""
+    plan = textwrap.dedent(template).strip()
+    notes = profile_notes(profile)
+    if not notes:
+        return plan
+    title, _, body = plan.partition("\n")
+    return f"{title}\n\n**Tailored to your profile:**\n" + "\n".join(notes) + f"\n\n{body.strip()}"
+
+
+class TemplateStore:
+    """
+    Base plans by condition, shared by every session: the curated plans,
+    plus generated ones added with `add`. Conditions are free text, so at
+    most `max_generated` generated plans are kept, evicting the least
+    recently used. Pass `path` to keep generated plans in SQLite across
+    restarts.
+    """
+    def __init__(self, path=None, max_generated=1000):
+        self._aliases = {frozenset(condition_words(phrase)): response_id
+                         for response_id, phrases in CURATED_CONDITIONS.items() for phrase in phrases}
+        self._curated = {response_id: RESPONSES[response_id] for response_id in CURATED_CONDITIONS}
+        self._generated = OrderedDict()  # condition key -> plan, least recently used first
+        self.max_generated = max_generated
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS templates "
+                             "(condition TEXT PRIMARY KEY, plan TEXT NOT NULL, created_at REAL NOT NULL)")
+            self._db.commit()
+            self._generated.update(self._db.execute(
+                "SELECT condition, plan FROM templates ORDER BY created_at").fetchall())
+            with self._lock:
+                self._evict()
+
+    def key(self, condition):
+        """
+        Curated plan id when the condition is a curated condition ("Type 2
+        diabetes", "diabetes, type II"), else its normalized words.
+        """
+        words = condition_words(condition)
+        return self._aliases.get(frozenset(words)) or " ".join(words)
+
+    def get(self, condition):
+        key = self.key(condition)
+        with self._lock:
+            if key in self._curated:
+                return self._curated[key]
+            plan = self._generated.get(key)
+            if plan is not None:
+                self._generated.move_to_end(key)
+            return plan
+
+    def add(self, condition, plan):
+        """Stores a generated base plan; returns False (and stores nothing) if it is not a structured plan."""
+        if not looks_like_plan(plan):
+            return False
+        key = self.key(condition)
+        if key in self._curated:
+            return True
+        with self._lock:
+            self._generated[key] = plan
+            self._generated.move_to_end(key)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO templates (condition, plan, created_at) VALUES (?, ?, ?)",
+                                 (key, plan, time.time()))
+            self._evict()
+        return True
+
+    def _evict(self):
+        """Drops the least recently used generated plans beyond `max_generated`. Hold the lock."""
+        evicted = []
+        while len(self._generated) > self.max_generated:
+            evicted.append(self._generated.popitem(last=False)[0])
+        if self._db is not None:
+            self._db.executemany("DELETE FROM templates WHERE condition = ?", [(key,) for key in evicted])
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._curated) + len(self._generated)
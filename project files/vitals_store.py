@@ -0,0 +1,461 @@
+"""
+Bulk vitals ingestion and a per-patient columnar store.
+
+Readings from CSV, Parquet and wearable-style JSON exports are read in
+chunks, mapped onto the dashboard's vitals columns, validated and downcast
+(int16 heart rate and blood pressure, float32 glucose, dictionary-encoded
+source), then appended to a Parquet dataset partitioned by patient and
+month:
+
+    <root>/patient=<key>/month=<YYYY-MM>/part-<n>.parquet
+
+The key is a hash of the patient id, so distinct ids never share a
+partition and directory names don't reveal who the readings belong to.
+Each patient directory holds the id itself in `patient.json`.
+
+Reading a date range only opens the month partitions it overlaps, and the
+row-group statistics on `Date` skip the rest. The dashboard therefore loads
+just the window it plots, however much history is stored.
+
+JSON exports may be JSON Lines or a document holding a list of readings
+(top level, or under "readings", "data", "samples" or "records"). Readings
+are either wide (one column per vital) or long (`type`, `value` and an
+optional `unit`, as most wearables export them).
+
+Usage (from the `project files` directory):
+    python vitals_store.py jane-doe watch_export.json cuff.csv --store vitals_store
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from analytics import DATE_COLUMN, VITALS
+from cohort import CohortIndex
+
+CHUNK_ROWS = 50_000
+COHORT_FILE = "cohort.sqlite"
+ROW_GROUP_ROWS = 64 * 1024
+SOURCE_COLUMN = "Source"
+MGDL_PER_MMOL = 18.016  # Blood glucose mmol/L -> mg/dL
+
+SCHEMA = pa.schema([
+    (DATE_COLUMN, pa.timestamp("ms")),
+    (VITALS["heart_rate"], pa.int16()),
+    (VITALS["systolic"], pa.int16()),
+    (VITALS["diastolic"], pa.int16()),
+    (VITALS["glucose"], pa.float32()),
+    (SOURCE_COLUMN, pa.dictionary(pa.int32(), pa.string())),
+])
+_INT_VITALS = ("heart_rate", "systolic", "diastolic")
+
+# Accepted input column (or long-format type) names per vital, after _normalize_name
+COLUMN_ALIASES = {
+    DATE_COLUMN: ("date", "timestamp", "time", "datetime", "recorded_at", "start_date"),
+    "heart_rate": ("heart_rate_bpm", "heart_rate", "heartrate", "hr", "bpm", "pulse"),
+    "systolic": ("systolic_bp_mmhg", "systolic_bp", "systolic", "blood_pressure_systolic", "sbp"),
+    "diastolic": ("diastolic_bp_mmhg", "diastolic_bp", "diastolic", "blood_pressure_diastolic", "dbp"),
+    "glucose": ("blood_glucose_mg_dl", "blood_glucose", "bloodglucose", "glucose", "bg"),
+}
+GLUCOSE_MMOL_ALIASES = ("blood_glucose_mmol_l", "glucose_mmol_l", "glucose_mmol")
+BLOOD_PRESSURE_ALIASES = ("bp", "blood_pressure", "bloodpressure")  # "120/80" strings
+TYPE_ALIASES = ("type", "metric", "data_type", "kind")
+VALUE_ALIASES = ("value", "qty", "reading")
+UNIT_ALIASES = ("unit", "units")
+
+# Physiologically plausible bounds; readings outside are sensor errors and dropped
+VALID_RANGES = {
+    "heart_rate": (20, 300),
+    "systolic": (40, 300),
+    "diastolic": (20, 200),
+    "glucose": (10, 1000),
+}
+
+_BP_RE = r"^\s*(\d+(?:\.\d+)?)\s*/\s*(\d+(?:\.\d+)?)\s*$"
+
+
+# --- Reading Input ---
+def detect_format(name):
+    ext = os.path.splitext(name)[1].lower()
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    if ext in (".csv", ".json"):
+        return ext[1:]
+    if ext in (".jsonl", ".ndjson"):
+        return "jsonl"
+    raise ValueError(f"Unsupported vitals file {name!r}; expected .csv, .parquet, .json or .jsonl")
+
+
+def _json_records(doc):
+    if isinstance(doc, list):
+        return doc
+    if isinstance(doc, dict):
+        for key in ("readings", "data", "samples", "records"):
+            if isinstance(doc.get(key), list):
+                return doc[key]
+    raise ValueError("JSON export has no list of readings")
+
+
+def read_chunks(source, fmt, chunk_rows=CHUNK_ROWS):
+    """
+    Yields the raw input as DataFrames of at most `chunk_rows` rows. `source`
+    is a path or a binary file object (e.g. a Streamlit upload).
+    """
+    if fmt == "csv":
+        with pd.read_csv(source, chunksize=chunk_rows) as reader:
+            yield from reader
+    elif fmt == "parquet":
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    elif fmt == "jsonl":
+        with pd.read_json(source, lines=True, chunksize=chunk_rows, dtype=False, convert_dates=False) as reader:
+            yield from reader
+    elif fmt == "json":
+        # A single JSON document has to be parsed whole; it is still written out in chunks
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, encoding="utf-8") as f:
+                records = _json_records(json.load(f))
+        else:
+            records = _json_records(json.load(source))
+        for start in range(0, len(records), chunk_rows):
+            yield pd.DataFrame.from_records(records[start:start + chunk_rows])
+    else:
+        raise ValueError(f"Unknown vitals format {fmt!r}")
+
+
+# --- Validation ---
+def _normalize_name(name):
+    return re.sub(r"[^a-z0-9]+", "_", str(name).lower()).strip("_")
+
+
+def _find(columns, aliases):
+    """Original column name for the first alias present in `columns` (normalized -> original)."""
+    for alias in aliases:
+        if alias in columns:
+            return columns[alias]
+    return None
+
+
+def _parse_dates(values):
+    """Timestamps (naive UTC); unparsable values become NaT."""
+    if pd.api.types.is_numeric_dtype(values):
+        numbers = pd.to_numeric(values, errors="coerce")
+        unit = "ms" if numbers.abs().max() > 1e11 else "s"  # Epoch milliseconds or seconds
+        return pd.to_datetime(numbers, unit=unit, errors="coerce")
+    parsed = pd.to_datetime(values, errors="coerce", utc=True)
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        # Formats differing from the first row's are parsed element by element
+        parsed[retry] = pd.to_datetime(values[retry], errors="coerce", utc=True, format="mixed")
+    return parsed.dt.tz_convert(None)
+
+
+def _pivot_long(raw, columns):
+    """
+    Long-format readings (type/value/unit rows) to one column per vital.
+    Also returns how many rows were dropped (unknown type or unparsable value).
+    """
+    type_keys = {alias: key for key in VITALS for alias in COLUMN_ALIASES[key]}
+    type_keys.update({alias: "blood_pressure" for alias in BLOOD_PRESSURE_ALIASES})
+    dates = _parse_dates(raw[_find(columns, COLUMN_ALIASES[DATE_COLUMN])])
+    keys = raw[_find(columns, TYPE_ALIASES)].map(_normalize_name).map(type_keys)
+    values = raw[_find(columns, VALUE_ALIASES)]
+    unit_col = _find(columns, UNIT_ALIASES)
+
+    parts = []
+    for key in VITALS:
+        mask = (keys == key).to_numpy()
+        numbers = pd.to_numeric(values[mask], errors="coerce")
+        if key == "glucose" and unit_col is not None:
+            mmol = raw[unit_col][mask].astype(str).str.lower().str.contains("mmol").to_numpy()
+            numbers = numbers.where(~mmol, numbers * MGDL_PER_MMOL)
+        parts.append(pd.DataFrame({DATE_COLUMN: dates[mask], "key": key, "value": numbers.to_numpy()}))
+    bp = (keys == "blood_pressure").to_numpy()
+    if bp.any():
+        pairs = values[bp].astype(str).str.extract(_BP_RE).astype(float)
+        for key, i in (("systolic", 0), ("diastolic", 1)):
+            parts.append(pd.DataFrame({DATE_COLUMN: dates[bp], "key": key, "value": pairs[i].to_numpy()}))
+
+    long = pd.concat(parts, ignore_index=True).dropna(subset=[DATE_COLUMN, "value"])
+    dropped = len(raw) + int(bp.sum()) - len(long)  # A blood pressure row became two
+    if long.empty:
+        return pd.DataFrame({DATE_COLUMN: pd.Series(dtype="datetime64[ms]")}), dropped
+    wide = long.pivot_table(index=DATE_COLUMN, columns="key", values="value", aggfunc="mean")
+    return wide.rename(columns=VITALS).reset_index(), dropped
+
+
+def normalize_chunk(raw, source=""):
+    """
+    Maps one raw input chunk onto the store schema. Returns the downcast
+    frame and the number of rejected rows (no parsable timestamp, or no
+    plausible reading for any vital).
+    """
+    columns = {_normalize_name(c): c for c in raw.columns}
+    rejected = 0
+    if _find(columns, TYPE_ALIASES) is not None and _find(columns, VALUE_ALIASES) is not None:
+        raw, rejected = _pivot_long(raw, columns)
+        columns = {_normalize_name(c): c for c in raw.columns}
+    date_col = _find(columns, COLUMN_ALIASES[DATE_COLUMN])
+    if date_col is None:
+        raise ValueError("Vitals file has no date/timestamp column")
+
+    out = {DATE_COLUMN: _parse_dates(raw[date_col]).to_numpy()}
+    bp_col = _find(columns, BLOOD_PRESSURE_ALIASES)
+    bp = raw[bp_col].astype(str).str.extract(_BP_RE).astype(float) if bp_col is not None else None
+    for key, name in VITALS.items():
+        col = _find(columns, COLUMN_ALIASES[key])
+        if col is not None:
+            values = pd.to_numeric(raw[col], errors="coerce").to_numpy(dtype=float, copy=True)
+        elif key == "glucose" and _find(columns, GLUCOSE_MMOL_ALIASES) is not None:
+            mmol = pd.to_numeric(raw[_find(columns, GLUCOSE_MMOL_ALIASES)], errors="coerce")
+            values = mmol.to_numpy(dtype=float) * MGDL_PER_MMOL
+        elif bp is not None and key in ("systolic", "diastolic"):
+            values = bp[0 if key == "systolic" else 1].to_numpy(dtype=float, copy=True)
+        else:
+            values = np.full(len(raw), np.nan)
+        low, high = VALID_RANGES[key]
+        with np.errstate(invalid="ignore"):
+            values[(values < low) | (values > high)] = np.nan
+        out[name] = values
+
+    frame = pd.DataFrame(out)
+    keep = frame[DATE_COLUMN].notna() & frame[list(VITALS.values())].notna().any(axis=1)
+    rejected += len(frame) - int(keep.sum())
+    frame = _downcast(frame[keep])
+    frame[SOURCE_COLUMN] = pd.Categorical([source] * len(frame))
+    return frame, rejected
+
+
+def _downcast(frame):
+    frame = frame.copy()
+    frame[DATE_COLUMN] = frame[DATE_COLUMN].astype("datetime64[ms]")
+    for key in _INT_VITALS:
+        frame[VITALS[key]] = frame[VITALS[key]].round().astype("Int16")
+    frame[VITALS["glucose"]] = frame[VITALS["glucose"]].astype("float32")
+    return frame
+
+
+# --- Store ---
+PATIENT_FILE = "patient.json"
+
+
+def partition_key(patient_id):
+    """Opaque, collision-free partition name of a patient id."""
+    return hashlib.sha256(str(patient_id).encode()).hexdigest()[:32]
+
+
+def _month(timestamp):
+    return pd.Timestamp(timestamp).strftime("%Y-%m")
+
+
+def _to_pandas(table):
+    # Integer vitals with gaps come back as float32 (NaN), without gaps as int16
+    for key in _INT_VITALS:
+        name = VITALS[key]
+        if name in table.column_names and table.column(name).null_count:
+            table = table.set_column(table.schema.get_field_index(name), name, table.column(name).cast(pa.float32()))
+    return table.to_pandas()
+
+
+class VitalsStore:
+    """
+    Append-only Parquet store of vitals readings, partitioned by patient
+    and month. Files are written to a temporary name and renamed into place,
+    so readers never see a partial file. If a `cohort` index (see
+    cohort.CohortIndex) is given, every append is folded into it; open_store
+    pairs a store with its own cohort index.
+    """
+    def __init__(self, root, cohort=None):
+        self.root = root
+        self.cohort = cohort
+
+    def _patient_dir(self, patient_id):
+        return os.path.join(self.root, f"patient={partition_key(patient_id)}")
+
+    def _month_dirs(self, patient_id, start=None, end=None):
+        """(month, directory) pairs overlapping [start, end), oldest first."""
+        patient_dir = self._patient_dir(patient_id)
+        if not os.path.isdir(patient_dir):
+            return []
+        first = _month(start) if start is not None else None
+        last = _month(end - pd.Timedelta(milliseconds=1)) if end is not None else None
+        months = []
+        for entry in sorted(os.listdir(patient_dir)):
+            if not entry.startswith("month="):
+                continue
+            month = entry[len("month="):]
+            if (first is None or month >= first) and (last is None or month <= last):
+                months.append((month, os.path.join(patient_dir, entry)))
+        return months
+
+    @staticmethod
+    def _parts(directory):
+        return sorted(os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".parquet"))
+
+    def patients(self):
+        """Ids of the patients with stored readings."""
+        if not os.path.isdir(self.root):
+            return []
+        patients = []
+        for entry in os.listdir(self.root):
+            try:
+                with open(os.path.join(self.root, entry, PATIENT_FILE), encoding="utf-8") as f:
+                    patients.append(json.load(f)["patient"])
+            except (OSError, ValueError, KeyError):  # Not a patient directory
+                continue
+        return sorted(patients)
+
+    def _register(self, patient_id):
+        """Records the patient's id in its directory, once."""
+        path = os.path.join(self._patient_dir(patient_id), PATIENT_FILE)
+        if not os.path.exists(path):
+            tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"patient": str(patient_id)}, f)
+            os.replace(tmp, path)
+
+    def append(self, patient_id, frame):
+        """Writes normalized readings, one file per month they span. Returns the rows written."""
+        if frame.empty:
+            return 0
+        previous = self.version(patient_id) if self.cohort is not None else None
+        months = frame[DATE_COLUMN].to_numpy().astype("datetime64[M]")
+        for month, part in frame.groupby(months, sort=True):
+            directory = os.path.join(self._patient_dir(patient_id), f"month={_month(month)}")
+            os.makedirs(directory, exist_ok=True)
+            self._write(directory, part.sort_values(DATE_COLUMN, kind="stable"))
+        self._register(patient_id)
+        if self.cohort is not None:
+            self.cohort.update(str(patient_id), frame, previous, self.version(patient_id))
+        return len(frame)
+
+    def _write(self, directory, frame):
+        table = pa.Table.from_pandas(frame[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+        path = os.path.join(directory, f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet")
+        pq.write_table(table.replace_schema_metadata(None), path + ".tmp",
+                       row_group_size=ROW_GROUP_ROWS, compression="zstd")
+        os.replace(path + ".tmp", path)
+        return path
+
+    def ingest(self, patient_id, source, fmt, source_name="", chunk_rows=CHUNK_ROWS):
+        """Reads `source` chunk by chunk into the store. Returns row counts."""
+        counts = {"rows": 0, "rejected": 0, "chunks": 0}
+        for raw in read_chunks(source, fmt, chunk_rows):
+            frame, rejected = normalize_chunk(raw, source_name)
+            counts["rows"] += self.append(patient_id, frame)
+            counts["rejected"] += rejected
+            counts["chunks"] += 1
+        return counts
+
+    def read_range(self, patient_id, start=None, end=None, columns=None):
+        """
+        The patient's readings with `start <= Date < end` (either bound may be
+        None), sorted by date. Exact duplicates (a file imported twice) are dropped.
+        """
+        start = pd.Timestamp(start) if start is not None else None
+        end = pd.Timestamp(end) if end is not None else None
+        files = [f for _, d in self._month_dirs(patient_id, start, end) for f in self._parts(d)]
+        if not files:
+            return _to_pandas(SCHEMA.empty_table().select(columns or SCHEMA.names))
+        condition = None
+        if start is not None:
+            condition = ds.field(DATE_COLUMN) >= pa.scalar(start.to_pydatetime(), pa.timestamp("ms"))
+        if end is not None:
+            below = ds.field(DATE_COLUMN) < pa.scalar(end.to_pydatetime(), pa.timestamp("ms"))
+            condition = below if condition is None else condition & below
+        if columns is not None and DATE_COLUMN not in columns:
+            columns = [DATE_COLUMN] + list(columns)
+        table = ds.dataset(files, schema=SCHEMA, format="parquet").to_table(columns=columns, filter=condition)
+        frame = _to_pandas(table).drop_duplicates()
+        return frame.sort_values(DATE_COLUMN, kind="stable").reset_index(drop=True)
+
+    def read_months(self, patient_id):
+        """Yields the patient's readings one month partition at a time, oldest first."""
+        for _, directory in self._month_dirs(patient_id):
+            frame = _to_pandas(ds.dataset(self._parts(directory), schema=SCHEMA, format="parquet").to_table())
+            yield frame.drop_duplicates().sort_values(DATE_COLUMN, kind="stable").reset_index(drop=True)
+
+    def version(self, patient_id):
+        """
+        Token that changes whenever the patient's stored readings do (every
+        write adds a uniquely named file). Costs a directory listing, no reads.
+        """
+        names = [f for _, d in self._month_dirs(patient_id) for f in self._parts(d)]
+        return hashlib.sha1("\n".join(names).encode()).hexdigest() if names else None
+
+    def date_bounds(self, patient_id):
+        """(first, last) reading timestamp from Parquet metadata alone, or None if the patient has no data."""
+        months = self._month_dirs(patient_id)
+        if not months:
+            return None
+        first = last = None
+        for directory, pick in ((months[0][1], min), (months[-1][1], max)):
+            for path in self._parts(directory):
+                metadata = pq.ParquetFile(path).metadata
+                for i in range(metadata.num_row_groups):
+                    stats = metadata.row_group(i).column(0).statistics
+                    if stats is None or not stats.has_min_max:
+                        continue
+                    value = pd.Timestamp(stats.min if pick is min else stats.max)
+                    if pick is min:
+                        first = value if first is None else min(first, value)
+                    else:
+                        last = value if last is None else max(last, value)
+        return (first, last) if first is not None else None
+
+    def compact(self, patient_id):
+        """
+        Rewrites each month with several part files as one deduplicated file.
+        The cohort index (if any) then recomputes the patient, since
+        duplicates were dropped.
+        """
+        for _, directory in self._month_dirs(patient_id):
+            parts = self._parts(directory)
+            if len(parts) < 2:
+                continue
+            frame = _to_pandas(ds.dataset(parts, schema=SCHEMA, format="parquet").to_table())
+            self._write(directory, _downcast(frame.drop_duplicates()).sort_values(DATE_COLUMN, kind="stable"))
+            for path in parts:
+                os.remove(path)
+        if self.cohort is not None:
+            self.cohort.refresh(self, [str(patient_id)])
+
+
+def open_store(root):
+    """The store at `root` with its cohort index (<root>/cohort.sqlite), which every write then updates."""
+    return VitalsStore(root, cohort=CohortIndex(os.path.join(root, COHORT_FILE)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import vitals exports into the per-patient columnar store.")
+    parser.add_argument("patient", help="Patient identifier (partition name)")
+    parser.add_argument("files", nargs="+", help="CSV, Parquet, JSON or JSON Lines vitals exports")
+    parser.add_argument("--store", default=os.getenv("VITALS_STORE_PATH", "vitals_store"),
+                        help="Store directory (default: $VITALS_STORE_PATH or vitals_store)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help=f"Rows per chunk (default: {CHUNK_ROWS})")
+    parser.add_argument("--compact", action="store_true", help="Merge each month into one file afterwards")
+    args = parser.parse_args(argv)
+
+    store = open_store(args.store)
+    for path in args.files:
+        start = time.perf_counter()
+        counts = store.ingest(args.patient, path, detect_format(path), os.path.basename(path), args.chunk_rows)
+        print(f"{path}: {counts['rows']} readings, {counts['rejected']} rejected "
+              f"in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    if args.compact:
+        store.compact(args.patient)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())